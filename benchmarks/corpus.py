@@ -0,0 +1,148 @@
+import random
+from typing import Iterator
+
+from src.common.constants import QUERIES, COMPETITOR_ALIASES
+from src.common.jsonl import JsonlWriter
+
+# Mid-2023, so every generated timestamp is in the past
+START_UTC = 1_688_000_000
+
+CHATTER = [
+    "We moved our RMM to a new vendor last quarter and onboarding took longer than planned.",
+    "Anyone else seeing tickets spike after the latest Windows update?",
+    "Our clients mostly care about price, so we bundle backup with the monitoring package.",
+    "Documentation is half the job; we keep runbooks for every client site.",
+    "The help desk is stretched thin, we're looking at hiring another tech.",
+    "Patch management is still the most time consuming part of the week.",
+    "Has anyone negotiated better licensing terms with their distributor?",
+    "We run quarterly business reviews and that keeps churn low.",
+    "Phishing simulations helped, but users still click on everything.",
+    "The PSA integration broke again after their last release.",
+]
+
+MENTIONS = [
+    "We switched to {product} last year and detections have been solid.",
+    "{product} support was slow to respond when we had a false positive storm.",
+    "Pricing for {product} went up again at renewal, thinking about alternatives.",
+    "Honestly {product} has been fine, the console is easy for junior techs.",
+    "{product} flagged a legit line-of-business app and quarantined it on 40 endpoints.",
+    "Is {product} worth it over what we have now for a 50-seat client?",
+]
+
+TITLES = [
+    "Thoughts on {product} for small clients?",
+    "{product} vs the rest, what are you running?",
+    "Renewal time: staying with {product}?",
+]
+NEUTRAL_TITLES = [
+    "Best way to handle after-hours support?",
+    "How do you price managed services in 2024?",
+    "RMM recommendations for a growing MSP",
+    "Weekly rant thread",
+]
+
+
+def generate_corpus(
+        path: str,
+        total_comments: int,
+        comments_per_post: int = 10,
+        mention_density: float = 0.3,
+        long_post_share: float = 0.05,
+        days: int = 90,
+        seed: int = 0
+) -> dict:
+    """
+    Writes a synthetic r/msp corpus in the msp_data.jsonl schema: `total_comments` comments spread over
+    posts of about `comments_per_post` comments each. `mention_density` is the share of posts and comments
+    naming a tracked product (the rest is generic MSP chatter the relevance filter skips), and
+    `long_post_share` the share of posts long enough to be fitted to the token budget.
+    Records are streamed to disk, so any size fits in memory. Returns the post and comment counts.
+    """
+    with JsonlWriter(path) as writer:
+        writer.write_all(iter_posts(total_comments, comments_per_post, mention_density, long_post_share, days, seed))
+    return {"posts": writer.count, "comments": total_comments}
+
+
+def iter_posts(
+        total_comments: int,
+        comments_per_post: int = 10,
+        mention_density: float = 0.3,
+        long_post_share: float = 0.05,
+        days: int = 90,
+        seed: int = 0
+) -> Iterator[dict]:
+    rng = random.Random(seed)
+    products = [alias for name, aliases in COMPETITOR_ALIASES.items() for alias in [name] + aliases]
+    span_seconds = days * 24 * 3600
+    remaining = total_comments
+    post_index = 0
+    comment_index = 0
+
+    while remaining > 0 or post_index == 0:
+        # Thread sizes vary around the mean; the last thread takes whatever is left
+        num_comments = min(remaining, rng.randint(0, 2 * comments_per_post))
+        remaining -= num_comments
+        created_utc = START_UTC + rng.randrange(span_seconds)
+
+        mentions = rng.random() < mention_density
+        product = rng.choice(products)
+        title = rng.choice(TITLES if mentions else NEUTRAL_TITLES).format(product=product)
+        sentences = 30 if rng.random() < long_post_share else rng.randint(1, 5)
+        selftext = " ".join(_sentence(rng, products, mentions and i == sentences // 2) for i in range(sentences))
+
+        comments = []
+        for _ in range(num_comments):
+            comments.append({
+                "comment_id": f"c{comment_index:x}",
+                "author": f"user{rng.randrange(50_000)}",
+                "body": " ".join(_sentence(rng, products, i == 0 and rng.random() < mention_density)
+                                 for i in range(rng.randint(1, 3))),
+                "score": rng.randint(-5, 200),
+                "created_utc": created_utc + rng.randrange(7 * 24 * 3600)
+            })
+            comment_index += 1
+
+        yield {
+            "id": f"t{post_index:x}",
+            "title": title,
+            "author": f"user{rng.randrange(50_000)}",
+            "created_utc": created_utc,
+            "score": rng.randint(0, 500),
+            "num_comments": num_comments,
+            "url": f"https://www.reddit.com/r/msp/comments/t{post_index:x}/",
+            "query_matched": [rng.choice(QUERIES)],
+            "selftext": selftext,
+            "platform": "reddit",
+            "comments": comments
+        }
+        post_index += 1
+
+
+def _sentence(rng: random.Random, products: list[str], mention: bool) -> str:
+    if mention:
+        return rng.choice(MENTIONS).format(product=rng.choice(products))
+    return rng.choice(CHATTER)
+
+
+def llm_responses(count: int = 50, seed: int = 0) -> list[dict]:
+    """
+    Canned classifications for the stand-in LLM, varied enough to exercise every aggregate
+    (sentiments, competitor mentions with alias spellings, actionable items).
+    """
+    rng = random.Random(seed)
+    products = [alias for name, aliases in COMPETITOR_ALIASES.items() for alias in [name] + aliases]
+    responses = []
+    for _ in range(count):
+        action_needed = "yes" if rng.random() < 0.15 else "no_action"
+        responses.append({
+            "summary": rng.choice(CHATTER),
+            "sentiment_s1": rng.choice(["positive", "negative", "neutral", "not mentioned"]),
+            "benefits_mentioned": rng.sample(["easy console", "good detections", "fast rollback"], rng.randint(0, 2)),
+            "complaints_mentioned": rng.sample(["price", "false positives", "slow support"], rng.randint(0, 2)),
+            "competitors_mentioned": rng.sample(products, rng.randint(0, 3)),
+            "overall_tone": rng.choice(["positive", "negative", "neutral", "mixed"]),
+            "action_needed": action_needed,
+            "action_reason": "Complaint about false positives." if action_needed == "yes" else "",
+            "suggested_response": "Reach out with tuning guidance." if action_needed == "yes" else ""
+        })
+    return responses
@@ -0,0 +1,208 @@
+"""
+Pipeline benchmark: generates a synthetic r/msp corpus, runs pre_processor against the local stand-in LLM,
+then post_processor and the dashboard's data path, and reports throughput, p50/p99 latency and peak RSS
+per stage. Results are compared with the stored baseline for the same scenario; regressions fail the run.
+
+    python -m benchmarks.run --comments 10000 --mention-density 0.3
+    python -m benchmarks.run --comments 10000 --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.corpus import generate_corpus, llm_responses
+from src.data_processing.providers import stub_server
+
+ROOT_DIR = Path(__file__).parent.parent
+BASELINES_PATH = os.path.join(Path(__file__).parent, "baselines.json")
+STAGE_NAMES = ["preprocess", "postprocess", "dashboard"]
+# Differences below these are measurement noise (sub-millisecond queries, allocator slack), never regressions
+MIN_P99_DELTA_MS = 2.0
+MIN_RSS_DELTA_MB = 8.0
+
+
+def main(argv: list[str] = None) -> int:
+    args = _parse_args(argv)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="msp-bench-")
+    data_dir = os.path.join(work_dir, "data")
+    # Outputs of an earlier run (checkpoint included) would let pre_processor skip the work
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.makedirs(os.path.join(data_dir, "raw"))
+    os.makedirs(os.path.join(data_dir, "processed"))
+
+    started = time.perf_counter()
+    corpus = generate_corpus(
+        os.path.join(data_dir, "raw", "msp_data.jsonl"), args.comments, args.comments_per_post,
+        args.mention_density, seed=args.seed
+    )
+    print(f"Generated {corpus['posts']} posts / {corpus['comments']} comments in {work_dir} "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    server = stub_server.start_in_thread(
+        port=0, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, error_rate=args.llm_error_rate,
+        responses=llm_responses(seed=args.seed), max_concurrency=args.llm_max_concurrency
+    )
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT_DIR),
+        "DATA_DIR": data_dir,
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_URL": f"http://127.0.0.1:{server.server_port}",
+        # Every item must reach the fake LLM: no cache or near-duplicate reuse, no rate limit beyond the stub's latency
+        "LLM_CACHE_ENABLED": "false",
+        "NEAR_DUPLICATE_ENABLED": "false",
+        "LLM_MAX_WORKERS": str(args.workers),
+        "LLM_REQUESTS_PER_MINUTE": "1000000000",
+        "LLM_TOKENS_PER_MINUTE": "1000000000000",
+        "LLM_BATCH_MODE": "true" if args.batch_mode else "false",
+    }
+
+    results = {}
+    try:
+        for stage in args.stages:
+            results[stage] = _run_stage(stage, env, work_dir)
+            _print_result(stage, results[stage])
+    finally:
+        server.shutdown()
+    if server.requests_throttled:
+        print(f"The stand-in LLM throttled {server.requests_throttled} of "
+              f"{server.requests_served + server.requests_throttled} requests.")
+
+    scenario = scenario_key(args)
+    baselines = load_baselines(args.baselines_path)
+    regressions = []
+    if scenario in baselines:
+        regressions = find_regressions(results, baselines[scenario]["stages"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if not regressions:
+            print(f"No regressions against the baseline for {scenario} (tolerance {args.tolerance:.0%}).")
+    else:
+        print(f"No baseline stored for {scenario}.")
+
+    if args.save_baseline:
+        baselines[scenario] = {
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                        "cpus": os.cpu_count()},
+            "stages": results
+        }
+        save_baselines(baselines, args.baselines_path)
+        print(f"Saved baseline for {scenario} to {args.baselines_path}")
+    return 1 if regressions else 0
+
+
+def scenario_key(args) -> str:
+    key = (
+        f"comments={args.comments},per_post={args.comments_per_post},density={args.mention_density:g},"
+        f"latency_ms={args.llm_latency_ms:g},workers={args.workers},batch={args.batch_mode}"
+    )
+    if args.llm_max_concurrency:
+        key += f",max_concurrency={args.llm_max_concurrency}"
+    return key
+
+
+def summarize(raw: dict) -> dict:
+    """
+    Throughput (items/s), latency percentiles (ms) and peak RSS (MB) from a stage's raw measurements.
+    """
+    latencies = sorted(raw["latencies"])
+    return {
+        "items": raw["items"],
+        "seconds": round(raw["seconds"], 3),
+        "throughput": round(raw["items"] / raw["seconds"], 2) if raw["seconds"] else 0.0,
+        "latency_unit": raw["latency_unit"],
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(raw["peak_rss_mb"], 1)
+    }
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list (0 for an empty one).
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Stages that got slower (throughput down, p99 up) or bigger (peak RSS up) by more than `tolerance`.
+    """
+    regressions = []
+    for stage, result in results.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{stage}: throughput {result['throughput']}/s vs baseline {base['throughput']}/s")
+        if result["p99_ms"] > max(base["p99_ms"] * (1 + tolerance), base["p99_ms"] + MIN_P99_DELTA_MS):
+            regressions.append(f"{stage}: p99 {result['p99_ms']}ms vs baseline {base['p99_ms']}ms")
+        if result["peak_rss_mb"] > max(base["peak_rss_mb"] * (1 + tolerance), base["peak_rss_mb"] + MIN_RSS_DELTA_MB):
+            regressions.append(f"{stage}: peak RSS {result['peak_rss_mb']}MB vs baseline {base['peak_rss_mb']}MB")
+    return regressions
+
+
+def load_baselines(path: str = BASELINES_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(baselines: dict, path: str = BASELINES_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _run_stage(stage: str, env: dict, work_dir: str) -> dict:
+    result_path = os.path.join(work_dir, f"{stage}_result.json")
+    subprocess.run([sys.executable, "-m", "benchmarks.stages", stage, result_path], env=env, cwd=ROOT_DIR,
+                   check=True)
+    with open(result_path, "r", encoding="utf-8") as f:
+        return summarize(json.load(f))
+
+
+def _print_result(stage: str, result: dict):
+    print(
+        f"{stage:<12} {result['items']:>10} items {result['seconds']:>9.2f}s {result['throughput']:>10.1f}/s  "
+        f"p50 {result['p50_ms']:>9.2f}ms  p99 {result['p99_ms']:>9.2f}ms per {result['latency_unit']}  "
+        f"peak RSS {result['peak_rss_mb']:>7.1f}MB"
+    )
+
+
+def _parse_args(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on a synthetic r/msp corpus.")
+    parser.add_argument("--comments", type=int, default=1000, help="total comments in the corpus (1k to 10M)")
+    parser.add_argument("--comments-per-post", type=int, default=10)
+    parser.add_argument("--mention-density", type=float, default=0.3,
+                        help="share of posts/comments naming a tracked product")
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-max-concurrency", type=int, default=0,
+                        help="simulated quota: the stand-in LLM answers 429 beyond this many requests in flight")
+    parser.add_argument("--workers", type=int, default=32, help="LLM worker threads")
+    parser.add_argument("--batch-mode", action="store_true")
+    parser.add_argument("--stages", type=lambda value: value.split(","), default=STAGE_NAMES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="where to put the corpus and outputs (default: a new temp dir)")
+    parser.add_argument("--baselines-path", default=BASELINES_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown/growth")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
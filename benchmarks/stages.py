@@ -0,0 +1,134 @@
+"""
+Runs one pipeline stage inside a benchmark, in its own process so peak RSS is measured per stage:
+
+    python -m benchmarks.stages <stage> <result_path>
+
+The data tree and LLM provider come from the environment (DATA_DIR, LLM_PROVIDER, ...), set by benchmarks.run.
+"""
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+
+def run_preprocess() -> dict:
+    from src.common.constants import PROCESSED_MSP_DATA_PATH, LLM_MAX_WORKERS, LLM_BATCH_MODE
+    from src.common.jsonl import iter_records
+    from src.data_processing import pre_processor
+    from src.data_processing.providers.registry import get_provider
+
+    # Time every provider call, from the worker threads (the calls themselves, not the resilience layer's waits)
+    provider = get_provider()
+    provider = getattr(provider, "provider", provider)
+    generate = provider.generate
+    latencies = []
+    lock = threading.Lock()
+
+    def timed_generate(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return generate(*args, **kwargs)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    provider.generate = timed_generate
+    started = time.perf_counter()
+    pre_processor.main(max_workers=LLM_MAX_WORKERS, batch_mode=LLM_BATCH_MODE)
+    seconds = time.perf_counter() - started
+
+    items = sum(1 + len(post["comments"]) for post in iter_records(PROCESSED_MSP_DATA_PATH))
+    return {"items": items, "seconds": seconds, "latency_unit": "llm_call", "latencies": latencies}
+
+
+def run_postprocess(repeat: int = 3) -> dict:
+    from src.common.constants import ANALYTICS_DB_PATH, ANALYSIS_RESULTS_PATH
+    from src.data_processing import post_processor
+
+    latencies = []
+    for _ in range(repeat):
+        # Start from an empty analytics store, or unchanged files would skip ingestion
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(ANALYTICS_DB_PATH + suffix):
+                os.remove(ANALYTICS_DB_PATH + suffix)
+        started = time.perf_counter()
+        post_processor.main()
+        latencies.append(time.perf_counter() - started)
+
+    with open(ANALYSIS_RESULTS_PATH, "r", encoding="utf-8") as f:
+        findings = json.load(f)["main_findings"]
+    items = findings["total_posts"] + findings["total_comments"]
+    return {"items": items * repeat, "seconds": sum(latencies), "latency_unit": "run", "latencies": latencies}
+
+
+def run_dashboard(repeat: int = 10) -> dict:
+    """
+    The dashboard's data path without the Streamlit UI: cold view-model loads, then typical store slices.
+    """
+    # Outside `streamlit run`, every cached call warns about the missing script context
+    logging.disable(logging.WARNING)
+
+    from src.common.constants import ANALYSIS_RESULTS_PATH, ACTIONABLE_ITEMS_PATH, ANALYTICS_DB_PATH
+    from src.data_analysis.dashboard import file_signature, load_view_model
+    from src.data_processing.analytics_store import AnalyticsStore
+
+    latencies = []
+
+    def timed(call, *args, **kwargs):
+        started = time.perf_counter()
+        result = call(*args, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    for _ in range(repeat):
+        load_view_model.clear()
+        timed(load_view_model, ANALYSIS_RESULTS_PATH, file_signature(ANALYSIS_RESULTS_PATH),
+              file_signature(ACTIONABLE_ITEMS_PATH))
+
+    with AnalyticsStore(ANALYTICS_DB_PATH) as store:
+        first_utc, last_utc = store.date_range()
+        competitors = store.distinct_values("competitor")[:5]
+        slices = [{}]
+        slices += [{"competitor_id": competitor} for competitor in competitors]
+        slices += [{"sentiment": sentiment} for sentiment in store.distinct_values("sentiment")]
+        slices += [{"query": query} for query in store.distinct_values("query")[:3]]
+        if first_utc is not None:
+            slices.append({"since": last_utc - 7 * 24 * 3600, "until": last_utc})
+        for _ in range(repeat):
+            for filters in slices:
+                timed(store.findings, **filters)
+                timed(store.count_actionable_items, **filters)
+                timed(store.actionable_items, 50, 0, **filters)
+            # Competitor drill-downs
+            for competitor in competitors:
+                timed(store.count_items, competitor_id=competitor)
+                timed(store.competitor_items, competitor, 50, 0)
+            timed(store.actionable_items, 50, 0, author_contains="user1")
+    return {"items": len(latencies), "seconds": sum(latencies), "latency_unit": "query", "latencies": latencies}
+
+
+STAGES = {
+    "preprocess": run_preprocess,
+    "postprocess": run_postprocess,
+    "dashboard": run_dashboard,
+}
+
+
+def main(stage: str, result_path: str):
+    # Per-item INFO logs would dominate the timings
+    logging.disable(logging.INFO)
+    result = STAGES[stage]()
+    # ru_maxrss is in KiB on Linux; children covers post_processor's worker processes
+    result["peak_rss_mb"] = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    ) / 1024
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
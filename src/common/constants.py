@@ -4,8 +4,8 @@ from pathlib import Path
 # Project root directory
 ROOT_DIR = Path(__file__).parent.parent.parent
 
-# Data directories
-DATA_DIR = os.path.join(ROOT_DIR, "data")
+# Data directories (DATA_DIR can point a run, e.g. a benchmark, at another data tree)
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(ROOT_DIR, "data"))
 RAW_DATA_DIR = os.path.join(DATA_DIR, "raw")
 PROCESSED_DATA_DIR = os.path.join(DATA_DIR, "processed")
 REPORTS_DIR = os.path.join(DATA_DIR, "reports")
@@ -14,22 +14,201 @@ REPORTS_DIR = os.path.join(DATA_DIR, "reports")
 os.makedirs(RAW_DATA_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DATA_DIR, exist_ok=True)
 
-# File paths
-RAW_MSP_DATA_PATH = os.path.join(RAW_DATA_DIR, "msp_data.json")
-PROCESSED_MSP_DATA_PATH = os.path.join(PROCESSED_DATA_DIR, "processed_msp_data.json")
+# File paths (record-per-line JSONL, see src/common/jsonl.py)
+RAW_MSP_DATA_PATH = os.path.join(RAW_DATA_DIR, "msp_data.jsonl")
+PROCESSED_MSP_DATA_PATH = os.path.join(PROCESSED_DATA_DIR, "processed_msp_data.jsonl")
 ANALYSIS_RESULTS_PATH = os.path.join(PROCESSED_DATA_DIR, "analysis_results.json")
+ACTIONABLE_ITEMS_PATH = os.path.join(PROCESSED_DATA_DIR, "actionable_items.jsonl")
+PROCESSING_CHECKPOINT_PATH = os.path.join(PROCESSED_DATA_DIR, "processing_checkpoint.jsonl")
+# Embedded analytical store of processed posts/comments, queried by the dashboard
+ANALYTICS_DB_PATH = os.path.join(PROCESSED_DATA_DIR, "analytics.sqlite")
+# Daily/weekly/rolling trend series exported from the store's materialized windows, read by the dashboard and plotter
+TRENDS_PATH = os.path.join(PROCESSED_DATA_DIR, "trends.json")
+TREND_ROLLING_DAYS = int(os.getenv("TREND_ROLLING_DAYS", "7"))
 
-# Reddit API settings
-SUBREDDIT_NAME = "msp"
+# A consumer following a file that is still being written (jsonl.follow_records) gives up once it has seen no new
+# data for this long without the producer marking the file complete (0 = wait forever)
+FOLLOW_IDLE_TIMEOUT_SECONDS = float(os.getenv("FOLLOW_IDLE_TIMEOUT_SECONDS", "900"))
+
+# Legacy single-document JSON files, still readable as inputs
+LEGACY_RAW_MSP_DATA_PATH = os.path.join(RAW_DATA_DIR, "msp_data.json")
+LEGACY_PROCESSED_MSP_DATA_PATH = os.path.join(PROCESSED_DATA_DIR, "processed_msp_data.json")
+
+# Reddit API settings: every query is searched in each subreddit (comma-separated SUBREDDITS to override)
+SUBREDDITS = [name.strip() for name in os.getenv("SUBREDDITS", "msp").split(",") if name.strip()]
 MAX_POSTS = 100
+MAX_COMMENTS_PER_POST = 10
+
+# Async collection: Reddit OAuth API endpoints (point these at a local stub server for testing)
+REDDIT_ASYNC_MODE = os.getenv("REDDIT_ASYNC_MODE", "false").lower() in ("1", "true", "yes")
+REDDIT_API_BASE_URL = os.getenv("REDDIT_API_BASE_URL", "https://oauth.reddit.com")
+REDDIT_AUTH_URL = os.getenv("REDDIT_AUTH_URL", "https://www.reddit.com/api/v1/access_token")
+REDDIT_MAX_CONCURRENCY = int(os.getenv("REDDIT_MAX_CONCURRENCY", "8"))
+# Start spreading requests out once this few remain in the current rate-limit window
+REDDIT_RATELIMIT_RESERVE = int(os.getenv("REDDIT_RATELIMIT_RESERVE", "10"))
+# Local stand-in for Reddit's OAuth JSON API (python -m src.data_collection.providers.stub_server): serves
+# REDDIT_STUB_POSTS generated submissions with REDDIT_STUB_COMMENTS comments each, after REDDIT_STUB_LATENCY_MS
+REDDIT_STUB_PORT = int(os.getenv("REDDIT_STUB_PORT", "8766"))
+REDDIT_STUB_LATENCY_MS = float(os.getenv("REDDIT_STUB_LATENCY_MS", "50"))
+REDDIT_STUB_POSTS = int(os.getenv("REDDIT_STUB_POSTS", "250"))
+REDDIT_STUB_COMMENTS = int(os.getenv("REDDIT_STUB_COMMENTS", "5"))
+
+# Incremental collection: only fetch submissions newer than the per-query created_utc high-water mark,
+# and refresh comments only for threads active within the window
+COLLECTION_INCREMENTAL = os.getenv("COLLECTION_INCREMENTAL", "false").lower() in ("1", "true", "yes")
+COLLECTION_WATERMARKS_PATH = os.path.join(RAW_DATA_DIR, "collection_watermarks.json")
+ACTIVE_THREAD_WINDOW_DAYS = float(os.getenv("ACTIVE_THREAD_WINDOW_DAYS", "7"))
+
+# On-disk cache of Reddit search results and comment trees
+REDDIT_CACHE_PATH = os.path.join(RAW_DATA_DIR, "reddit_cache.sqlite")
+REDDIT_CACHE_TTL_HOURS = float(os.getenv("REDDIT_CACHE_TTL_HOURS", "6"))
+
+# LLM provider: "gemini", or "stub" for the local stand-in server (src/data_processing/providers/stub_server.py).
+# LLM_MODEL overrides the provider's default model.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL") or None
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+
+# Local stand-in LLM server, for offline/CI runs: simulated latency (base + random jitter), the share of
+# requests failing with one of LLM_STUB_ERROR_STATUSES, and an optional JSON file of canned responses
+LLM_STUB_URL = os.getenv("LLM_STUB_URL", "http://127.0.0.1:8765")
+LLM_STUB_PORT = int(os.getenv("LLM_STUB_PORT", "8765"))
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "200"))
+LLM_STUB_JITTER_MS = float(os.getenv("LLM_STUB_JITTER_MS", "100"))
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_ERROR_STATUSES = tuple(
+    int(status) for status in os.getenv("LLM_STUB_ERROR_STATUSES", "429,500,503").split(",") if status.strip()
+)
+LLM_STUB_RESPONSES_PATH = os.getenv("LLM_STUB_RESPONSES_PATH") or None
+# Simulated quota: requests beyond this many in flight get a 429 (0 = unlimited)
+LLM_STUB_MAX_CONCURRENCY = int(os.getenv("LLM_STUB_MAX_CONCURRENCY", "0"))
+
+# LLM processing settings (override via environment to match your Gemini quota)
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "8"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "15"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+CHECKPOINT_FSYNC_EVERY = int(os.getenv("CHECKPOINT_FSYNC_EVERY", "50"))
+
+# Resilience around the LLM provider (providers/resilience.py): retries with exponential backoff and jitter
+# (honoring Retry-After, up to LLM_RETRY_AFTER_MAX_SECONDS), a circuit breaker pausing calls after consecutive
+# failures, and AIMD concurrency that starts at LLM_INITIAL_CONCURRENCY in-flight calls (half of LLM_MAX_WORKERS)
+# and probes up to LLM_MAX_WORKERS until throttled. Only concurrency adapts: requests/min stays LLM_REQUESTS_PER_MINUTE
+LLM_RESILIENCE_ENABLED = os.getenv("LLM_RESILIENCE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "6"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "60"))
+LLM_RETRY_AFTER_MAX_SECONDS = float(os.getenv("LLM_RETRY_AFTER_MAX_SECONDS", "300"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "10"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+LLM_ADAPTIVE_CONCURRENCY = os.getenv("LLM_ADAPTIVE_CONCURRENCY", "true").lower() in ("1", "true", "yes")
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", str(max(1, LLM_MAX_WORKERS // 2))))
+# How many posts pre_processor keeps in flight at once (bounds memory on large inputs)
+PROCESSING_WINDOW_POSTS = int(os.getenv("PROCESSING_WINDOW_POSTS", "200"))
+
+# Batched prompts: pack several posts/comments into one LLM call
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "false").lower() in ("1", "true", "yes")
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "8000"))
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "20"))
+
+# Token budgets: per-item input cap (longer items keep the sentences around product mentions)
+# and an optional cap on input tokens for a whole run (0 = unlimited)
+LLM_MAX_INPUT_TOKENS_PER_ITEM = int(os.getenv("LLM_MAX_INPUT_TOKENS_PER_ITEM", "500"))
+LLM_RUN_TOKEN_BUDGET = int(os.getenv("LLM_RUN_TOKEN_BUDGET", "0")) or None
+TOKEN_USAGE_REPORT_PATH = os.path.join(PROCESSED_DATA_DIR, "token_usage.json")
+
+# Sharded runs (src/sharding.py): SHARD_COUNT partitions of the work, run SHARD_WORKERS at a time on a local
+# process pool (or one shard per invocation, e.g. on several nodes sharing DATA_DIR), under SHARDS_DIR/<count>/
+SHARDS_DIR = os.path.join(DATA_DIR, "shards")
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", str(os.cpu_count() or 1)))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(SHARD_COUNT)))
+
+# Streaming pipeline (src/pipeline.py): bounded queue size between stages, LLM worker threads,
+# and how often aggregates are flushed (every N posts or S seconds, whichever comes first)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+PIPELINE_PROCESS_WORKERS = int(os.getenv("PIPELINE_PROCESS_WORKERS", str(LLM_MAX_WORKERS)))
+PIPELINE_AGGREGATE_BATCH = int(os.getenv("PIPELINE_AGGREGATE_BATCH", "50"))
+PIPELINE_SNAPSHOT_SECONDS = float(os.getenv("PIPELINE_SNAPSHOT_SECONDS", "30"))
+
+# Metrics (src/common/metrics.py): each job writes <job>.prom (Prometheus textfile format) and a <job>.json run summary
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(PROCESSED_DATA_DIR, "metrics"))
+
+# Persistent LLM classification cache
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(PROCESSED_DATA_DIR, "llm_cache.sqlite"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500000"))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "90"))
+
+# Report rendering (plotter): output formats, worker processes, and the manifest of rendered chart inputs
+REPORT_FORMATS = tuple(fmt.strip() for fmt in os.getenv("REPORT_FORMATS", "png,svg,html").split(",") if fmt.strip())
+REPORT_MAX_WORKERS = int(os.getenv("REPORT_MAX_WORKERS", str(os.cpu_count() or 1)))
+REPORT_MANIFEST_PATH = os.path.join(REPORTS_DIR, "manifest.json")
 
 # Search terms
 QUERIES = [
     "SentinelOne OR S1 OR Sentinel 1 OR Sentinel one OR Sentinel-1 OR Sentinel-one OR Sentinel1",
-    "Guardz"
+    "Guardz",
     "CrowdStrike",
     "Sophos",
     "Carbon Black",
     "Cylance",
     "Trend Micro",
 ]
+
+# Alias table for the local relevance pre-filter: canonical product name -> other ways people write it.
+# Aliases from QUERIES ("A OR B OR C") are added automatically, with the first term as the canonical name.
+COMPETITOR_ALIASES = {
+    "SentinelOne": ["SentinelOne", "Sentinel One", "Sentinel-One", "Sentinel1", "Sentinel 1", "S1", "S1 Complete",
+                    "Singularity", "Vigilance"],
+    "CrowdStrike": ["CrowdStrike", "Crowd Strike", "CS Falcon", "Falcon Complete", "Falcon"],
+    "Huntress": ["Huntress", "Huntress EDR", "Huntress MDR"],
+    "Sophos": ["Sophos", "Intercept X", "Sophos MDR"],
+    "Carbon Black": ["Carbon Black", "CarbonBlack", "VMware Carbon Black", "CB Defense"],
+    "Cylance": ["Cylance", "CylancePROTECT", "BlackBerry Cylance"],
+    "Trend Micro": ["Trend Micro", "TrendMicro", "Vision One"],
+    "Guardz": ["Guardz"],
+    "Microsoft Defender": ["Microsoft Defender", "Defender for Endpoint", "Defender for Business", "MDE", "MS Defender",
+                           "Defender"],
+    "Bitdefender": ["Bitdefender", "GravityZone"],
+    "ESET": ["ESET"],
+    "Webroot": ["Webroot"],
+    "Malwarebytes": ["Malwarebytes", "ThreatDown"],
+    "Fortinet": ["Fortinet", "FortiEDR", "FortiClient"],
+    "Blackpoint": ["Blackpoint", "Blackpoint Cyber", "SNAP-Defense"],
+    "Datto EDR": ["Datto EDR", "Datto AV", "Infocyte"],
+    "ConnectWise": ["ConnectWise", "CW EDR"],
+    "Arctic Wolf": ["Arctic Wolf"],
+    "Todyl": ["Todyl"],
+}
+
+# Competitor names returned by the LLM that match no alias exactly are fuzzy-matched at this similarity (0-1)
+COMPETITOR_FUZZY_CUTOFF = float(os.getenv("COMPETITOR_FUZZY_CUTOFF", "0.85"))
+
+# Local relevance pre-filter: skip the LLM for content that names none of the products above
+RELEVANCE_FILTER_ENABLED = os.getenv("RELEVANCE_FILTER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Also send comments to the LLM when their parent post matched (catches "we love it" replies, saves less)
+RELEVANCE_FILTER_INHERIT_POST = os.getenv("RELEVANCE_FILTER_INHERIT_POST", "false").lower() in ("1", "true", "yes")
+
+# Near-duplicate index (src/data_processing/near_duplicates.py): content whose SimHash is within
+# NEAR_DUPLICATE_MAX_DISTANCE bits (of 64) of already classified content reuses that classification.
+# Content shorter than NEAR_DUPLICATE_MIN_WORDS words ("+1", "thanks") is always classified on its own.
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() in ("1", "true", "yes")
+NEAR_DUPLICATE_INDEX_PATH = os.getenv(
+    "NEAR_DUPLICATE_INDEX_PATH", os.path.join(PROCESSED_DATA_DIR, "near_duplicates.sqlite")
+)
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "3"))
+NEAR_DUPLICATE_MIN_WORDS = int(os.getenv("NEAR_DUPLICATE_MIN_WORDS", "12"))
+NEAR_DUPLICATE_MAX_AGE_DAYS = float(os.getenv("NEAR_DUPLICATE_MAX_AGE_DAYS", "90"))
+
+# Classification cascade (src/data_processing/local_classifier.py): a local Naive Bayes model, trained from earlier
+# LLM classifications, labels the content it is confident about; the rest escalates to the LLM. Content escalates
+# when either confidence is below its threshold or the model gives it CASCADE_ACTION_ESCALATE_PROBABILITY or more of
+# needing action. Off until a model is trained (`python -m src.data_processing.local_classifier`).
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "false").lower() in ("1", "true", "yes")
+LOCAL_CLASSIFIER_MODEL_PATH = os.getenv(
+    "LOCAL_CLASSIFIER_MODEL_PATH", os.path.join(PROCESSED_DATA_DIR, "local_classifier.json")
+)
+CASCADE_SENTIMENT_MIN_CONFIDENCE = float(os.getenv("CASCADE_SENTIMENT_MIN_CONFIDENCE", "0.85"))
+CASCADE_TONE_MIN_CONFIDENCE = float(os.getenv("CASCADE_TONE_MIN_CONFIDENCE", "0.7"))
+CASCADE_ACTION_ESCALATE_PROBABILITY = float(os.getenv("CASCADE_ACTION_ESCALATE_PROBABILITY", "0.1"))
+CASCADE_AGREEMENT_REPORT_PATH = os.path.join(PROCESSED_DATA_DIR, "cascade_agreement.json")
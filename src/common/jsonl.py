@@ -0,0 +1,203 @@
+import json
+import os
+import time
+from typing import Iterable, Iterator, Optional
+
+from src.common.constants import FOLLOW_IDLE_TIMEOUT_SECONDS
+from src.common.logger import get_logger
+from src.common.metrics import metrics, FAST_BUCKETS
+
+logger = get_logger(__name__)
+
+READ_CHUNK_SIZE = 1 << 16
+
+
+def iter_records(path: str, legacy_path: Optional[str] = None) -> Iterator[dict]:
+    """
+    Lazily yields the records stored at `path`, one at a time.
+    Reads JSONL (one JSON object per line) as well as legacy files holding a single JSON array.
+    If `path` doesn't exist but `legacy_path` does, the legacy file is read instead.
+    """
+    path = resolve_input_path(path, legacy_path)
+    with open(path, "r", encoding="utf-8") as f:
+        if _is_json_array(f):
+            yield from _iter_json_array(f)
+            return
+
+        for line_number, line in enumerate(f, start=1):
+            record = _decode_line(line, line_number, path)
+            if record is not None:
+                yield record
+
+
+def resolve_input_path(path: str, legacy_path: Optional[str] = None) -> str:
+    if not os.path.exists(path) and legacy_path and os.path.exists(legacy_path):
+        logger.info(f"{path} not found, reading legacy file {legacy_path}")
+        return legacy_path
+    return path
+
+
+def follow_records(
+        path: str,
+        poll_interval: float = 0.5,
+        idle_timeout: float = FOLLOW_IDLE_TIMEOUT_SECONDS
+) -> Iterator[dict]:
+    """
+    Like iter_records for a JSONL file that is still being written: yields records as they are appended,
+    and stops once the producer has called mark_complete(path) and every record has been read.
+    Unreadable lines are skipped, as by iter_records. Raises TimeoutError if the file doesn't appear, or stops
+    growing, for `idle_timeout` seconds without being marked complete (e.g. the producer died); 0 waits forever.
+    """
+    last_progress = time.monotonic()
+
+    def wait():
+        if idle_timeout and time.monotonic() - last_progress > idle_timeout:
+            raise TimeoutError(f"No new data in {path} for {idle_timeout:.0f}s and it isn't marked complete")
+        time.sleep(poll_interval)
+
+    while not os.path.exists(path):
+        wait()
+
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        line_number = 0
+        while True:
+            # Check for completion before reading, so nothing written before the marker is missed
+            finished = is_complete(path)
+            chunk = f.read(READ_CHUNK_SIZE)
+            if chunk:
+                last_progress = time.monotonic()
+                buffer += chunk
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    line_number += 1
+                    record = _decode_line(line, line_number, path)
+                    if record is not None:
+                        yield record
+                continue
+            if finished:
+                record = _decode_line(buffer, line_number + 1, path)
+                if record is not None:
+                    yield record
+                return
+            wait()
+
+
+def _decode_line(line: str, line_number: int, path: str) -> Optional[dict]:
+    """
+    The record on a JSONL line, or None for a blank or unreadable one (logged and counted).
+    """
+    line = line.strip()
+    if not line:
+        return None
+    started = time.perf_counter()
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        metrics.inc("jsonl_parse_failures_total")
+        logger.warning(f"Skipping unreadable line {line_number} in {path}")
+        return None
+    metrics.observe("jsonl_parse_seconds", time.perf_counter() - started, FAST_BUCKETS)
+    return record
+
+
+class JsonlWriter:
+    """
+    Writes records one per line, flushing after each so readers can consume the file while it grows.
+    Clears the completion marker on open and sets it on a clean close.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.count = 0
+        _clear_complete(path)
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, record: dict):
+        started = time.perf_counter()
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        metrics.observe("jsonl_write_seconds", time.perf_counter() - started, FAST_BUCKETS)
+        self.count += 1
+
+    def write_all(self, records: Iterable[dict]) -> int:
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def close(self, complete: bool = True):
+        if self._file.closed:
+            return
+        self._file.close()
+        if complete:
+            mark_complete(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
+
+
+def write_records(path: str, records: Iterable[dict]) -> int:
+    """
+    Streams `records` to a JSONL file at `path`. Returns the number of records written.
+    """
+    with JsonlWriter(path) as writer:
+        return writer.write_all(records)
+
+
+def mark_complete(path: str):
+    with open(_complete_marker(path), "w", encoding="utf-8"):
+        pass
+
+
+def is_complete(path: str) -> bool:
+    return os.path.exists(_complete_marker(path))
+
+
+def _clear_complete(path: str):
+    if is_complete(path):
+        os.remove(_complete_marker(path))
+
+
+def _complete_marker(path: str) -> str:
+    return path + ".complete"
+
+
+def _is_json_array(f) -> bool:
+    """
+    Peeks at the first non-whitespace character to tell a legacy JSON array from JSONL.
+    """
+    position = f.tell()
+    while True:
+        char = f.read(1)
+        if not char or not char.isspace():
+            break
+    f.seek(position)
+    return char == "["
+
+
+def _iter_json_array(f) -> Iterator[dict]:
+    """
+    Incrementally decodes the elements of a top-level JSON array without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(READ_CHUNK_SIZE).lstrip()[1:]  # drop the opening "["
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield record
+        buffer = buffer[end:]
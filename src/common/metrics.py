@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Optional
+
+from src.common.constants import METRICS_ENABLED, METRICS_DIR
+
+# Upper bounds (seconds) for network calls and for per-record (de)serialization
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram: an observation costs a bisect and two additions.
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate of the q-quantile (0-1), interpolated linearly inside the bucket it falls in.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.max
+
+
+class MetricsRegistry:
+    """
+    In-process counters, gauges and histograms, keyed by name and labels, written out as a Prometheus text file
+    (for the node_exporter textfile collector) and a run summary JSON.
+    Every update takes one lock, so it is cheap enough to leave on; with `enabled=False` updates are no-ops.
+
+    Stage throughput is recorded with `record_stage(stage, items, seconds)` and reported as items per second.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        """
+        Sets gauge `name` (a value that goes up and down, e.g. the current concurrency limit).
+        """
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, buckets: tuple = LATENCY_BUCKETS, **labels):
+        """
+        Observes the duration of the block (in seconds) into histogram `name`, even if it raises.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, buckets, **labels)
+
+    def record_stage(self, stage: str, items: int, seconds: float):
+        self.inc("stage_items_total", items, stage=stage)
+        self.inc("stage_seconds_total", seconds, stage=stage)
+
+    def summary(self, job: str) -> dict:
+        """
+        The run summary: counters, histogram percentiles (estimated from buckets) and items/s per stage.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {
+                key: {
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "mean": round(h.sum / h.count, 6) if h.count else 0.0,
+                    "p50": round(h.quantile(0.5), 6),
+                    "p99": round(h.quantile(0.99), 6),
+                    "max": round(h.max, 6)
+                }
+                for key, h in self._histograms.items()
+            }
+
+        stages = {}
+        for (name, labels), value in counters.items():
+            if name in ("stage_items_total", "stage_seconds_total"):
+                stage = stages.setdefault(dict(labels)["stage"], {"items": 0, "seconds": 0.0})
+                stage["items" if name == "stage_items_total" else "seconds"] += value
+        for stage in stages.values():
+            stage["seconds"] = round(stage["seconds"], 3)
+            stage["items_per_second"] = round(stage["items"] / stage["seconds"], 2) if stage["seconds"] else 0.0
+
+        return {
+            "job": job,
+            "started_at": self.started_at,
+            "duration_seconds": round(time.time() - self.started_at, 3),
+            "stages": stages,
+            "counters": {_series(name, labels): value for (name, labels), value in sorted(counters.items())},
+            "gauges": {_series(name, labels): value for (name, labels), value in sorted(gauges.items())},
+            "histograms": {_series(name, labels): value for (name, labels), value in sorted(histograms.items())}
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format. Histogram buckets are cumulative, as the format requires.
+        """
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (series_name, labels), value in sorted(series.items()):
+                        if series_name == name:
+                            lines.append(f"{_series(name, labels)} {value}")
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (series_name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if series_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{_series(name + '_bucket', labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{_series(name + '_sum', labels)} {h.sum}")
+                    lines.append(f"{_series(name + '_count', labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, job: str, out_dir: str = METRICS_DIR) -> Optional[str]:
+        """
+        Writes <job>.prom and <job>.json into `out_dir` (atomically, so scrapers never see a partial file).
+        Returns the summary path, or None when metrics are disabled.
+        """
+        if not self.enabled:
+            return None
+        os.makedirs(out_dir, exist_ok=True)
+        _write_atomic(os.path.join(out_dir, f"{job}.prom"), self.to_prometheus())
+        summary_path = os.path.join(out_dir, f"{job}.json")
+        _write_atomic(summary_path, json.dumps(self.summary(job), indent=2))
+        return summary_path
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _series(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return f"{name}{{{rendered}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path: str, content: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+# Shared by every module of a process
+metrics = MetricsRegistry()
@@ -0,0 +1,79 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket.
+    Holds up to `capacity` tokens and refills continuously at `refill_rate` tokens per second.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_rate)
+        self._last_refill = now
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """
+        Take `amount` tokens if they are available.
+        Returns 0 on success, otherwise the number of seconds to wait before retrying.
+        """
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.refill_rate
+
+    def acquire(self, amount: float = 1.0):
+        """
+        Block until `amount` tokens are available, then take them.
+        """
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Shared limiter for LLM calls, enforcing both requests-per-minute and tokens-per-minute quotas.
+    Bursts are capped at `burst_seconds` worth of quota so we don't blow through a whole minute at start-up.
+    """
+
+    def __init__(
+            self,
+            requests_per_minute: float,
+            tokens_per_minute: Optional[float] = None,
+            burst_seconds: float = 10.0
+    ):
+        self.requests = TokenBucket(
+            capacity=max(1.0, requests_per_minute * burst_seconds / 60.0),
+            refill_rate=requests_per_minute / 60.0
+        )
+        self.tokens = None
+        if tokens_per_minute:
+            self.tokens = TokenBucket(
+                capacity=max(1.0, tokens_per_minute * burst_seconds / 60.0),
+                refill_rate=tokens_per_minute / 60.0
+            )
+
+    def acquire(self, tokens: float = 0):
+        """
+        Block until one request (and `tokens` tokens, if a token quota is set) can be sent.
+        """
+        self.requests.acquire(1)
+        if self.tokens is not None and tokens > 0:
+            self.tokens.acquire(tokens)
@@ -1,31 +1,200 @@
 import json
+import os
+import sys
+from datetime import datetime, time, timezone
 from pathlib import Path
+from typing import Optional
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-ANALYSIS_RESULTS_PATH = Path(__file__).parent.parent.parent / "data/processed/analysis_results.json"
+# `streamlit run` only puts this file's folder on sys.path; make the `src` package importable
+ROOT_DIR = Path(__file__).parent.parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from src.common.constants import (  # noqa: E402
+    ANALYSIS_RESULTS_PATH,
+    ACTIONABLE_ITEMS_PATH,
+    ANALYTICS_DB_PATH,
+    TRENDS_PATH
+)
+from src.common.jsonl import iter_records  # noqa: E402
+from src.data_processing.analytics_store import AnalyticsStore  # noqa: E402
+from src.data_processing.trends import DAY, WEEK, load_trends  # noqa: E402
+
+ACTIONABLE_COLUMNS = ["type", "post_id", "comment_id", "author", "title", "action_reason", "suggested_response"]
+PAGE_SIZES = [25, 50, 100, 250]
+TREND_TOP_COMPETITORS = 5
 
 
 def load_analysis_data(filepath: str):
     with open(filepath, "r", encoding="utf-8") as f:
         data = json.load(f)
+
+    # Legacy analysis files hold the actionable items inline
+    if "actionable_items" not in data:
+        data["actionable_items"] = []
+        if os.path.exists(ACTIONABLE_ITEMS_PATH):
+            data["actionable_items"] = list(iter_records(ACTIONABLE_ITEMS_PATH))
     return data
 
 
+def file_signature(path: str) -> Optional[tuple]:
+    """
+    (mtime, size) of a file, or None if it doesn't exist. Used as a cache key, so a re-run of
+    post_processor invalidates the cached view model while Streamlit reruns reuse it.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@st.cache_resource(max_entries=4, show_spinner="Loading analysis...")
+def load_view_model(analysis_path: str, analysis_signature: tuple, actionable_signature: Optional[tuple]) -> dict:
+    """
+    Loads the analysis once per version of the files and precomputes everything the page renders.
+    The signatures are only there to key the cache. The result is shared across sessions and must not be mutated.
+    """
+    analysis = load_analysis_data(analysis_path)
+    main_findings = analysis["main_findings"]
+
+    sentiment = pd.DataFrame(
+        list(main_findings.get("s1_sentiment_distribution", {}).items()), columns=["Sentiment", "Count"]
+    )
+    competitors = pd.DataFrame(main_findings.get("competitors_mentioned_summary", []))
+
+    actionable = pd.DataFrame(analysis["actionable_items"], columns=ACTIONABLE_COLUMNS).fillna("")
+    # Lowercased once here, so the author search is a single vectorized scan per rerun
+    actionable["author_lower"] = actionable["author"].str.lower()
+
+    return {
+        "main_findings": main_findings,
+        "sentiment": sentiment,
+        "competitors": competitors,
+        "actionable": actionable
+    }
+
+
+@st.cache_resource(max_entries=4, show_spinner="Loading trends...")
+def load_trend_frames(path: str, signature: tuple) -> dict:
+    """
+    The exported trend series (see trends.write_trends) as long-format frames, one set per view
+    ("Daily", "Weekly" and the rolling window). Cached per version of the file; must not be mutated.
+    """
+    trends = load_trends(path)
+    views = {"Daily": trends[DAY], "Weekly": trends[WEEK], f"Rolling {trends['rolling_days']} days": trends["rolling"]}
+    frames = {}
+    for view, points in views.items():
+        sentiment = pd.DataFrame(
+            [(point["window_start"], sentiment, count) for point in points
+             for sentiment, count in point["sentiment"].items()],
+            columns=["Window", "Sentiment", "Count"]
+        )
+        share = pd.DataFrame(
+            [(point["window_start"], competitor, point["competitors"][competitor], share) for point in points
+             for competitor, share in point["competitor_share"].items()],
+            columns=["Window", "Competitor", "Mentions", "Share"]
+        )
+        top_competitors = share.groupby("Competitor")["Mentions"].sum().nlargest(TREND_TOP_COMPETITORS).index
+        frames[view] = {"sentiment": sentiment, "share": share[share["Competitor"].isin(top_competitors)]}
+    return frames
+
+
+@st.cache_resource
+def get_store(path: str) -> AnalyticsStore:
+    return AnalyticsStore(path)
+
+
+def store_signature(path: str) -> tuple:
+    # Writes land in the WAL file first, so both files make up the store's version
+    return file_signature(path), file_signature(path + "-wal")
+
+
+@st.cache_data(max_entries=256)
+def query_findings(path: str, signature: tuple, filters: tuple) -> dict:
+    """
+    Main findings for a slice of the data, from indexed queries on the analytics store.
+    """
+    return get_store(path).findings(**dict(filters))
+
+
+def sidebar_filters(store: AnalyticsStore) -> dict:
+    """
+    Renders the slicing widgets and returns the selected analytics store filters (empty if none).
+    """
+    st.sidebar.header("Slice the data")
+    filters = {}
+
+    first_utc, last_utc = store.date_range()
+    if first_utc is not None:
+        first_day = datetime.fromtimestamp(first_utc, tz=timezone.utc).date()
+        last_day = datetime.fromtimestamp(last_utc, tz=timezone.utc).date()
+        selected = st.sidebar.date_input("Date range (UTC):", (first_day, last_day), first_day, last_day)
+        if len(selected) == 2 and (selected[0], selected[1]) != (first_day, last_day):
+            filters["since"] = datetime.combine(selected[0], time.min, tzinfo=timezone.utc).timestamp()
+            filters["until"] = datetime.combine(selected[1], time.max, tzinfo=timezone.utc).timestamp()
+
+    for label, column, key in [
+        ("Search query:", "query", "query"),
+        ("Competitor:", "competitor", "competitor_id"),
+        ("S1 sentiment:", "sentiment", "sentiment")
+    ]:
+        value = st.sidebar.selectbox(label, ["All"] + store.distinct_values(column))
+        if value != "All":
+            filters[key] = value
+
+    author = st.sidebar.text_input("Author (exact):", "").strip()
+    if author:
+        filters["author"] = author
+    return filters
+
+
+def filter_actionable(actionable: pd.DataFrame, filter_type: str, search_author: str) -> pd.DataFrame:
+    mask = np.ones(len(actionable), dtype=bool)
+    if filter_type != "All":
+        mask &= (actionable["type"] == filter_type).to_numpy()
+    if search_author:
+        # The author search only narrows down comments
+        mask &= (
+                (actionable["type"] != "comment")
+                | actionable["author_lower"].str.contains(search_author.lower(), regex=False)
+        ).to_numpy()
+    return actionable[mask]
+
+
 def main():
     st.title("SentinelOne Analysis Dashboard")
 
     # Load Data
-    try:
-        analysis = load_analysis_data(ANALYSIS_RESULTS_PATH)
-    except FileNotFoundError:
+    analysis_signature = file_signature(ANALYSIS_RESULTS_PATH)
+    if analysis_signature is None:
         st.error(f"File {ANALYSIS_RESULTS_PATH} not found. Please place your analysis JSON in this file path.")
         return
 
-    main_findings = analysis["main_findings"]
-    actionable_items = analysis["actionable_items"]
+    # With the analytics store, every view (sliced or not) is a query on it, so the findings and the actionable
+    # items always describe the same items; without it, the precomputed analysis output is used as is
+    store = get_store(ANALYTICS_DB_PATH) if os.path.exists(ANALYTICS_DB_PATH) else None
+    filters = sidebar_filters(store) if store is not None else {}
+
+    if store is not None:
+        main_findings = query_findings(
+            ANALYTICS_DB_PATH, store_signature(ANALYTICS_DB_PATH), tuple(sorted(filters.items()))
+        )
+        df_sentiment = pd.DataFrame(list(main_findings["s1_sentiment_distribution"].items()),
+                                    columns=["Sentiment", "Count"])
+        df_comps = pd.DataFrame(main_findings["competitors_mentioned_summary"])
+        num_actionable = store.count_actionable_items(**filters)
+    else:
+        view = load_view_model(ANALYSIS_RESULTS_PATH, analysis_signature, file_signature(ACTIONABLE_ITEMS_PATH))
+        main_findings = view["main_findings"]
+        df_sentiment = view["sentiment"]
+        df_comps = view["competitors"]  # columns: competitor, competitor_id, mentions
+        num_actionable = len(view["actionable"])
 
     # Display Main Findings as KPIs
     st.header("Main Findings")
@@ -39,22 +208,44 @@ def main():
         st.metric("Posts With S1 Mentioned", main_findings.get("posts_with_s1_mentioned", 0))
     with col4:
         # Number of actionable items
-        num_actionable = len(actionable_items)
         st.metric("Actionable Items", num_actionable)
 
+    if "llm_calls_saved_by_filter" in main_findings:
+        total_items = main_findings.get("total_posts", 0) + main_findings.get("total_comments", 0)
+        st.metric(
+            "LLM Calls Saved by Relevance Filter",
+            main_findings["llm_calls_saved_by_filter"],
+            help=f"Out of {total_items} posts and comments."
+        )
+
+    if main_findings.get("near_duplicate_items"):
+        st.metric(
+            "Near-Duplicates Reusing a Classification",
+            main_findings["near_duplicate_items"],
+            help="Cross-posts, bot messages and pasted text classified like their original, without an LLM call. "
+                 "They are not listed again as actionable items."
+        )
+
+    if main_findings.get("llm_calls_saved_by_cascade"):
+        st.metric(
+            "LLM Calls Saved by Local Classifier",
+            main_findings["llm_calls_saved_by_cascade"],
+            help="Sentiment and tone from the local classifier, confident enough not to ask the LLM. "
+                 "These items have no summary."
+        )
+
+    if main_findings.get("llm_failed_items"):
+        st.warning(
+            f"{main_findings['llm_failed_items']} posts/comments couldn't be classified (the LLM calls failed) and "
+            "count as 'unknown'. Re-run pre_processor to retry them."
+        )
+
     # S1 Sentiment Distribution (Bar or Pie)
     st.subheader("SentinelOne Sentiment Distribution")
 
-    sentiment_dict = main_findings.get("s1_sentiment_distribution", {})
-    if not sentiment_dict:
+    if df_sentiment.empty:
         st.write("No sentiment data available.")
     else:
-        # Convert dict -> DataFrame for plotting
-        df_sentiment = pd.DataFrame([
-            {"Sentiment": k, "Count": v}
-            for k, v in sentiment_dict.items()
-        ])
-
         # Chart using Altair
         chart_sentiment = alt.Chart(df_sentiment).mark_bar().encode(
             x=alt.X("Sentiment", sort=None),
@@ -69,12 +260,9 @@ def main():
     # Competitor Mentions
     st.subheader("Top Competitor Mentions")
 
-    competitor_list = main_findings.get("competitors_mentioned_summary", [])
-    if not competitor_list:
+    if df_comps.empty:
         st.write("No competitor mentions available.")
     else:
-        # Convert list -> DataFrame
-        df_comps = pd.DataFrame(competitor_list)  # columns: competitor, mentions
         # Let user select how many top competitors to see
         top_n = st.slider("Select how many top competitors to display:", 5, 30, 10)
         df_top_comps = df_comps.head(top_n)
@@ -89,6 +277,81 @@ def main():
         )
         st.altair_chart(chart_comps, use_container_width=True)
 
+    # Trends: read from the windows materialized by post_processor/pipeline, never recomputed from the items
+    trends_signature = file_signature(TRENDS_PATH)
+    if trends_signature is not None:
+        st.header("Trends")
+        if filters:
+            st.caption("Trends cover all collected data; the sidebar filters don't apply to them.")
+        trend_frames = load_trend_frames(TRENDS_PATH, trends_signature)
+        trend_view = st.radio("Window:", list(trend_frames), index=1, horizontal=True)
+        df_trend_sentiment = trend_frames[trend_view]["sentiment"]
+        df_trend_share = trend_frames[trend_view]["share"]
+
+        st.subheader("SentinelOne Sentiment over Time")
+        if df_trend_sentiment.empty:
+            st.write("No dated posts or comments yet.")
+        else:
+            chart_trend_sentiment = alt.Chart(df_trend_sentiment).mark_line(point=True).encode(
+                x=alt.X("Window:T", title="Window start"),
+                y="Count",
+                color="Sentiment",
+                tooltip=["Window", "Sentiment", "Count"]
+            ).properties(
+                height=300
+            )
+            st.altair_chart(chart_trend_sentiment, use_container_width=True)
+
+        st.subheader("Competitor Share of Voice")
+        if df_trend_share.empty:
+            st.write("No competitor mentions available.")
+        else:
+            chart_trend_share = alt.Chart(df_trend_share).mark_line(point=True).encode(
+                x=alt.X("Window:T", title="Window start"),
+                y=alt.Y("Share", axis=alt.Axis(format="%")),
+                color="Competitor",
+                tooltip=["Window", "Competitor", "Mentions", alt.Tooltip("Share", format=".1%")]
+            ).properties(
+                height=300
+            )
+            st.altair_chart(chart_trend_share, use_container_width=True)
+
+    # Competitor Drill-down: an indexed query on the analytics store, for the current slice, one page at a time
+    if store is not None and not df_comps.empty:
+        st.subheader("Competitor Drill-down")
+        competitor_names = dict(zip(df_comps["competitor_id"], df_comps["competitor"]))
+        selected_id = st.selectbox(
+            "Select a competitor:",
+            list(competitor_names),
+            format_func=lambda competitor: competitor_names[competitor]
+        )
+        # The selected competitor takes the place of the sidebar's
+        drill_filters = {key: value for key, value in filters.items() if key != "competitor_id"}
+        counts = store.count_items(competitor_id=selected_id, **drill_filters)
+        st.write(
+            f"{competitor_names[selected_id]} is mentioned in {counts['post']} post(s) "
+            f"and {counts['comment']} comment(s)."
+        )
+
+        page_col, size_col = st.columns(2)
+        with size_col:
+            drill_page_size = st.selectbox("Mentions per page:", PAGE_SIZES)
+        drill_pages = max(1, (counts["post"] + counts["comment"] - 1) // drill_page_size + 1)
+        with page_col:
+            drill_page = st.number_input(f"Page (of {drill_pages}):", min_value=1, max_value=drill_pages, value=1,
+                                         key="drill_down_page")
+        rows = store.competitor_items(
+            selected_id, drill_page_size, (drill_page - 1) * drill_page_size, **drill_filters
+        )
+        st.dataframe(
+            pd.DataFrame(rows, columns=["type", "post_id", "comment_id", "action_reason"]).fillna("").rename(
+                columns={"type": "Type", "post_id": "Post ID", "comment_id": "Comment ID",
+                         "action_reason": "Action Reason"}
+            ),
+            use_container_width=True,
+            hide_index=True
+        )
+
     # Actionable Items Section
     st.header("Actionable Items")
     st.markdown(
@@ -101,43 +364,53 @@ def main():
         filter_type = st.selectbox("Filter by type:", ["All", "post", "comment"])
         search_author = st.text_input("Search by author (for comments only):", "").strip()
 
-        # Build a simple table or expanders
-        filtered_items = []
-
-        for item in actionable_items:
-            # If user selects "All", show everything
-            # else show only if matches item["type"]
-            if filter_type != "All" and item["type"] != filter_type:
-                continue
-            # If searching for author, only show if comment has matching author
-            if search_author and item["type"] == "comment":
-                if search_author.lower() not in item.get("author", "").lower():
-                    continue
-
-            filtered_items.append(item)
+        if store is not None:
+            kind = None if filter_type == "All" else filter_type
+            num_filtered = store.count_actionable_items(author_contains=search_author, kind=kind, **filters)
+        else:
+            filtered_items = filter_actionable(view["actionable"], filter_type, search_author)
+            num_filtered = len(filtered_items)
 
-        if not filtered_items:
+        if num_filtered == 0:
             st.write("No items match your current filters.")
         else:
-            st.write(f"Showing {len(filtered_items)} actionable item(s).")
+            # Server-side pagination: only the current page is sent to the browser
+            page_col, size_col = st.columns(2)
+            with size_col:
+                page_size = st.selectbox("Items per page:", PAGE_SIZES)
+            num_pages = (num_filtered - 1) // page_size + 1
+            with page_col:
+                page = st.number_input(f"Page (of {num_pages}):", min_value=1, max_value=num_pages, value=1)
+            start = (page - 1) * page_size
+            if store is not None:
+                page_items = pd.DataFrame(
+                    store.actionable_items(page_size, start, author_contains=search_author, kind=kind, **filters),
+                    columns=ACTIONABLE_COLUMNS
+                ).fillna("")
+            else:
+                page_items = filtered_items.iloc[start:start + page_size]
+
+            st.write(f"Showing {start + 1}-{start + len(page_items)} of {num_filtered} actionable item(s).")
+            # The data grid is virtualized, so only the visible rows are drawn
+            st.dataframe(page_items[ACTIONABLE_COLUMNS], use_container_width=True, hide_index=True)
 
-            # Display each item in an Expander
-            for i, item in enumerate(filtered_items, start=1):
+            # Display each item of the page in an Expander
+            for item in page_items.to_dict("records"):
                 # Build a title for the expander
                 if item["type"] == "post":
                     expander_label = f"Post {item['post_id']} | Reason: {item['action_reason']}"
                 else:
-                    expander_label = f"Comment {item.get('comment_id', '')} on Post {item['post_id']} (by {item.get('author', '')})"
+                    expander_label = f"Comment {item['comment_id']} on Post {item['post_id']} (by {item['author']})"
 
                 with st.expander(expander_label):
                     st.write(f"**Action Reason:** {item['action_reason']}")
                     st.write(f"**Suggested Response:** {item['suggested_response']}")
                     if item["type"] == "post":
                         # If it's a post, we can also show the title
-                        st.write(f"**Post Title:** {item.get('title', '')}")
+                        st.write(f"**Post Title:** {item['title']}")
                     else:
                         # If it's a comment, show the author
-                        st.write(f"**Author:** {item.get('author', '')}")
+                        st.write(f"**Author:** {item['author']}")
 
     st.success("Dashboard loaded successfully.")
 
@@ -1,13 +1,53 @@
+import glob
+import html
+import io
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from textwrap import wrap
 
-import matplotlib.pyplot as plt
+import matplotlib
 
-from src.common.constants import ANALYSIS_RESULTS_PATH, REPORTS_DIR
+# Headless: render straight to files, never open a window (safe for cron/CI jobs without a display)
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
 
+from src.common.cache import make_cache_key  # noqa: E402
+from src.common.constants import (  # noqa: E402
+    ANALYSIS_RESULTS_PATH,
+    ACTIONABLE_ITEMS_PATH,
+    ANALYTICS_DB_PATH,
+    REPORTS_DIR,
+    REPORT_FORMATS,
+    REPORT_MAX_WORKERS,
+    REPORT_MANIFEST_PATH,
+    TRENDS_PATH
+)
+from src.common.jsonl import iter_records  # noqa: E402
+from src.common.metrics import metrics  # noqa: E402
+from src.data_processing.analytics_store import AnalyticsStore  # noqa: E402
+from src.data_processing.trends import WEEK, load_trends, write_trends  # noqa: E402
 
-def main():
+# Bump when the rendering code changes, so every chart is re-rendered once
+RENDERER_VERSION = 1
+# Competitors drawn in the share-of-voice trend chart
+TREND_TOP_COMPETITORS = 5
+
+
+def main(
+        formats: tuple = REPORT_FORMATS,
+        per_competitor: bool = True,
+        per_week: bool = True,
+        max_workers: int = REPORT_MAX_WORKERS
+):
+    """
+    Renders the report charts into REPORTS_DIR, in every format of `formats` ("png", "svg", "html").
+    With the analytics store available, also renders a chart set per competitor, and from its trend windows
+    (TRENDS_PATH) a chart set per week and the weekly sentiment and share-of-voice trend charts.
+    Charts whose input hasn't changed since the last run (see REPORT_MANIFEST_PATH) are skipped.
+    """
     if not os.path.exists(ANALYSIS_RESULTS_PATH):
         print(f"Error: {ANALYSIS_RESULTS_PATH} not found.")
         return
@@ -16,68 +56,33 @@ def main():
         analysis = json.load(f)
 
     main_findings = analysis["main_findings"]
-    actionable_items = analysis["actionable_items"]
-
-    # Visualize S1 Sentiment Distribution
-    sentiment_dist = main_findings["s1_sentiment_distribution"]
-
-    # Prepare data for plotting
-    sentiments = list(sentiment_dist.keys())
-    counts = list(sentiment_dist.values())
-
-    plt.figure(figsize=(8, 5))
-    bars = plt.bar(sentiments, counts, color="teal")
-    plt.title("SentinelOne Sentiment Distribution", fontsize=16)
-    plt.xlabel("Sentiment Category")
-    plt.ylabel("Count")
-
-    for bar in bars:
-        height = bar.get_height()
-        plt.text(
-            bar.get_x() + bar.get_width() / 2.0,
-            height + 0.5,
-            f"{int(height)}",
-            ha="center",
-            va="bottom",
-            fontsize=10
-        )
-
-    plt.tight_layout()
-    plt.savefig(os.path.join(REPORTS_DIR, "sentiment_distribution.png"))  # Save the figure
-    plt.show()
-
-    # Visualize Competitor Mentions
-    competitors = main_findings[
-        "competitors_mentioned_summary"]
+    # Legacy analysis files hold the actionable items inline, newer ones stream them to their own file
+    if "actionable_items" in analysis:
+        actionable_items = analysis["actionable_items"]
+    elif os.path.exists(ACTIONABLE_ITEMS_PATH):
+        actionable_items = iter_records(ACTIONABLE_ITEMS_PATH)
+    else:
+        actionable_items = []
 
-    # Sort or filter out extremely low mentions if it’s too large
-    top_competitors = competitors[:10]
-
-    competitor_names = [item["competitor"] for item in top_competitors]
-    competitor_counts = [item["mentions"] for item in top_competitors]
-
-    plt.figure(figsize=(10, 6))
-    bars_comp = plt.bar(competitor_names, competitor_counts, color="cornflowerblue")
-    plt.title("Top 10 Competitor Mentions", fontsize=16)
-    plt.xlabel("Competitor")
-    plt.ylabel("Number of Mentions")
-    plt.xticks(rotation=45, ha="right")
-
-    # Add data labels
-    for bar in bars_comp:
-        height = bar.get_height()
-        plt.text(
-            bar.get_x() + bar.get_width() / 2.0,
-            height + 0.3,
-            f"{int(height)}",
-            ha="center",
-            va="bottom",
-            fontsize=9
-        )
+    specs = findings_chart_specs(main_findings, "")
+    if os.path.exists(ANALYTICS_DB_PATH):
+        if per_competitor:
+            specs += store_chart_specs()
+        trends = load_trends(TRENDS_PATH)
+        if trends is None:
+            # Exported by post_processor; a store filled before trends existed hasn't been exported yet
+            with AnalyticsStore(ANALYTICS_DB_PATH) as store:
+                trends = write_trends(store)
+        specs += trend_chart_specs(trends, per_week)
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(REPORTS_DIR, "competitor_mentions.png"))
-    plt.show()
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    started = time.perf_counter()
+    rendered, skipped = render_charts(specs, formats, REPORTS_DIR, max_workers)
+    write_index(specs, formats, REPORTS_DIR)
+    metrics.record_stage("render", rendered, time.perf_counter() - started)
+    metrics.inc("report_charts_skipped_total", skipped)
+    metrics.write("plotter")
+    print(f"Rendered {rendered} chart(s), {skipped} unchanged, into {REPORTS_DIR}")
 
     # Display a small "table" of actionable items
     # We can show in console or do a textual summary
@@ -100,5 +105,247 @@ def main():
     print("\nDone visualizing!")
 
 
+def findings_chart_specs(main_findings: dict, prefix: str, title_suffix: str = "") -> list[dict]:
+    """
+    The sentiment and competitor charts for a set of main findings.
+    A chart spec is plain data (picklable and hashable), so charts can be rendered in worker processes.
+    """
+    sentiment_dist = main_findings["s1_sentiment_distribution"]
+    # Sort or filter out extremely low mentions if it’s too large
+    top_competitors = main_findings["competitors_mentioned_summary"][:10]
+
+    return [
+        {
+            "name": f"{prefix}sentiment_distribution",
+            "title": f"SentinelOne Sentiment Distribution{title_suffix}",
+            "xlabel": "Sentiment Category",
+            "ylabel": "Count",
+            "labels": list(sentiment_dist.keys()),
+            "values": list(sentiment_dist.values()),
+            "color": "teal",
+            "figsize": [8, 5],
+            "rotate_labels": False
+        },
+        {
+            "name": f"{prefix}competitor_mentions",
+            "title": f"Top 10 Competitor Mentions{title_suffix}",
+            "xlabel": "Competitor",
+            "ylabel": "Number of Mentions",
+            "labels": [item["competitor"] for item in top_competitors],
+            "values": [item["mentions"] for item in top_competitors],
+            "color": "cornflowerblue",
+            "figsize": [10, 6],
+            "rotate_labels": True
+        }
+    ]
+
+
+def store_chart_specs() -> list[dict]:
+    """
+    Per-competitor chart sets, from indexed queries on the analytics store.
+    """
+    specs = []
+    with AnalyticsStore(ANALYTICS_DB_PATH) as store:
+        for competitor in store.competitor_summary():
+            findings = store.findings(competitor_id=competitor["competitor_id"])
+            specs += findings_chart_specs(
+                findings, f"competitors/{competitor['competitor_id']}_", f" ({competitor['competitor']})"
+            )
+    return specs
+
+
+def trend_chart_specs(trends: dict, per_week: bool) -> list[dict]:
+    """
+    The weekly sentiment and competitor share-of-voice trend charts, and with `per_week` a chart set per week,
+    all from the exported trend windows (see trends.write_trends), so their cost doesn't grow with the item count.
+    """
+    weeks = trends[WEEK]
+    if not weeks:
+        return []
+    labels = [point["window_start"] for point in weeks]
+    sentiments = sorted({sentiment for point in weeks for sentiment in point["sentiment"]})
+    mentions = {}
+    for point in weeks:
+        for competitor, count in point["competitors"].items():
+            mentions[competitor] = mentions.get(competitor, 0) + count
+    top_competitors = sorted(mentions, key=lambda competitor: (-mentions[competitor], competitor))
+    specs = [
+        {
+            "kind": "line",
+            "name": "trends/sentiment_weekly",
+            "title": "SentinelOne Sentiment per Week",
+            "xlabel": "Week starting",
+            "ylabel": "Count",
+            "labels": labels,
+            "series": {sentiment: [point["sentiment"].get(sentiment, 0) for point in weeks] for sentiment in sentiments},
+            "figsize": [10, 6],
+            "rotate_labels": True
+        },
+        {
+            "kind": "line",
+            "name": "trends/competitor_share_weekly",
+            "title": "Competitor Share of Voice per Week",
+            "xlabel": "Week starting",
+            "ylabel": "Share of Mentions",
+            "labels": labels,
+            "series": {
+                competitor: [point["competitor_share"].get(competitor, 0) for point in weeks]
+                for competitor in top_competitors[:TREND_TOP_COMPETITORS]
+            },
+            "figsize": [10, 6],
+            "rotate_labels": True
+        }
+    ]
+
+    if per_week:
+        for point in weeks:
+            if point["posts"] + point["comments"] == 0:
+                continue
+            week = datetime.fromtimestamp(point["window_start_utc"], tz=timezone.utc).strftime("%G-W%V")
+            findings = {
+                "s1_sentiment_distribution": dict(sorted(point["sentiment"].items(), key=lambda x: (-x[1], x[0]))),
+                "competitors_mentioned_summary": [
+                    {"competitor": competitor, "mentions": count}
+                    for competitor, count in sorted(point["competitors"].items(), key=lambda x: (-x[1], x[0]))
+                ]
+            }
+            specs += findings_chart_specs(findings, f"weeks/{week}_", f" ({week})")
+    return specs
+
+
+def render_charts(specs: list[dict], formats: tuple, out_dir: str, max_workers: int = REPORT_MAX_WORKERS):
+    """
+    Renders the charts whose spec changed since the last run, across a process pool, and deletes the files of
+    charts no longer in `specs` (a competitor or week that dropped out). Returns (rendered, skipped) counts.
+    """
+    manifest = _load_manifest()
+    names = {spec["name"] for spec in specs}
+    for name in [name for name in manifest if name not in names]:
+        for path in glob.glob(glob.escape(os.path.join(out_dir, name)) + ".*"):
+            os.remove(path)
+        del manifest[name]
+    pending = []
+    for spec in specs:
+        input_hash = make_cache_key(RENDERER_VERSION, spec, list(formats))
+        outputs = [os.path.join(out_dir, f"{spec['name']}.{fmt}") for fmt in formats]
+        if manifest.get(spec["name"]) == input_hash and all(os.path.exists(path) for path in outputs):
+            continue
+        pending.append((spec, input_hash))
+
+    if max_workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(render_chart, [spec for spec, _ in pending], [formats] * len(pending),
+                              [out_dir] * len(pending), chunksize=8))
+    else:
+        for spec, _ in pending:
+            render_chart(spec, formats, out_dir)
+
+    # Only record charts once they're on disk, so an interrupted run re-renders what it missed
+    for spec, input_hash in pending:
+        manifest[spec["name"]] = input_hash
+    _save_manifest(manifest)
+    return len(pending), len(specs) - len(pending)
+
+
+def render_chart(spec: dict, formats: tuple, out_dir: str) -> list[str]:
+    """
+    Draws one chart (a bar chart, or a line chart for specs of kind "line") and writes it in each of `formats`.
+    Returns the written paths.
+    """
+    # Fixed margins instead of tight_layout(), which costs an extra draw per chart
+    fig, ax = plt.subplots(figsize=spec["figsize"])
+    fig.subplots_adjust(left=0.1, right=0.97, top=0.9, bottom=0.25 if spec["rotate_labels"] else 0.12)
+    if spec.get("kind") == "line":
+        for name, values in spec["series"].items():
+            ax.plot(spec["labels"], values, marker="o", markersize=3, label=name)
+        if spec["series"]:
+            ax.legend(fontsize=9)
+    else:
+        bars = ax.bar(spec["labels"], spec["values"], color=spec["color"])
+        # Add data labels
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(
+                bar.get_x() + bar.get_width() / 2.0,
+                height,
+                f"{int(height)}",
+                ha="center",
+                va="bottom",
+                fontsize=9
+            )
+    ax.set_title(spec["title"], fontsize=16)
+    ax.set_xlabel(spec["xlabel"])
+    ax.set_ylabel(spec["ylabel"])
+    if spec["rotate_labels"]:
+        plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+
+    paths = []
+    base_path = os.path.join(out_dir, spec["name"])
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    svg = None
+    for fmt in formats:
+        path = f"{base_path}.{fmt}"
+        if fmt in ("svg", "html"):
+            # Drawn once, shared by the .svg file and the page embedding it
+            if svg is None:
+                buffer = io.StringIO()
+                fig.savefig(buffer, format="svg")
+                svg = buffer.getvalue()
+            if fmt == "svg":
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(svg)
+            else:
+                _write_html(path, spec, svg)
+        else:
+            fig.savefig(path, format=fmt)
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def write_index(specs: list[dict], formats: tuple, out_dir: str):
+    """
+    Writes index.html linking every chart of the report.
+    """
+    fmt = "html" if "html" in formats else formats[0]
+    links = "\n".join(
+        f'<li><a href="{html.escape(spec["name"])}.{fmt}">{html.escape(spec["title"])}</a></li>' for spec in specs
+    )
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Report</title></head>"
+                f"<body><h1>Report</h1><ul>\n{links}\n</ul></body></html>\n")
+
+
+def _write_html(path: str, spec: dict, svg: str):
+    # The chart inline as SVG, plus its data as a table (a column per series for line charts)
+    series = spec["series"] if spec.get("kind") == "line" else {spec["ylabel"]: spec["values"]}
+    header = "".join(f"<th>{html.escape(str(name))}</th>" for name in series)
+    rows = "".join(
+        f"<tr><td>{html.escape(str(label))}</td>{''.join(f'<td>{values[i]}</td>' for values in series.values())}</tr>"
+        for i, label in enumerate(spec["labels"])
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(spec['title'])}</title></head>"
+            f"<body>{svg[svg.index('<svg'):]}"
+            f"<table><tr><th>{html.escape(spec['xlabel'])}</th>{header}</tr>{rows}"
+            f"</table></body></html>\n"
+        )
+
+
+def _load_manifest() -> dict:
+    if not os.path.exists(REPORT_MANIFEST_PATH):
+        return {}
+    with open(REPORT_MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest: dict):
+    tmp_path = REPORT_MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, REPORT_MANIFEST_PATH)
+
+
 if __name__ == "__main__":
     main()
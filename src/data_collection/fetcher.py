@@ -1,11 +1,35 @@
-import json
+import asyncio
 import os
 import time
 
 from dotenv import load_dotenv
 
-from src.common.constants import RAW_MSP_DATA_PATH, QUERIES, SUBREDDIT_NAME, MAX_POSTS
+from src.common.cache import SQLiteCache
+from src.common.constants import (
+    RAW_MSP_DATA_PATH,
+    QUERIES,
+    SUBREDDITS,
+    MAX_POSTS,
+    MAX_COMMENTS_PER_POST,
+    REDDIT_CACHE_PATH,
+    REDDIT_CACHE_TTL_HOURS,
+    REDDIT_ASYNC_MODE,
+    LEGACY_RAW_MSP_DATA_PATH,
+    COLLECTION_INCREMENTAL,
+    ACTIVE_THREAD_WINDOW_DAYS
+)
+from src.common.jsonl import JsonlWriter
 from src.common.logger import get_logger
+from src.common.metrics import metrics
+from src.data_collection.incremental import (
+    load_watermarks,
+    save_watermarks,
+    advance_watermark,
+    watermark_key,
+    active_thread_ids,
+    merge_into_store
+)
+from src.data_collection.providers.async_reddit_client import AsyncRedditClient
 from src.data_collection.providers.reddit_client import RedditClient
 
 load_dotenv()
@@ -13,8 +37,73 @@ load_dotenv()
 logger = get_logger(__name__)
 
 
-def main():
-    reddit_client = RedditClient(
+def main(async_mode: bool = REDDIT_ASYNC_MODE, incremental: bool = COLLECTION_INCREMENTAL):
+    """
+    Collects every submission matching QUERIES in each of SUBREDDITS (plus its top comments) into RAW_MSP_DATA_PATH.
+    With `async_mode`, searches and comment trees are fetched concurrently over Reddit's JSON API.
+    With `incremental`, only submissions newer than each query's created_utc watermark are fetched,
+    comments are refreshed for threads active within ACTIVE_THREAD_WINDOW_DAYS, and everything is
+    merged into the existing store instead of overwriting it.
+    """
+    started = time.perf_counter()
+    reddit_cache = SQLiteCache(REDDIT_CACHE_PATH, max_age_seconds=REDDIT_CACHE_TTL_HOURS * 3600, name="reddit")
+
+    if not incremental:
+        # Posts are streamed to disk as they are fetched, so downstream stages can start consuming right away
+        with JsonlWriter(RAW_MSP_DATA_PATH) as writer:
+            run_collection(async_mode, reddit_cache, writer.write)
+        logger.info(f"Data collection complete. {writer.count} unique posts saved to {RAW_MSP_DATA_PATH}")
+        collected = writer.count
+    else:
+        watermarks = load_watermarks()
+        refresh_ids = active_thread_ids(RAW_MSP_DATA_PATH, ACTIVE_THREAD_WINDOW_DAYS, LEGACY_RAW_MSP_DATA_PATH)
+        logger.info(f"Incremental collection: {len(refresh_ids)} active threads to refresh.")
+
+        delta_records = []
+        run_collection(async_mode, reddit_cache, delta_records.append, watermarks, refresh_ids)
+        merge_into_store(RAW_MSP_DATA_PATH, delta_records, LEGACY_RAW_MSP_DATA_PATH)
+
+        # Only move the watermarks once the new data is safely stored
+        save_watermarks(watermarks)
+        logger.info(f"Incremental collection complete. {len(delta_records)} new/updated threads.")
+        collected = len(delta_records)
+
+    logger.info(f"Reddit cache stats: {reddit_cache.stats()}")
+    metrics.record_stage("collect", collected, time.perf_counter() - started)
+    metrics.write("fetcher")
+
+
+def run_collection(
+        async_mode: bool,
+        reddit_cache: SQLiteCache,
+        emit,
+        watermarks=None,
+        refresh_ids=(),
+        stop_event=None,
+        targets: list[tuple[str, str]] = None
+):
+    """
+    Runs a collection pass, passing each collected record to `emit` as soon as it is fetched.
+    `targets` lists the (subreddit, query) searches to run, by default every one (see collection_targets).
+    See _collect for `watermarks`, `refresh_ids` and `stop_event`. In async mode, `emit` is called on a worker
+    thread (one call at a time), so it may block without stalling the requests in flight.
+    """
+    targets = collection_targets() if targets is None else targets
+    if async_mode:
+        asyncio.run(_collect_async(reddit_cache, emit, targets, watermarks, refresh_ids, stop_event))
+    else:
+        _collect(reddit_cache, emit, targets, watermarks, refresh_ids, stop_event)
+
+
+def collection_targets(subreddits: list[str] = SUBREDDITS, queries: list[str] = QUERIES) -> list[tuple[str, str]]:
+    """
+    Every (subreddit, query) search, in a stable order.
+    """
+    return [(subreddit, query) for subreddit in subreddits for query in queries]
+
+
+def _reddit_credentials():
+    return (
         os.getenv("REDDIT_CLIENT_ID"),
         os.getenv("REDDIT_CLIENT_SECRET"),
         os.getenv("REDDIT_USER_AGENT"),
@@ -22,60 +111,249 @@ def main():
         os.getenv("REDDIT_PASSWORD")
     )
 
-    all_posts = []
 
-    for q in QUERIES:
-        submissions = reddit_client.fetch_submissions(
-            subreddit_name=SUBREDDIT_NAME,
-            query=q,
-            limit=MAX_POSTS,
-            sort="new"
+def _collect(reddit_cache: SQLiteCache, emit, targets, watermarks=None, refresh_ids=(), stop_event=None):
+    """
+    Runs every (subreddit, query) search of `targets`, fetches comments once per unique thread and passes
+    each post to `emit`.
+    If `watermarks` is given, searches stop at each query's watermark, which is then advanced past the posts
+    actually emitted (see advance_watermark), and the stored threads in `refresh_ids` get their comments
+    re-fetched, bypassing the cache, as {"id": ..., "comments": [...]}.
+    Once `stop_event` (a threading.Event) is set, no more threads are fetched.
+    """
+    reddit_client = RedditClient(*_reddit_credentials())
+
+    # First pass: run every search and de-duplicate the hits by submission id
+    unique_posts = {}
+    hits = {}
+    for subreddit, q in targets:
+        key = watermark_key(subreddit, q)
+        stop_before_utc = watermarks.get(key) if watermarks is not None else None
+        hits[key] = _search(reddit_client, reddit_cache, subreddit, q, stop_before_utc)
+        _merge_hits(unique_posts, hits[key], subreddit, q)
+    logger.info(f"{len(unique_posts)} unique submissions across {len(targets)} searches.")
+
+    # Second pass: fetch comments once per unique (or still active) thread
+    threads = list(unique_posts.values()) + [
+        {"id": thread_id} for thread_id in refresh_ids if thread_id not in unique_posts
+    ]
+    refresh_ids = set(refresh_ids)
+    emitted_ids = set()
+    for post_data in threads:
+        if stop_event is not None and stop_event.is_set():
+            logger.info("Collection stopped before all threads were fetched.")
+            break
+        try:
+            post_data["comments"] = _fetch_comments(
+                reddit_client, reddit_cache, post_data["id"], use_cache=post_data["id"] not in refresh_ids
+            )
+            emit(post_data)
+            emitted_ids.add(post_data["id"])
+        except Exception as e:
+            logger.error(f"Error processing submission {post_data['id']}: {e}")
+
+    if watermarks is not None:
+        for key, posts in hits.items():
+            advance_watermark(watermarks, key, posts, emitted_ids)
+
+
+async def _collect_async(reddit_cache: SQLiteCache, emit, targets, watermarks=None, refresh_ids=(), stop_event=None):
+    """
+    Async counterpart of _collect.
+    """
+    async with AsyncRedditClient(*_reddit_credentials()) as reddit_client:
+        # First pass: every search at once, then de-duplicate by submission id
+        keys = [watermark_key(subreddit, q) for subreddit, q in targets]
+        search_results = await asyncio.gather(*(
+            _search_async(
+                reddit_client, reddit_cache, subreddit, q, watermarks.get(key) if watermarks is not None else None
+            )
+            for (subreddit, q), key in zip(targets, keys)
+        ))
+        unique_posts = {}
+        for (subreddit, q), posts in zip(targets, search_results):
+            _merge_hits(unique_posts, posts, subreddit, q)
+        logger.info(f"{len(unique_posts)} unique submissions across {len(targets)} searches.")
+
+        # Second pass: all comment trees concurrently; emit each post as soon as its comments arrive
+        threads = list(unique_posts.values()) + [
+            {"id": thread_id} for thread_id in refresh_ids if thread_id not in unique_posts
+        ]
+        refresh_ids = set(refresh_ids)
+        emitted_ids = set()
+        tasks = [
+            _with_comments_async(reddit_client, reddit_cache, post_data, use_cache=post_data["id"] not in refresh_ids)
+            for post_data in threads
+        ]
+        for task in asyncio.as_completed(tasks):
+            if stop_event is not None and stop_event.is_set():
+                # Comment fetches still in flight are cancelled when the event loop shuts down
+                logger.info("Collection stopped before all threads were fetched.")
+                break
+            post_data = await task
+            if post_data is not None:
+                # `emit` may block (e.g. on a full pipeline queue); off the loop, in-flight fetches keep going
+                await asyncio.to_thread(emit, post_data)
+                emitted_ids.add(post_data["id"])
+
+    if watermarks is not None:
+        for key, posts in zip(keys, search_results):
+            advance_watermark(watermarks, key, posts, emitted_ids)
+
+
+def _merge_hits(unique_posts: dict, posts: list[dict], subreddit: str, query: str):
+    """
+    Adds search hits to {submission_id: post_data}, keeping first-seen order.
+    A submission matched by several queries is kept once, with all of them in `query_matched`.
+    """
+    for post_data in posts:
+        existing = unique_posts.get(post_data["id"])
+        if existing is None:
+            post_data["subreddit"] = subreddit
+            unique_posts[post_data["id"]] = post_data
+        elif query not in existing["query_matched"]:
+            existing["query_matched"].append(query)
+
+
+def _search(
+        reddit_client: RedditClient,
+        reddit_cache: SQLiteCache,
+        subreddit: str,
+        query: str,
+        stop_before_utc: float = None
+) -> list[dict]:
+    cache_key = _search_cache_key(subreddit, query, stop_before_utc)
+    cached_posts = reddit_cache.get(cache_key)
+    if cached_posts is not None:
+        logger.info(f"Using cached search results for '{query}' in r/{subreddit}.")
+        return cached_posts
+
+    # PRAW pages lazily while the results are iterated, so the whole loop is the request time
+    started = time.perf_counter()
+    submissions = reddit_client.fetch_submissions(
+        subreddit_name=subreddit,
+        query=query,
+        limit=MAX_POSTS,
+        sort="new"
+    )
+
+    posts = []
+    for submission in submissions:
+        # Results are sorted newest first, so stop paginating once we reach content we already have
+        if stop_before_utc is not None and submission.created_utc <= stop_before_utc:
+            break
+        try:
+            posts.append({
+                "id": submission.id,
+                "title": submission.title,
+                "author": str(submission.author) if submission.author else "[deleted]",
+                "created_utc": submission.created_utc,
+                "score": submission.score,
+                "num_comments": submission.num_comments,
+                "url": submission.url,
+                "query_matched": [query],
+                "selftext": submission.selftext,
+                "platform": "reddit"
+            })
+        except Exception as e:
+            logger.error(f"Error processing submission {submission.id}: {e}")
+    metrics.observe("reddit_request_seconds", time.perf_counter() - started, endpoint="search")
+
+    reddit_cache.set(cache_key, posts)
+    return posts
+
+
+def _fetch_comments(
+        reddit_client: RedditClient,
+        reddit_cache: SQLiteCache,
+        submission_id: str,
+        use_cache: bool = True
+) -> list[dict]:
+    """
+    The submission's comments; `use_cache=False` (active-thread refreshes) always asks Reddit, then caches them.
+    """
+    cache_key = f"comments:{submission_id}:{MAX_COMMENTS_PER_POST}"
+    cached_comments = reddit_cache.get(cache_key) if use_cache else None
+    if cached_comments is not None:
+        return cached_comments
+
+    # Fetch a limited number of comments
+    with metrics.timer("reddit_request_seconds", endpoint="comments"):
+        comments = reddit_client.fetch_comments_for_submission(
+            submission_id=submission_id,
+            limit=MAX_COMMENTS_PER_POST
         )
 
-        for submission in submissions:
-            try:
-                post_data = {
-                    "id": submission.id,
-                    "title": submission.title,
-                    "author": str(submission.author) if submission.author else "[deleted]",
-                    "created_utc": submission.created_utc,
-                    "score": submission.score,
-                    "num_comments": submission.num_comments,
-                    "url": submission.url,
-                    "query_matched": q,
-                    "selftext": submission.selftext,
-                    "platform": "reddit"
-                }
-
-                # Fetch a limited number of comments
-                comments = reddit_client.fetch_comments_for_submission(
-                    submission_id=submission.id,
-                    limit=10
-                )
-
-                post_data["comments"] = []
-                for comment in comments:
-                    if not comment.body:
-                        continue
-                    post_data["comments"].append({
-                        "comment_id": comment.id,
-                        "author": str(comment.author) if comment.author else "[deleted]",
-                        "body": comment.body,
-                        "score": comment.score,
-                        "created_utc": comment.created_utc
-                    })
-
-                all_posts.append(post_data)
-                time.sleep(1)  # Be nice to Reddit's API
-
-            except Exception as e:
-                logger.error(f"Error processing submission {submission.id}: {e}")
-
-    # Dump collected data
-    with open(RAW_MSP_DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(all_posts, f, ensure_ascii=False, indent=2)
-
-    logger.info(f"Data collection complete. {len(all_posts)} posts saved to msp_data.json")
+    comment_records = []
+    for comment in comments:
+        if not comment.body:
+            continue
+        comment_records.append({
+            "comment_id": comment.id,
+            "author": str(comment.author) if comment.author else "[deleted]",
+            "body": comment.body,
+            "score": comment.score,
+            "created_utc": comment.created_utc
+        })
+
+    reddit_cache.set(cache_key, comment_records)
+    time.sleep(1)  # Be nice to Reddit's API
+    return comment_records
+
+
+async def _search_async(
+        reddit_client: AsyncRedditClient,
+        reddit_cache: SQLiteCache,
+        subreddit: str,
+        query: str,
+        stop_before_utc: float = None
+) -> list[dict]:
+    cache_key = _search_cache_key(subreddit, query, stop_before_utc)
+    cached_posts = reddit_cache.get(cache_key)
+    if cached_posts is not None:
+        logger.info(f"Using cached search results for '{query}' in r/{subreddit}.")
+        return cached_posts
+
+    posts = await reddit_client.fetch_submissions(
+        subreddit_name=subreddit,
+        query=query,
+        limit=MAX_POSTS,
+        sort="new",
+        stop_before_utc=stop_before_utc
+    )
+    reddit_cache.set(cache_key, posts)
+    return posts
+
+
+async def _with_comments_async(
+        reddit_client: AsyncRedditClient,
+        reddit_cache: SQLiteCache,
+        post_data: dict,
+        use_cache: bool = True
+):
+    """
+    `post_data` with its comments (see _fetch_comments for `use_cache`), or None if they couldn't be fetched.
+    """
+    cache_key = f"comments:{post_data['id']}:{MAX_COMMENTS_PER_POST}"
+    try:
+        comment_records = reddit_cache.get(cache_key) if use_cache else None
+        if comment_records is None:
+            comments = await reddit_client.fetch_comments_for_submission(post_data["id"], MAX_COMMENTS_PER_POST)
+            comment_records = [comment for comment in comments if comment["body"]]
+            reddit_cache.set(cache_key, comment_records)
+        post_data["comments"] = comment_records
+        return post_data
+    except Exception as e:
+        logger.error(f"Error processing submission {post_data['id']}: {e}")
+        return None
+
+
+def _search_cache_key(subreddit: str, query: str, stop_before_utc: float = None) -> str:
+    # Incremental searches only hold results newer than the watermark, so they're cached separately
+    cache_key = f"search:{subreddit}:{query}:{MAX_POSTS}:new"
+    if stop_before_utc is not None:
+        cache_key += f":after:{stop_before_utc}"
+    return cache_key
 
 
 if __name__ == "__main__":
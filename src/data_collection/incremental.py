@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from typing import Optional
+
+from src.common.constants import COLLECTION_WATERMARKS_PATH
+from src.common.jsonl import iter_records, write_records, resolve_input_path
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def watermark_key(subreddit_name: str, query: str) -> str:
+    return f"{subreddit_name}|{query}"
+
+
+def load_watermarks(path: str = COLLECTION_WATERMARKS_PATH) -> dict:
+    """
+    Returns {"<subreddit>|<query>": newest created_utc collected so far}.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_watermarks(watermarks: dict, path: str = COLLECTION_WATERMARKS_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def advance_watermark(watermarks: dict, key: str, posts: list[dict], emitted_ids: Optional[set] = None):
+    """
+    Moves the high-water mark for `key` up to the newest submission in `posts`.
+    With `emitted_ids`, only collected submissions count: one missing from it (e.g. its comments couldn't be
+    fetched) holds the mark below it, so the next incremental search finds it again.
+    """
+    dated = [post for post in posts if post.get("created_utc")]
+    if emitted_ids is not None:
+        missed = [post["created_utc"] for post in dated if post["id"] not in emitted_ids]
+        if missed:
+            oldest_missed = min(missed)
+            dated = [post for post in dated if post["id"] in emitted_ids and post["created_utc"] < oldest_missed]
+    newest = max((post["created_utc"] for post in dated), default=None)
+    if newest is not None and newest > watermarks.get(key, 0):
+        watermarks[key] = newest
+
+
+def active_thread_ids(store_path: str, window_days: float, legacy_path: str = None) -> list[str]:
+    """
+    Ids of stored threads with activity (the post itself or its newest comment) inside the last `window_days`.
+    """
+    if not os.path.exists(resolve_input_path(store_path, legacy_path)):
+        return []
+
+    cutoff = time.time() - window_days * 24 * 3600
+    active_ids = []
+    for post in iter_records(store_path, legacy_path=legacy_path):
+        last_activity = max(
+            [post.get("created_utc") or 0] + [comment.get("created_utc") or 0 for comment in post.get("comments", [])]
+        )
+        if last_activity >= cutoff:
+            active_ids.append(post["id"])
+    return active_ids
+
+
+def merge_into_store(store_path: str, delta_records: list[dict], legacy_path: str = None) -> int:
+    """
+    Merges newly collected records into the JSONL store at `store_path`, streaming the existing store once.
+    A delta record is either a new post, or an update for a stored post ({"id": ..., "comments": [...]}).
+    Comments are merged by comment_id and `query_matched` lists are unioned. Returns the store size.
+    """
+    delta = {}
+    for record in delta_records:
+        if record["id"] in delta:
+            _merge_post(delta[record["id"]], record)
+        else:
+            delta[record["id"]] = record
+
+    def _merged_records():
+        if os.path.exists(resolve_input_path(store_path, legacy_path)):
+            for post in iter_records(store_path, legacy_path=legacy_path):
+                update = delta.pop(post["id"], None)
+                if update is not None:
+                    _merge_post(post, update)
+                yield post
+        # Whatever is left is a submission we haven't stored before
+        for post in delta.values():
+            if "title" in post:
+                yield post
+
+    tmp_path = store_path + ".tmp"
+    count = write_records(tmp_path, _merged_records())
+    os.replace(tmp_path, store_path)
+    if os.path.exists(tmp_path + ".complete"):
+        os.replace(tmp_path + ".complete", store_path + ".complete")
+    logger.info(f"Merged {len(delta_records)} new/updated records into {store_path} ({count} posts).")
+    return count
+
+
+def _merge_post(post: dict, update: dict):
+    for key, value in update.items():
+        if key == "comments":
+            continue
+        if key == "query_matched":
+            post["query_matched"] = _union_queries(post.get("query_matched"), value)
+        else:
+            post[key] = value
+
+    comments_by_id = {comment["comment_id"]: comment for comment in post.get("comments", [])}
+    for comment in update.get("comments", []):
+        comments_by_id[comment["comment_id"]] = comment
+    post["comments"] = list(comments_by_id.values())
+
+
+def _union_queries(existing, new) -> list[str]:
+    # Legacy records store a single query string
+    queries = [existing] if isinstance(existing, str) else list(existing or [])
+    for query in ([new] if isinstance(new, str) else new or []):
+        if query not in queries:
+            queries.append(query)
+    return queries
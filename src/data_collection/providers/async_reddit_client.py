@@ -0,0 +1,258 @@
+import asyncio
+import time
+from typing import Optional
+
+import aiohttp
+
+from src.common.constants import (
+    MAX_POSTS,
+    REDDIT_API_BASE_URL,
+    REDDIT_AUTH_URL,
+    REDDIT_MAX_CONCURRENCY,
+    REDDIT_RATELIMIT_RESERVE
+)
+from src.common.logger import get_logger
+from src.common.metrics import metrics
+
+logger = get_logger(__name__)
+
+PAGE_SIZE = 100
+
+
+class RateLimitPacer:
+    """
+    Paces requests from Reddit's X-Ratelimit-Remaining / X-Ratelimit-Reset response headers.
+    Requests go out freely while plenty of budget is left; once it drops to `reserve`,
+    the remaining requests are spread evenly until the window resets.
+    """
+
+    def __init__(self, reserve: int = REDDIT_RATELIMIT_RESERVE):
+        self.reserve = reserve
+        self.remaining = None
+        self.reset_at = None
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = loop.time()
+            self._next_at = now + self._interval(now)
+            if self.remaining is not None:
+                # Count this request against the budget until the response tells us otherwise
+                self.remaining -= 1
+
+    def update(self, headers):
+        remaining = headers.get("X-Ratelimit-Remaining")
+        reset = headers.get("X-Ratelimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            self.remaining = float(remaining)
+            self.reset_at = asyncio.get_running_loop().time() + float(reset)
+        except ValueError:
+            logger.warning(f"Unexpected rate-limit headers: remaining={remaining}, reset={reset}")
+
+    def _interval(self, now: float) -> float:
+        if self.remaining is None or self.reset_at is None or now >= self.reset_at:
+            return 0.0
+        if self.remaining > self.reserve:
+            return 0.0
+        seconds_left = self.reset_at - now
+        if self.remaining < 1:
+            return seconds_left
+        return seconds_left / self.remaining
+
+
+class AsyncRedditClient:
+    """
+    An asyncio client for Reddit's OAuth JSON API over a pooled aiohttp session.
+    Returns plain dicts in the same shape the fetcher stores (no PRAW objects).
+    Base URLs are configurable, so it can be pointed at a local stub server.
+
+    Usage:
+        async with AsyncRedditClient(...) as client:
+            posts = await client.fetch_submissions("msp", "SentinelOne")
+    """
+
+    def __init__(
+            self,
+            client_id: str,
+            client_secret: str,
+            user_agent: str,
+            username: Optional[str],
+            password: Optional[str],
+            api_base_url: str = REDDIT_API_BASE_URL,
+            auth_url: str = REDDIT_AUTH_URL,
+            max_concurrency: int = REDDIT_MAX_CONCURRENCY
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.user_agent = user_agent
+        self.username = username
+        self.password = password
+        self.api_base_url = api_base_url.rstrip("/")
+        self.auth_url = auth_url
+        self.max_concurrency = max_concurrency
+        self.pacer = RateLimitPacer()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session = None
+        self._access_token = None
+        self._auth_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": self.user_agent or "marketing-analysis"},
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+        try:
+            await self._authenticate()
+        except BaseException:
+            # __aexit__ isn't called when __aenter__ fails
+            await self._session.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._session.close()
+
+    async def fetch_submissions(
+            self,
+            subreddit_name: str,
+            query: str,
+            limit: int = MAX_POSTS,
+            sort: str = "new",
+            stop_before_utc: Optional[float] = None
+    ) -> list[dict]:
+        """
+        Search a subreddit, following pagination until `limit` submissions are collected.
+        With `sort="new"` and `stop_before_utc`, stops paginating as soon as older submissions are reached.
+        """
+        logger.info(f"Searching for '{query}' in r/{subreddit_name} (limit={limit}, sort={sort}).")
+        posts = []
+        after = None
+        while len(posts) < limit:
+            params = {
+                "q": query,
+                "restrict_sr": "1",
+                "sort": sort,
+                "limit": min(PAGE_SIZE, limit - len(posts)),
+                "raw_json": "1"
+            }
+            if after:
+                params["after"] = after
+            listing = await self._get(f"/r/{subreddit_name}/search", params)
+            children = listing.get("data", {}).get("children", [])
+
+            reached_older = False
+            for child in children:
+                data = child.get("data", {})
+                if stop_before_utc is not None and (data.get("created_utc") or 0) <= stop_before_utc:
+                    reached_older = True
+                    break
+                posts.append(_to_post(data, query))
+
+            after = listing.get("data", {}).get("after")
+            if reached_older or not after or not children:
+                break
+        return posts[:limit]
+
+    async def fetch_comments_for_submission(self, submission_id: str, limit: Optional[int]) -> list[dict]:
+        """
+        Fetch the top comments of a single submission, flattened (like PRAW's comments.list()).
+        """
+        response = await self._get(
+            f"/comments/{submission_id}",
+            {"limit": limit or 100, "sort": "top", "raw_json": "1"}
+        )
+        if not isinstance(response, list) or len(response) < 2:
+            return []
+        comments = []
+        _flatten_comments(response[1].get("data", {}).get("children", []), comments)
+        return comments
+
+    async def _authenticate(self):
+        if self.username and self.password:
+            data = {"grant_type": "password", "username": self.username, "password": self.password}
+        else:
+            data = {"grant_type": "client_credentials"}
+        async with self._session.post(
+                self.auth_url,
+                data=data,
+                auth=aiohttp.BasicAuth(self.client_id or "", self.client_secret or "")
+        ) as response:
+            response.raise_for_status()
+            payload = await response.json()
+        self._access_token = payload["access_token"]
+
+    async def _get(self, path: str, params: dict, retries: int = 3):
+        url = f"{self.api_base_url}{path}"
+        endpoint = "comments" if path.startswith("/comments/") else "search"
+        for attempt in range(retries + 1):
+            retry_after = None
+            async with self._semaphore:
+                await self.pacer.wait()
+                headers = {"Authorization": f"bearer {self._access_token}"}
+                # Timed from send to body, excluding the time spent waiting on the pacer
+                started = time.perf_counter()
+                async with self._session.get(url, params=params, headers=headers) as response:
+                    self.pacer.update(response.headers)
+                    metrics.inc("reddit_requests_total", endpoint=endpoint, status=response.status)
+                    if response.status == 429 and attempt < retries:
+                        retry_after = float(
+                            response.headers.get("Retry-After") or response.headers.get("X-Ratelimit-Reset") or 1
+                        )
+                    elif response.status == 401 and attempt < retries:
+                        # The token expired: re-authenticate below, then retry
+                        pass
+                    else:
+                        response.raise_for_status()
+                        payload = await response.json()
+                        metrics.observe("reddit_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+                        return payload
+            # Retries wait with the response and the concurrency slot released, so other requests keep going
+            if retry_after is not None:
+                logger.warning(f"Reddit rate limit hit on {path}, retrying in {retry_after}s.")
+                await asyncio.sleep(retry_after)
+            else:
+                async with self._auth_lock:
+                    await self._authenticate()
+        raise RuntimeError(f"Giving up on {path} after {retries} retries")
+
+
+def _to_post(data: dict, query: str) -> dict:
+    return {
+        "id": data["id"],
+        "title": data.get("title", ""),
+        "author": data.get("author") or "[deleted]",
+        "created_utc": data.get("created_utc"),
+        "score": data.get("score", 0),
+        "num_comments": data.get("num_comments", 0),
+        "url": data.get("url", ""),
+        "query_matched": [query],
+        "selftext": data.get("selftext", ""),
+        "platform": "reddit"
+    }
+
+
+def _flatten_comments(children: list, comments: list):
+    for child in children:
+        if child.get("kind") != "t1":
+            # "more" placeholders are skipped, like replace_more(0)
+            continue
+        data = child.get("data", {})
+        comments.append({
+            "comment_id": data["id"],
+            "author": data.get("author") or "[deleted]",
+            "body": data.get("body", ""),
+            "score": data.get("score", 0),
+            "created_utc": data.get("created_utc")
+        })
+        replies = data.get("replies")
+        if isinstance(replies, dict):
+            _flatten_comments(replies.get("data", {}).get("children", []), comments)
@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.common.constants import (
+    REDDIT_STUB_PORT,
+    REDDIT_STUB_LATENCY_MS,
+    REDDIT_STUB_POSTS,
+    REDDIT_STUB_COMMENTS
+)
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+ACCESS_TOKEN = "stub-token"
+# created_utc of the newest generated submission; each next one is an hour older
+NEWEST_CREATED_UTC = 1700000000.0
+
+
+def main(
+        port: int = REDDIT_STUB_PORT,
+        latency_ms: float = REDDIT_STUB_LATENCY_MS,
+        posts: int = REDDIT_STUB_POSTS,
+        comments_per_post: int = REDDIT_STUB_COMMENTS
+):
+    """
+    Serves the stand-in Reddit API until interrupted. Point REDDIT_API_BASE_URL at http://127.0.0.1:<port> and
+    REDDIT_AUTH_URL at http://127.0.0.1:<port>/api/v1/access_token to collect from it in async mode.
+    """
+    server = make_server(port, latency_ms, posts, comments_per_post)
+    logger.info(
+        f"Stub Reddit server on port {server.server_port}: {posts} submissions with {comments_per_post} comments "
+        f"each, {latency_ms}ms latency"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def make_server(
+        port: int = REDDIT_STUB_PORT,
+        latency_ms: float = REDDIT_STUB_LATENCY_MS,
+        posts: int = REDDIT_STUB_POSTS,
+        comments_per_post: int = REDDIT_STUB_COMMENTS,
+        auth_status: int = 200,
+        rate_limited_requests: int = 0,
+        retry_after: float = 1.0,
+        failing_comment_ids: tuple = ()
+) -> ThreadingHTTPServer:
+    """
+    Builds the server without starting it (port 0 picks a free port, see `server.server_port`).
+      - POST /api/v1/access_token answers a bearer token, or fails with `auth_status` if it isn't 200
+      - GET /r/<subreddit>/search lists `posts` submissions, newest first, paginated with `limit`/`after`
+      - GET /comments/<id> answers the submission and its `comments_per_post` comments (every other one a reply),
+        or a 500 for the ids in `failing_comment_ids`
+    API requests without the token get a 401. The first `rate_limited_requests` API requests get a 429 with a
+    `retry_after` seconds Retry-After header. `server.max_in_flight` records the most concurrent API requests.
+    """
+    server = _StubServer(("127.0.0.1", port), _StubHandler)
+    server.latency_ms = latency_ms
+    server.posts = posts
+    server.comments_per_post = comments_per_post
+    server.auth_status = auth_status
+    server.rate_limited_requests = rate_limited_requests
+    server.retry_after = retry_after
+    server.failing_comment_ids = set(failing_comment_ids)
+    server.requests_served = 0
+    server.requests_throttled = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.stats_lock = threading.Lock()
+    return server
+
+
+def start_in_thread(**kwargs) -> ThreadingHTTPServer:
+    """
+    Starts a server (see make_server) on a daemon thread, e.g. for tests. Stop it with `server.shutdown()`.
+    """
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-reddit-server").start()
+    return server
+
+
+def _submission(index: int) -> dict:
+    return {
+        "id": f"s{index}",
+        "title": f"Stub submission {index} about SentinelOne",
+        "author": f"user{index % 7}",
+        "created_utc": NEWEST_CREATED_UTC - index * 3600,
+        "score": index % 10,
+        "num_comments": 0,
+        "url": f"https://reddit.example/s{index}",
+        "selftext": "How does SentinelOne compare to CrowdStrike for an MSP?"
+    }
+
+
+def _comment(submission_id: str, index: int) -> dict:
+    return {
+        "kind": "t1",
+        "data": {
+            "id": f"{submission_id}c{index}",
+            "author": f"commenter{index}",
+            "body": f"Comment {index}: we moved our clients to SentinelOne last year.",
+            "score": index,
+            "created_utc": NEWEST_CREATED_UTC + index,
+            "replies": ""
+        }
+    }
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/api/v1/access_token":
+            self.send_error(404)
+            return
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.auth_status != 200:
+            self._send_status(self.server.auth_status)
+            return
+        self._send_json({"access_token": ACCESS_TOKEN, "token_type": "bearer", "expires_in": 3600})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        server = self.server
+        if self.headers.get("Authorization") != f"bearer {ACCESS_TOKEN}":
+            self._send_status(401)
+            return
+
+        with server.stats_lock:
+            throttled = server.requests_throttled < server.rate_limited_requests
+            if throttled:
+                server.requests_throttled += 1
+            else:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        if throttled:
+            self._send_status(429, {"Retry-After": str(server.retry_after)})
+            return
+
+        try:
+            time.sleep(server.latency_ms / 1000)
+        finally:
+            with server.stats_lock:
+                server.in_flight -= 1
+                server.requests_served += 1
+
+        parts = url.path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "r" and parts[2] == "search":
+            self._send_json(self._search(params))
+        elif len(parts) == 2 and parts[0] == "comments" and parts[1] in server.failing_comment_ids:
+            self._send_status(500)
+        elif len(parts) == 2 and parts[0] == "comments":
+            self._send_json(self._comments(parts[1]))
+        else:
+            self.send_error(404)
+
+    def _search(self, params: dict) -> dict:
+        start = int(params["after"][len("t3_s"):]) + 1 if params.get("after") else 0
+        end = min(self.server.posts, start + int(params.get("limit", 25)))
+        children = [{"kind": "t3", "data": _submission(index)} for index in range(start, end)]
+        after = f"t3_s{end - 1}" if end < self.server.posts else None
+        return {"kind": "Listing", "data": {"children": children, "after": after}}
+
+    def _comments(self, submission_id: str) -> list:
+        comments = []
+        for index in range(self.server.comments_per_post):
+            if index % 2 and comments:
+                # A reply to the previous top-level comment
+                comments[-1]["data"]["replies"] = {
+                    "kind": "Listing", "data": {"children": [_comment(submission_id, index)]}
+                }
+            else:
+                comments.append(_comment(submission_id, index))
+        submission = {"kind": "Listing", "data": {"children": [{"kind": "t3", "data": {"id": submission_id}}]}}
+        return [submission, {"kind": "Listing", "data": {"children": comments}}]
+
+    def _send_status(self, status: int, headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # One log line per request would drown out the collector's own logs
+        pass
+
+
+if __name__ == "__main__":
+    main()
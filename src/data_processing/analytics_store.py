@@ -0,0 +1,632 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable, Iterator, Optional
+
+from src.common.constants import ANALYTICS_DB_PATH
+from src.common.jsonl import iter_records
+from src.common.logger import get_logger
+from src.data_processing.competitors import CompetitorIndex
+from src.data_processing.records import Classification, ProcessedComment, ProcessedPost
+from src.data_processing.trends import COMPETITOR, ITEMS, SENTIMENT, TrendState
+
+logger = get_logger(__name__)
+
+INGEST_BATCH_POSTS = 1000
+# Item ids per "IN (...)" lookup, under SQLite's default limit on query parameters
+LOOKUP_CHUNK = 500
+# Totals measure of the per-item flags findings() counts
+FLAGS = "flags"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    comment_id TEXT,
+    author TEXT COLLATE NOCASE,
+    created_utc REAL,
+    title TEXT,
+    summary TEXT,
+    sentiment_s1 TEXT,
+    overall_tone TEXT,
+    action_needed TEXT,
+    action_reason TEXT,
+    suggested_response TEXT,
+    filtered INTEGER NOT NULL DEFAULT 0,
+    duplicate_of TEXT,
+    local_classified INTEGER NOT NULL DEFAULT 0,
+    llm_failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_items_created_utc ON items (created_utc);
+CREATE INDEX IF NOT EXISTS idx_items_post_id ON items (post_id);
+CREATE INDEX IF NOT EXISTS idx_items_author ON items (author);
+CREATE INDEX IF NOT EXISTS idx_items_sentiment ON items (sentiment_s1, kind);
+CREATE INDEX IF NOT EXISTS idx_items_actionable ON items (created_utc) WHERE action_needed = 'yes';
+
+CREATE TABLE IF NOT EXISTS post_queries (
+    post_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    PRIMARY KEY (query, post_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS item_competitors (
+    competitor_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    competitor TEXT NOT NULL,
+    PRIMARY KEY (competitor_id, item_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_item_competitors_item ON item_competitors (item_id);
+
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+# Materialized tumbling windows (see trends.TrendState), kept up to date by ingest
+TRENDS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trend_windows (
+    granularity TEXT NOT NULL,
+    window_start REAL NOT NULL,
+    measure TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (granularity, window_start, measure, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS trend_competitors (
+    competitor_id TEXT PRIMARY KEY,
+    competitor TEXT NOT NULL
+);
+"""
+
+# Materialized totals of the whole store, i.e. findings() without filters: {(measure, key): count}, kept up to
+# date by ingest like the trend windows. Measures: items by kind, items by sentiment_s1, mentions by competitor
+# id, and the flag counts (see _add_totals)
+TOTALS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS totals (
+    measure TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (measure, key)
+) WITHOUT ROWID;
+"""
+# The items columns _add_totals counts, in its argument order
+TOTALS_COLUMNS = "kind, sentiment_s1, action_needed, filtered, duplicate_of, local_classified, llm_failed"
+
+
+# Columns added to `items` after its first version, in order: (name, definition)
+MIGRATED_COLUMNS = [
+    ("duplicate_of", "TEXT"),
+    ("local_classified", "INTEGER NOT NULL DEFAULT 0"),
+    ("llm_failed", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+class AnalyticsStore:
+    """
+    Embedded SQLite store of processed posts and comments (one row per item), indexed on
+    created_utc, post_id, author, sentiment, search query and canonical competitor, so slices of the
+    collected data can be counted and listed with indexed queries instead of re-running post_processor.
+
+    Every query method takes the same optional filters:
+        since / until (created_utc bounds), query, author (exact, case-insensitive),
+        sentiment, competitor_id, kind ("post" / "comment")
+
+    Daily and weekly trend windows (items, sentiment and competitor mentions) are materialized in
+    `trend_windows` and updated by ingest from the items it adds or replaces, so trends cost O(new items).
+    So are the store-wide `totals`, which answer findings() without filters.
+    """
+
+    def __init__(self, path: str = ANALYTICS_DB_PATH, competitor_index: Optional[CompetitorIndex] = None):
+        self.path = path
+        self.competitor_index = competitor_index or CompetitorIndex()
+        # One connection, shared between threads (e.g. Streamlit sessions) under a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Keep hot pages in memory: slices are read far more often than the store is written
+        self._conn.execute("PRAGMA cache_size=-262144")
+        self._conn.execute("PRAGMA mmap_size=1073741824")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        has_trends = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trend_windows'"
+        ).fetchone() is not None
+        self._conn.executescript(TRENDS_SCHEMA)
+        if not has_trends:
+            self._rebuild_trends()
+        has_totals = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'totals'"
+        ).fetchone() is not None
+        self._conn.executescript(TOTALS_SCHEMA)
+        if not has_totals:
+            self._rebuild_totals()
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def _migrate(self):
+        """
+        Adds the columns newer versions introduced to a store created by an older one. Their values are only
+        known once the items are ingested again, so every file is re-ingested by the next ingest_file.
+        """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(items)")}
+        missing = [(column, definition) for column, definition in MIGRATED_COLUMNS if column not in columns]
+        for column, definition in missing:
+            self._conn.execute(f"ALTER TABLE items ADD COLUMN {column} {definition}")
+        if missing:
+            self._conn.execute("DELETE FROM ingested_files")
+
+    def _rebuild_trends(self):
+        """
+        Materializes the trend windows of a store created before they existed (one pass over its items).
+        """
+        competitor_ids = {}
+        for item_id, competitor in self._conn.execute("SELECT item_id, competitor_id FROM item_competitors"):
+            competitor_ids.setdefault(item_id, []).append(competitor)
+        state = TrendState()
+        rows = self._conn.execute("SELECT item_id, kind, created_utc, sentiment_s1 FROM items").fetchall()
+        for item_id, kind, created_utc, sentiment in rows:
+            state.add_item(created_utc, kind, sentiment, competitor_ids.get(item_id, []))
+        self._conn.execute("DELETE FROM trend_windows")
+        self._apply_trends(state)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO trend_competitors (competitor_id, competitor)"
+            " SELECT competitor_id, MIN(competitor) FROM item_competitors GROUP BY competitor_id"
+        )
+        if rows:
+            logger.info(f"Materialized trend windows of {len(rows)} items in {self.path}")
+
+    def _rebuild_totals(self):
+        """
+        Materializes the totals of a store created before they existed (one pass over its items).
+        """
+        competitor_ids = {}
+        for item_id, competitor in self._conn.execute("SELECT item_id, competitor_id FROM item_competitors"):
+            competitor_ids.setdefault(item_id, []).append(competitor)
+        totals = {}
+        for row in self._conn.execute(f"SELECT item_id, {TOTALS_COLUMNS} FROM items"):
+            _add_totals(totals, *row[1:], competitor_ids.get(row[0], ()))
+        self._conn.execute("DELETE FROM totals")
+        self._apply_totals(totals)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Ingestion
+
+    def ingest_file(self, path: str, legacy_path: Optional[str] = None) -> int:
+        """
+        Upserts every processed post in `path` (and its comments). Files that haven't changed since they
+        were last ingested are skipped. Returns the number of posts ingested.
+        """
+        if not os.path.exists(path) and legacy_path and os.path.exists(legacy_path):
+            path = legacy_path
+        stat = os.stat(path)
+        row = self._fetchone("SELECT mtime_ns, size FROM ingested_files WHERE path = ?", [path])
+        if row == (stat.st_mtime_ns, stat.st_size):
+            logger.info(f"{path} is already in the analytics store.")
+            return 0
+
+        count = self.ingest(iter_records(path))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingested_files (path, mtime_ns, size) VALUES (?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size)
+            )
+        logger.info(f"Ingested {count} posts from {path} into {self.path}")
+        return count
+
+    def ingest(self, posts: Iterable[dict]) -> int:
+        """
+        Upserts processed posts, in transactions of INGEST_BATCH_POSTS posts.
+        """
+        count = 0
+        batch = []
+        for post in posts:
+            batch.append(post)
+            if len(batch) >= INGEST_BATCH_POSTS:
+                count += self._ingest_batch(batch)
+                batch = []
+        return count + self._ingest_batch(batch)
+
+    def _ingest_batch(self, records: list[dict]) -> int:
+        items = []
+        queries = []
+        competitors = []
+        for post in map(ProcessedPost.from_dict, records):
+            post_item_id = f"post-{post.post_id}"
+            items.append(_item_row(post_item_id, "post", post, None))
+            queries.extend((post.post_id, query) for query in post.query_matched)
+            competitors.extend(self._competitor_rows(post_item_id, post.classification))
+
+            for comment in post.comments:
+                comment_item_id = f"comment-{comment.comment_id}"
+                items.append(_item_row(comment_item_id, "comment", post, comment))
+                competitors.extend(self._competitor_rows(comment_item_id, comment.classification))
+
+        # As stored: the last version of an item repeated in the batch, with the union of its competitors
+        competitor_ids = {}
+        for competitor, item_id, _ in competitors:
+            competitor_ids.setdefault(item_id, set()).add(competitor)
+        trends = TrendState()
+        totals = {}
+        for row in {row[0]: row for row in items}.values():
+            trends.add_item(row[5], row[1], row[8], competitor_ids.get(row[0], ()))
+            _add_totals(totals, *(row[i] for i in (1, 8, 10, 13, 14, 15, 16)), competitor_ids.get(row[0], ()))
+
+        with self._lock, self._conn:
+            # Trend windows and totals change by what the batch adds, minus what the items it replaces contributed
+            replaced_trends, replaced_totals = self._replaced([row[0] for row in items])
+            trends.merge(replaced_trends)
+            for key, count in replaced_totals.items():
+                totals[key] = totals.get(key, 0) + count
+            # Replaced items may have lost competitors since the last run
+            self._conn.executemany("DELETE FROM item_competitors WHERE item_id = ?", [(row[0],) for row in items])
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO items VALUES ({', '.join('?' * 17)})", items
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO post_queries (post_id, query) VALUES (?, ?)", queries)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO item_competitors (competitor_id, item_id, competitor) VALUES (?, ?, ?)",
+                competitors
+            )
+            # The first-sorting spelling of each competitor, like competitor_summary with filters
+            self._conn.executemany(
+                "INSERT INTO trend_competitors (competitor_id, competitor) VALUES (?, ?)"
+                " ON CONFLICT (competitor_id) DO UPDATE SET competitor = MIN(competitor, excluded.competitor)",
+                [(competitor, display_name) for competitor, _, display_name in competitors]
+            )
+            self._apply_trends(trends)
+            self._apply_totals(totals)
+        return len(records)
+
+    def _replaced(self, item_ids: list[str]) -> tuple[TrendState, dict]:
+        """
+        The retraction (negative counts) of what the stored versions of `item_ids`, if any, add to the trend windows
+        and to the totals.
+        """
+        stored = []
+        competitor_ids = {}
+        for start in range(0, len(item_ids), LOOKUP_CHUNK):
+            chunk = item_ids[start:start + LOOKUP_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            stored += self._conn.execute(
+                f"SELECT item_id, created_utc, {TOTALS_COLUMNS} FROM items WHERE item_id IN ({placeholders})", chunk
+            ).fetchall()
+            for item_id, competitor in self._conn.execute(
+                    f"SELECT item_id, competitor_id FROM item_competitors WHERE item_id IN ({placeholders})", chunk
+            ):
+                competitor_ids.setdefault(item_id, []).append(competitor)
+        state = TrendState()
+        totals = {}
+        for item_id, created_utc, *columns in stored:
+            state.add_item(created_utc, columns[0], columns[1], competitor_ids.get(item_id, []), weight=-1)
+            _add_totals(totals, *columns, competitor_ids.get(item_id, []), weight=-1)
+        return state, totals
+
+    def _apply_trends(self, state: TrendState):
+        changes = state.changes()
+        self._conn.executemany(
+            "INSERT INTO trend_windows (granularity, window_start, measure, key, count) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (granularity, window_start, measure, key) DO UPDATE SET count = count + excluded.count",
+            changes
+        )
+        self._conn.executemany(
+            "DELETE FROM trend_windows WHERE granularity = ? AND window_start = ? AND measure = ? AND key = ?"
+            " AND count <= 0",
+            [change[:4] for change in changes]
+        )
+
+    def _apply_totals(self, totals: dict):
+        changes = [key + (count,) for key, count in totals.items() if count]
+        self._conn.executemany(
+            "INSERT INTO totals (measure, key, count) VALUES (?, ?, ?)"
+            " ON CONFLICT (measure, key) DO UPDATE SET count = count + excluded.count",
+            changes
+        )
+        self._conn.executemany(
+            "DELETE FROM totals WHERE measure = ? AND key = ? AND count <= 0", [change[:2] for change in changes]
+        )
+
+    def _competitor_rows(self, item_id: str, classification: Classification) -> list[tuple]:
+        return [
+            (competitor, item_id, display_name)
+            for competitor, display_name in self.competitor_index.normalize_all(classification.competitors_mentioned)
+        ]
+
+    # Queries
+
+    def findings(self, **filters) -> dict:
+        """
+        The `main_findings` of post_processor, for the slice selected by `filters`. Without filters, it's read
+        from the materialized totals, so it costs the same whatever the size of the store.
+        """
+        where, params = _where(filters)
+        if not where:
+            return self._total_findings()
+        totals = self._fetchone(
+            "SELECT"
+            " COALESCE(SUM(kind = 'post'), 0),"
+            " COALESCE(SUM(kind = 'comment'), 0),"
+            " COALESCE(SUM(kind = 'post' AND sentiment_s1 != 'not mentioned'), 0),"
+            " COALESCE(SUM(filtered), 0),"
+            " COALESCE(SUM(duplicate_of IS NOT NULL), 0),"
+            " COALESCE(SUM(local_classified), 0),"
+            " COALESCE(SUM(llm_failed), 0)"
+            f" FROM items{where}",
+            params
+        )
+        sentiment_rows = self._fetchall(
+            f"SELECT sentiment_s1, COUNT(*) AS n FROM items{where} GROUP BY sentiment_s1 ORDER BY n DESC, sentiment_s1",
+            params
+        )
+        return {
+            "total_posts": totals[0],
+            "total_comments": totals[1],
+            "posts_with_s1_mentioned": totals[2],
+            "s1_sentiment_distribution": dict(sentiment_rows),
+            "competitors_mentioned_summary": self.competitor_summary(**filters),
+            "llm_calls_saved_by_filter": totals[3],
+            # Classified with defaults because the LLM call failed; the next pre_processor run retries them
+            "llm_failed_items": totals[6],
+            # Reused the classification of a near-duplicate instead of an LLM call; never actionable items
+            "near_duplicate_items": totals[4],
+            # Answered by the local classifier of the classification cascade
+            "llm_calls_saved_by_cascade": totals[5]
+        }
+
+    def _total_findings(self) -> dict:
+        totals = {}
+        for measure, key, count in self._fetchall("SELECT measure, key, count FROM totals"):
+            totals.setdefault(measure, {})[key] = count
+        items = totals.get(ITEMS, {})
+        flags = totals.get(FLAGS, {})
+        competitor_names = self.trend_competitor_names()
+
+        def most_first(counts: dict) -> list[tuple]:
+            # The order of the GROUP BY queries: by count, then by key
+            return sorted(counts.items(), key=lambda entry: (-entry[1], entry[0]))
+
+        return {
+            "total_posts": items.get("post", 0),
+            "total_comments": items.get("comment", 0),
+            "posts_with_s1_mentioned": flags.get("posts_with_s1_mentioned", 0),
+            "s1_sentiment_distribution": dict(most_first(totals.get(SENTIMENT, {}))),
+            "competitors_mentioned_summary": [
+                {"competitor": competitor_names.get(competitor, competitor), "competitor_id": competitor, "mentions": n}
+                for competitor, n in most_first(totals.get(COMPETITOR, {}))
+            ],
+            "llm_calls_saved_by_filter": flags.get("filtered", 0),
+            "llm_failed_items": flags.get("llm_failed", 0),
+            "near_duplicate_items": flags.get("duplicate", 0),
+            "llm_calls_saved_by_cascade": flags.get("local_classified", 0)
+        }
+
+    def competitor_summary(self, **filters) -> list[dict]:
+        where, params = _where(filters)
+        rows = self._fetchall(
+            "SELECT c.competitor_id, MIN(c.competitor), COUNT(*) AS n"
+            f" FROM item_competitors c JOIN items ON items.item_id = c.item_id{where}"
+            " GROUP BY c.competitor_id ORDER BY n DESC, c.competitor_id",
+            params
+        )
+        return [{"competitor": name, "competitor_id": competitor, "mentions": n} for competitor, name, n in rows]
+
+    def competitor_items(self, competitor_id: str, limit: int = 100, offset: int = 0, **filters) -> list[dict]:
+        """
+        One page of the posts and comments mentioning `competitor_id` (posts first, newest first), for drill-downs.
+        Items to act on (see actionable_items) carry their action_reason; the others an empty one.
+        """
+        where, params = _where({**filters, "competitor_id": competitor_id})
+        rows = self._fetchall(
+            "SELECT kind, post_id, comment_id,"
+            " CASE WHEN action_needed = 'yes' AND duplicate_of IS NULL THEN action_reason ELSE '' END"
+            f" FROM items{where} ORDER BY kind DESC, created_utc DESC, item_id LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        )
+        columns = ["type", "post_id", "comment_id", "action_reason"]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def count_items(self, **filters) -> dict:
+        """
+        {"post": count, "comment": count} for the slice selected by `filters`.
+        """
+        where, params = _where(filters)
+        counts = {"post": 0, "comment": 0}
+        counts.update(self._fetchall(f"SELECT kind, COUNT(*) FROM items{where} GROUP BY kind", params))
+        return counts
+
+    def actionable_items(self, limit: int = 100, offset: int = 0, author_contains: str = "", **filters) -> list[dict]:
+        """
+        One page of actionable items (newest first) in the shape of actionable_items.jsonl records.
+        """
+        where, params = _actionable_where(filters, author_contains)
+        rows = self._fetchall(
+            "SELECT kind, post_id, comment_id, author, title, action_reason, suggested_response"
+            f" FROM items{where} ORDER BY created_utc DESC, item_id LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        )
+        columns = ["type", "post_id", "comment_id", "author", "title", "action_reason", "suggested_response"]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def iter_actionable_items(self, **filters) -> Iterator[dict]:
+        """
+        Every actionable item (newest first), as actionable_items.jsonl records: posts carry their title, comments
+        their author. Streamed, LOOKUP_CHUNK rows at a time.
+        """
+        where, params = _actionable_where(filters, "")
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT kind, post_id, comment_id, author, title, action_reason, suggested_response"
+                f" FROM items{where} ORDER BY created_utc DESC, item_id",
+                params
+            )
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(LOOKUP_CHUNK)
+            if not rows:
+                return
+            for kind, post_id, comment_id, author, title, action_reason, suggested_response in rows:
+                if kind == "post":
+                    yield {"type": kind, "post_id": post_id, "title": title, "action_reason": action_reason,
+                           "suggested_response": suggested_response}
+                else:
+                    yield {"type": kind, "post_id": post_id, "comment_id": comment_id, "author": author,
+                           "action_reason": action_reason, "suggested_response": suggested_response}
+
+    def count_actionable_items(self, author_contains: str = "", **filters) -> int:
+        where, params = _actionable_where(filters, author_contains)
+        if not params:
+            # Nothing to narrow down: the whole store's count is materialized
+            row = self._fetchone("SELECT count FROM totals WHERE measure = ? AND key = ?", [FLAGS, "actionable"])
+            return row[0] if row else 0
+        return self._fetchone(f"SELECT COUNT(*) FROM items{where}", params)[0]
+
+    def distinct_values(self, column: str) -> list[str]:
+        """
+        Values to offer in filter widgets, for "query", "sentiment" and "competitor".
+        """
+        sql = {
+            "query": "SELECT DISTINCT query FROM post_queries ORDER BY query",
+            "sentiment": "SELECT DISTINCT sentiment_s1 FROM items ORDER BY sentiment_s1",
+            "competitor": "SELECT competitor_id FROM item_competitors GROUP BY competitor_id ORDER BY COUNT(*) DESC",
+        }[column]
+        return [row[0] for row in self._fetchall(sql)]
+
+    def trend_windows(self, granularity: str, since: Optional[float] = None, until: Optional[float] = None) -> list[tuple]:
+        """
+        (window_start, measure, key, count) rows of the materialized windows of `granularity` ("day" / "week"),
+        optionally only those starting in [since, until).
+        """
+        clauses = ["granularity = ?"]
+        params = [granularity]
+        if since is not None:
+            clauses.append("window_start >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("window_start < ?")
+            params.append(until)
+        return self._fetchall(
+            "SELECT window_start, measure, key, count FROM trend_windows"
+            f" WHERE {' AND '.join(clauses)} ORDER BY window_start, measure, key",
+            params
+        )
+
+    def trend_competitor_names(self) -> dict:
+        return dict(self._fetchall("SELECT competitor_id, competitor FROM trend_competitors"))
+
+    def date_range(self) -> tuple[Optional[float], Optional[float]]:
+        return self._fetchone("SELECT MIN(created_utc), MAX(created_utc) FROM items")
+
+    def _fetchall(self, sql: str, params: Optional[list] = None) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params or []).fetchall()
+
+    def _fetchone(self, sql: str, params: Optional[list] = None) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params or []).fetchone()
+
+
+def _item_row(item_id: str, kind: str, post: ProcessedPost, comment: Optional[ProcessedComment]) -> tuple:
+    record = comment if comment is not None else post
+    classification = record.classification
+    return (
+        item_id,
+        kind,
+        post.post_id,
+        comment.comment_id if comment is not None else None,
+        record.author,
+        # Older processed files don't carry comment timestamps; fall back to the post's
+        record.created_utc or post.created_utc,
+        post.title,
+        classification.summary,
+        classification.sentiment_s1.value,
+        classification.overall_tone,
+        classification.action_needed.value,
+        classification.action_reason,
+        classification.suggested_response,
+        int(classification.filtered),
+        classification.duplicate_of,
+        int(classification.local_classified),
+        int(classification.llm_failed)
+    )
+
+
+def _add_totals(
+        totals: dict,
+        kind: str,
+        sentiment: str,
+        action_needed: str,
+        filtered: int,
+        duplicate_of: Optional[str],
+        local_classified: int,
+        llm_failed: int,
+        competitor_ids: Iterable[str],
+        weight: int = 1
+):
+    """
+    Adds one item (`weight=-1` retracts it) to {(measure, key): count} totals, counting what findings() reports.
+    """
+    counted = [(ITEMS, kind), (SENTIMENT, sentiment)]
+    counted += [(COMPETITOR, competitor) for competitor in competitor_ids]
+    if kind == "post" and sentiment != "not mentioned":
+        counted.append((FLAGS, "posts_with_s1_mentioned"))
+    if filtered:
+        counted.append((FLAGS, "filtered"))
+    if duplicate_of is not None:
+        counted.append((FLAGS, "duplicate"))
+    elif action_needed == "yes":
+        counted.append((FLAGS, "actionable"))
+    if local_classified:
+        counted.append((FLAGS, "local_classified"))
+    if llm_failed:
+        counted.append((FLAGS, "llm_failed"))
+    for key in counted:
+        totals[key] = totals.get(key, 0) + weight
+
+
+def _where(filters: dict) -> tuple[str, list]:
+    clauses = []
+    params = []
+    if filters.get("since") is not None:
+        clauses.append("items.created_utc >= ?")
+        params.append(filters["since"])
+    if filters.get("until") is not None:
+        clauses.append("items.created_utc < ?")
+        params.append(filters["until"])
+    if filters.get("kind"):
+        clauses.append("items.kind = ?")
+        params.append(filters["kind"])
+    if filters.get("author"):
+        clauses.append("items.author = ?")
+        params.append(filters["author"])
+    if filters.get("sentiment"):
+        clauses.append("items.sentiment_s1 = ?")
+        params.append(filters["sentiment"])
+    if filters.get("query"):
+        clauses.append("items.post_id IN (SELECT post_id FROM post_queries WHERE query = ?)")
+        params.append(filters["query"])
+    if filters.get("competitor_id"):
+        clauses.append("items.item_id IN (SELECT item_id FROM item_competitors WHERE competitor_id = ?)")
+        params.append(filters["competitor_id"])
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _actionable_where(filters: dict, author_contains: str) -> tuple[str, list]:
+    where, params = _where(filters)
+    clauses = [where[len(" WHERE "):]] if where else []
+    clauses.append("items.action_needed = 'yes'")
+    clauses.append("items.duplicate_of IS NULL")
+    if author_contains:
+        # Like the dashboard's author search: only narrows down comments
+        clauses.append("(items.kind != 'comment' OR items.author LIKE ? ESCAPE '\\')")
+        params.append("%" + author_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    return " WHERE " + " AND ".join(clauses), params
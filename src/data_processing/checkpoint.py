@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+from typing import Optional
+
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CheckpointLog:
+    """
+    Append-only JSONL log of finished LLM classifications, one {"key": ..., "version": ..., "result": ...} record
+    per line. Appends are O(1) per item; the file is fsync'ed every `fsync_every` records (and on close),
+    so a crash loses at most that many classifications.
+    Only the byte offset of each completed item is kept in memory; results are read back on demand.
+    Records of another `version` (see classification.classification_version: the model and prompts) are not
+    resumed. The log only bridges an interrupted run: callers clear() it once a run has completed.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 50, version: Optional[str] = None):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.version = version
+        self._pending_sync = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._reader = None
+        self._offsets = {}
+
+    def load(self) -> int:
+        """
+        Indexes every completed item from a previous run. Returns the number of completed items.
+        A torn last line (from a crash mid-write) is dropped so new appends start on a clean line.
+        """
+        self._offsets = {}
+        if not os.path.exists(self.path):
+            return 0
+
+        stale = 0
+        with open(self.path, "r+b") as f:
+            line_number = 0
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                line_number += 1
+                if not line.endswith(b"\n"):
+                    logger.warning(f"Dropping torn last line {line_number} in {self.path}")
+                    f.truncate(offset)
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    item_key = record["key"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    logger.warning(f"Skipping unreadable checkpoint line {line_number} in {self.path}")
+                    continue
+                if record.get("version") != self.version:
+                    stale += 1
+                    continue
+                self._offsets[item_key] = offset
+
+        if stale:
+            logger.info(f"Ignoring {stale} checkpointed items classified with another model or prompt")
+        logger.info(f"Loaded {len(self._offsets)} completed items from checkpoint {self.path}")
+        return len(self._offsets)
+
+    def __contains__(self, item_key: str) -> bool:
+        return item_key in self._offsets
+
+    def get(self, item_key: str) -> dict:
+        """
+        Reads back the result recorded for a completed item, through a read handle kept open.
+        """
+        offset = self._offsets[item_key]
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.path, "rb")
+            self._reader.seek(offset)
+            line = self._reader.readline()
+        return json.loads(line)["result"]
+
+    def append(self, item_key: str, result: dict):
+        line = json.dumps({"key": item_key, "version": self.version, "result": result}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._pending_sync += 1
+            if self._pending_sync >= self.fsync_every:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def clear(self):
+        """
+        Deletes the log, e.g. once a run has completed and its results are in the processed file.
+        """
+        with self._lock:
+            self._close()
+            self._offsets = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _close(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._pending_sync = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,378 @@
+import json
+import re
+from typing import Optional
+
+from src.common.cache import SQLiteCache, make_cache_key
+from src.common.constants import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_AGE_DAYS,
+    LLM_MAX_INPUT_TOKENS_PER_ITEM
+)
+from src.common.logger import get_logger
+from src.common.metrics import metrics
+from src.common.rate_limiter import RateLimiter
+from src.data_processing.prompts import SUMMARIZATION_TEMPLATE, BATCH_SUMMARIZATION_TEMPLATE, BATCH_ITEM_TEMPLATE
+from src.data_processing.providers.base import LLMResponse, LLMProviderError
+from src.data_processing.providers.registry import get_provider
+from src.data_processing.providers.resilience import ResilientProvider
+from src.data_processing.tokens import estimate_tokens, fit_to_budget, token_budget
+
+logger = get_logger(__name__)
+
+MAX_INPUT_TOKENS = LLM_MAX_INPUT_TOKENS_PER_ITEM
+MAX_OUTPUT_TOKENS_PER_ITEM = 400
+MAX_OUTPUT_TOKENS = 8192
+# Fields a batch entry must carry, with their JSON types, to count as a classification of its item
+REQUIRED_BATCH_FIELDS = {"sentiment_s1": str, "action_needed": str, "competitors_mentioned": list}
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": MAX_OUTPUT_TOKENS_PER_ITEM
+}
+# Classifications keyed by (model, generation config, rendered prompt), so re-runs skip content we've already seen
+llm_cache = SQLiteCache(
+    LLM_CACHE_PATH,
+    name="llm",
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    max_age_seconds=LLM_CACHE_MAX_AGE_DAYS * 24 * 3600
+) if LLM_CACHE_ENABLED else None
+
+
+def classify_content(post_text: str, stage: str = "classify", rate_limiter: Optional[RateLimiter] = None) -> dict:
+    """
+    Calls the configured LLM provider (see providers/registry.py) to summarize & classify a post.
+    Returns a dict with the parsed JSON fields (e.g. summary, sentiment_s1, etc.).
+    Token usage is recorded under `stage` in the shared token budget. Cache hits don't wait for `rate_limiter`.
+    """
+    # Callers normally fit long text around product mentions first; this is the hard cap
+    truncated_text = fit_to_budget(post_text, MAX_INPUT_TOKENS)
+
+    cache_key = classification_cache_key(truncated_text)
+    if llm_cache is not None:
+        cached_response = llm_cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+    return _classify_single(truncated_text, cache_key, stage, rate_limiter)
+
+
+def _classify_single(
+        truncated_text: str,
+        cache_key: str,
+        stage: str = "classify",
+        rate_limiter: Optional[RateLimiter] = None
+) -> dict:
+    """
+    Sends one post/comment to the LLM, once `rate_limiter` allows it, and caches the parsed result.
+    """
+    llm_output = ""
+    prompt = SUMMARIZATION_TEMPLATE.format(text=truncated_text)
+    prompt_tokens = estimate_tokens(prompt)
+    if not token_budget.try_reserve(prompt_tokens):
+        return get_budget_exhausted_response()
+
+    try:
+        response = _generate(prompt, "single", rate_limiter, prompt_tokens, **GENERATION_CONFIG)
+        llm_output = response.text
+        _record_usage(stage, response, prompt_tokens)
+        # Remove ```json fences if present
+        clean_output = strip_markdown_code_fences(llm_output)
+
+        parsed_response = json.loads(clean_output)
+        if not parsed_response or not isinstance(parsed_response, dict):
+            metrics.inc("llm_json_parse_failures_total", kind="single")
+            logger.error(f"LLM response was not a JSON object. Output:\n{response.text}")
+            return get_parse_failed_response()
+
+        _cache_result(cache_key, parsed_response)
+        return parsed_response
+
+    except json.JSONDecodeError:
+        metrics.inc("llm_json_parse_failures_total", kind="single")
+        logger.error("LLM response was not valid JSON. Output:\n" + llm_output)
+        return get_parse_failed_response()
+    except Exception as e:
+        logger.error(f"Error calling the LLM ({get_provider().name}): {e}")
+        return get_failed_response()
+
+
+def classify_batch(
+        items: list[tuple[str, str]],
+        stage: str = "batch",
+        rate_limiter: Optional[RateLimiter] = None
+) -> dict[str, dict]:
+    """
+    Classifies several posts/comments with a single LLM call.
+    `items` is a list of (item_id, text) pairs; returns {item_id: parsed result}.
+    Items missing from the response or lacking a required field (or the whole batch, if it isn't valid JSON)
+    are split in halves and retried, down to single-item calls.
+    Cached items are served from the classification cache and never sent, nor wait for `rate_limiter`.
+    """
+    results = {}
+    uncached_items = []
+    for item_id, text in items:
+        cached_response = None
+        if llm_cache is not None:
+            cached_response = llm_cache.get(classification_cache_key(fit_to_budget(text, MAX_INPUT_TOKENS)))
+        if cached_response is not None:
+            results[item_id] = cached_response
+        else:
+            uncached_items.append((item_id, text))
+
+    results.update(_process_batch(uncached_items, stage, rate_limiter))
+    return results
+
+
+def _process_batch(
+        items: list[tuple[str, str]],
+        stage: str = "batch",
+        rate_limiter: Optional[RateLimiter] = None
+) -> dict[str, dict]:
+    """
+    Every call, including the retries of re-split halves, waits for `rate_limiter`.
+    """
+    if not items:
+        return {}
+    if len(items) == 1:
+        item_id, text = items[0]
+        truncated_text = fit_to_budget(text, MAX_INPUT_TOKENS)
+        return {
+            item_id: _classify_single(truncated_text, classification_cache_key(truncated_text), stage, rate_limiter)
+        }
+
+    results = _call_batch(items, stage, rate_limiter)
+
+    failed = [item for item in items if item[0] not in results]
+    if failed:
+        logger.warning(f"Batch of {len(items)} items returned {len(failed)} unparsed items, retrying them.")
+        middle = len(failed) // 2 or 1
+        results.update(_process_batch(failed[:middle], stage, rate_limiter))
+        results.update(_process_batch(failed[middle:], stage, rate_limiter))
+
+    return results
+
+
+def _call_batch(
+        items: list[tuple[str, str]],
+        stage: str = "batch",
+        rate_limiter: Optional[RateLimiter] = None
+) -> dict[str, dict]:
+    """
+    Sends one batched request, once `rate_limiter` allows it, and returns the results that parsed, keyed by item id.
+    If the run's token budget can't cover the batch, nothing is sent and the items
+    fall through to single-item calls (which report the exhausted budget).
+    """
+    llm_output = ""
+    prompt = render_batch_prompt(items)
+    prompt_tokens = estimate_tokens(prompt)
+    if not token_budget.try_reserve(prompt_tokens):
+        return {}
+    requested_texts = dict(items)
+    batch_config = {
+        **GENERATION_CONFIG,
+        "max_output_tokens": min(MAX_OUTPUT_TOKENS, MAX_OUTPUT_TOKENS_PER_ITEM * len(items))
+    }
+
+    try:
+        response = _generate(prompt, "batch", rate_limiter, prompt_tokens, **batch_config)
+        llm_output = response.text
+        _record_usage(stage, response, prompt_tokens)
+        parsed_response = json.loads(strip_markdown_code_fences(llm_output))
+    except json.JSONDecodeError:
+        metrics.inc("llm_json_parse_failures_total", kind="batch")
+        logger.error("LLM batch response was not valid JSON. Output:\n" + llm_output)
+        return {}
+    except Exception as e:
+        # The provider already retried; splitting the batch would only multiply the failing calls
+        logger.error(f"Error calling the LLM ({get_provider().name}): {e}")
+        return {item_id: get_failed_response() for item_id, _ in items}
+
+    if isinstance(parsed_response, dict):
+        parsed_response = parsed_response.get("items", [])
+    if not isinstance(parsed_response, list):
+        metrics.inc("llm_json_parse_failures_total", kind="batch")
+        logger.error("LLM batch response was not a JSON array. Output:\n" + llm_output)
+        return {}
+
+    results = {}
+    for entry in parsed_response:
+        if not isinstance(entry, dict):
+            continue
+        item_id = str(entry.pop("id", ""))
+        if item_id in requested_texts and _is_complete_entry(entry):
+            results[item_id] = entry
+            # Cache under the single-item key so batched and single runs share classifications
+            _cache_result(classification_cache_key(fit_to_budget(requested_texts[item_id], MAX_INPUT_TOKENS)), entry)
+    return results
+
+
+def _is_complete_entry(entry: dict) -> bool:
+    return all(isinstance(entry.get(field), field_type) for field, field_type in REQUIRED_BATCH_FIELDS.items())
+
+
+def classification_cache_key(truncated_text: str) -> str:
+    """
+    Cache key for a classification: hash of (model, generation config, rendered prompt).
+    """
+    return make_cache_key(get_provider().model, GENERATION_CONFIG, SUMMARIZATION_TEMPLATE.format(text=truncated_text))
+
+
+def classification_version() -> str:
+    """
+    What a classification depends on besides its text: the model, the generation config and the prompts.
+    Results recorded under another version (e.g. in the processing checkpoint) are stale.
+    """
+    return make_cache_key(
+        get_provider().model, GENERATION_CONFIG, SUMMARIZATION_TEMPLATE, BATCH_SUMMARIZATION_TEMPLATE,
+        BATCH_ITEM_TEMPLATE
+    )
+
+
+def _generate(
+        prompt: str,
+        kind: str,
+        rate_limiter: Optional[RateLimiter] = None,
+        prompt_tokens: int = 0,
+        **config
+) -> LLMResponse:
+    """
+    One provider call once `rate_limiter` allows it (a ResilientProvider waits for it before each of its attempts),
+    timed into llm_request_seconds; failures are counted by HTTP status before re-raising.
+    """
+    provider = get_provider()
+    if isinstance(provider, ResilientProvider):
+        config.update(rate_limiter=rate_limiter, prompt_tokens=prompt_tokens)
+    elif rate_limiter is not None:
+        rate_limiter.acquire(tokens=prompt_tokens)
+    try:
+        with metrics.timer("llm_request_seconds", provider=provider.name, kind=kind):
+            return provider.generate(prompt, **config)
+    except Exception as e:
+        status = e.status if isinstance(e, LLMProviderError) and e.status is not None else "none"
+        metrics.inc("llm_errors_total", provider=provider.name, status=status)
+        raise
+
+
+def _record_usage(stage: str, response: LLMResponse, prompt_tokens: int):
+    """
+    Records the token counts the provider reports for a call, falling back to local estimates.
+    """
+    input_tokens = response.input_tokens or prompt_tokens
+    output_tokens = response.output_tokens or estimate_tokens(response.text)
+    token_budget.record(stage, input_tokens, output_tokens)
+    metrics.inc("llm_tokens_total", input_tokens, stage=stage, direction="in")
+    metrics.inc("llm_tokens_total", output_tokens, stage=stage, direction="out")
+
+
+def _cache_result(cache_key: str, parsed_response: dict):
+    if llm_cache is None:
+        return
+    try:
+        llm_cache.set(cache_key, parsed_response)
+    except Exception as e:
+        logger.error(f"Error writing to the LLM cache: {e}")
+
+
+def render_batch_prompt(items: list[tuple[str, str]]) -> str:
+    rendered_items = "".join(
+        BATCH_ITEM_TEMPLATE.format(item_id=item_id, text=fit_to_budget(text, MAX_INPUT_TOKENS))
+        for item_id, text in items
+    )
+    return BATCH_SUMMARIZATION_TEMPLATE.format(items=rendered_items)
+
+
+def pack_batches(items: list[tuple[str, str]], token_budget: int, max_items: int) -> list[list[tuple[str, str]]]:
+    """
+    Greedily packs (item_id, text) pairs, in order, into batches whose estimated prompt size
+    stays within `token_budget` tokens and which hold at most `max_items` items each.
+    """
+    preamble_tokens = estimate_tokens(BATCH_SUMMARIZATION_TEMPLATE)
+    batches = []
+    current = []
+    current_tokens = preamble_tokens
+
+    for item_id, text in items:
+        item_tokens = estimate_tokens(
+            BATCH_ITEM_TEMPLATE.format(item_id=item_id, text=fit_to_budget(text, MAX_INPUT_TOKENS))
+        )
+        if current and (current_tokens + item_tokens > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_tokens = preamble_tokens
+        current.append((item_id, text))
+        current_tokens += item_tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def get_default_response() -> dict:
+    """Return a default response structure."""
+    return {
+        "summary": "",
+        "sentiment_s1": "unknown",
+        "benefits_mentioned": [],
+        "complaints_mentioned": [],
+        "competitors_mentioned": [],
+        "overall_tone": "unknown",
+        "action_needed": "no_action",
+        "action_reason": "",
+        "suggested_response": ""
+    }
+
+
+def get_budget_exhausted_response() -> dict:
+    """
+    Response for content that wasn't sent because the run's token budget is used up.
+    It is neither cached nor checkpointed, so the next run picks the content up again.
+    """
+    response = get_default_response()
+    response["token_budget_exhausted"] = True
+    return response
+
+
+def get_failed_response() -> dict:
+    """
+    Response for content whose LLM call still failed after the provider's retries.
+    Like an exhausted budget, it is neither cached nor checkpointed, so the next run classifies the content again.
+    """
+    response = get_default_response()
+    response["llm_failed"] = True
+    return response
+
+
+def get_parse_failed_response() -> dict:
+    """
+    Response for content whose LLM reply was empty or not a JSON object. It counts as a failed call
+    (neither cached, checkpointed nor reused for near-duplicates), so the next run asks again.
+    """
+    response = get_failed_response()
+    response["parse_failed"] = True
+    return response
+
+
+def is_placeholder_response(response: dict) -> bool:
+    """
+    True for responses standing in for a classification that didn't happen (budget exhausted, call failed,
+    reply unparseable).
+    """
+    return bool(response.get("token_budget_exhausted") or response.get("llm_failed"))
+
+
+def strip_markdown_code_fences(text: str) -> str:
+    """
+    If the text is wrapped in triple-backtick fences, remove them so it's valid JSON.
+    e.g.:
+        ```json
+        { "summary": "..." }
+        ```
+    becomes
+        { "summary": "..." }
+    """
+    # Remove leading fences like ``` or ```json
+    text = re.sub(r"^```(\w+)?", "", text.strip())
+    # Remove trailing fences
+    text = re.sub(r"```$", "", text.strip())
+    return text.strip()
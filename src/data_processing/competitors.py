@@ -0,0 +1,87 @@
+import difflib
+import re
+from functools import lru_cache
+from typing import Optional
+
+from src.common.constants import QUERIES, COMPETITOR_ALIASES, COMPETITOR_FUZZY_CUTOFF
+
+# Fuzzy matching on very short names ("S1", "CB") produces more false positives than it fixes
+MIN_FUZZY_LENGTH = 4
+
+
+class CompetitorIndex:
+    """
+    Normalizes the competitor names the LLM returns ("Crowdstrike", "CS Falcon", ...) to canonical ids
+    ("crowdstrike"). Built once from the alias table; names that match no alias exactly are fuzzy-matched
+    against it, and every lookup is memoized, so repeated names cost a dict hit.
+    Names that match nothing are kept as their own competitor.
+    """
+
+    def __init__(
+            self,
+            aliases: Optional[dict] = None,
+            queries: Optional[list] = None,
+            fuzzy_cutoff: float = COMPETITOR_FUZZY_CUTOFF,
+            cache_size: int = 65536
+    ):
+        self.alias_to_name = build_alias_table(
+            COMPETITOR_ALIASES if aliases is None else aliases,
+            QUERIES if queries is None else queries
+        )
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._fuzzy_keys = [alias for alias in self.alias_to_name if len(alias) >= MIN_FUZZY_LENGTH]
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _normalize(self, name: str) -> tuple[str, str]:
+        """
+        Returns (competitor_id, display name) for a competitor name as written by the LLM.
+        """
+        display_name = " ".join(name.split())
+        key = display_name.lower()
+        canonical = self.alias_to_name.get(key)
+        if canonical is None and len(key) >= MIN_FUZZY_LENGTH:
+            matches = difflib.get_close_matches(key, self._fuzzy_keys, n=1, cutoff=self.fuzzy_cutoff)
+            if matches:
+                canonical = self.alias_to_name[matches[0]]
+        if canonical is not None:
+            display_name = canonical
+        return competitor_id(display_name), display_name
+
+    def normalize_all(self, names: list[str]) -> list[tuple[str, str]]:
+        """
+        Normalizes a list of names, dropping blanks, non-strings (the LLM's JSON can hold anything) and duplicates
+        (e.g. "S1" and "SentinelOne" in one item).
+        """
+        normalized = {}
+        for name in names:
+            if isinstance(name, str) and name.strip():
+                competitor, display_name = self.normalize(name)
+                normalized.setdefault(competitor, display_name)
+        return list(normalized.items())
+
+
+def competitor_id(name: str) -> str:
+    """
+    Stable id for a competitor name, e.g. "Microsoft Defender" -> "microsoft-defender".
+    """
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def build_alias_table(aliases: dict, queries: list) -> dict:
+    """
+    Returns {lowercased alias: canonical name} from an alias table plus Reddit search queries.
+    For a query like "SentinelOne OR S1", every term maps to the first one.
+    """
+    alias_to_name = {}
+    for name, name_aliases in aliases.items():
+        for alias in [name] + list(name_aliases):
+            alias_to_name[alias.lower()] = name
+
+    for query in queries:
+        terms = [term.strip().strip('"') for term in query.split(" OR ") if term.strip()]
+        if not terms:
+            continue
+        name = alias_to_name.get(terms[0].lower(), terms[0])
+        for term in terms:
+            alias_to_name.setdefault(term.lower(), name)
+    return alias_to_name
@@ -0,0 +1,367 @@
+import json
+import os
+import zlib
+from collections import Counter
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.common.constants import (
+    RAW_MSP_DATA_PATH,
+    PROCESSED_MSP_DATA_PATH,
+    LOCAL_CLASSIFIER_MODEL_PATH,
+    CASCADE_SENTIMENT_MIN_CONFIDENCE,
+    CASCADE_TONE_MIN_CONFIDENCE,
+    CASCADE_ACTION_ESCALATE_PROBABILITY,
+    CASCADE_AGREEMENT_REPORT_PATH
+)
+from src.common.jsonl import iter_records
+from src.common.logger import get_logger
+from src.common.metrics import metrics
+from src.data_processing.classification import get_default_response
+from src.data_processing.near_duplicates import normalize_text
+from src.data_processing.relevance import RelevanceFilter
+
+logger = get_logger(__name__)
+
+# Fields the local model predicts, each with its own Naive Bayes head
+SENTIMENT = "sentiment_s1"
+TONE = "overall_tone"
+ACTION = "action_needed"
+HEADS = (SENTIMENT, TONE, ACTION)
+
+# Laplace smoothing; features seen fewer times than MIN_FEATURE_COUNT, and labels with fewer than MIN_LABEL_ITEMS
+# items, are dropped from the model
+SMOOTHING = 1.0
+MIN_FEATURE_COUNT = 2
+MIN_LABEL_ITEMS = 5
+# Long content counts as at most this many features of evidence, so confidence doesn't grow with length alone
+EVIDENCE_FEATURES = 20
+
+# One item in HOLDOUT_EVERY (by a hash of its key) is held out of training to measure agreement, up to MAX_HOLDOUT
+HOLDOUT_EVERY = 5
+MAX_HOLDOUT_ITEMS = 20000
+REPORT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95)
+
+
+def extract_features(text: str) -> list[str]:
+    """
+    Word unigrams and bigrams of the normalized text (see near_duplicates.normalize_text).
+    """
+    words = normalize_text(text)
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class NaiveBayesHead:
+    """
+    Multinomial Naive Bayes over features for one field. Keeps the raw counts (for saving) and their
+    log-probabilities as a matrix, so scoring an item is one row lookup per known feature.
+    """
+
+    def __init__(self, label_items: dict, feature_counts: dict):
+        self.labels = sorted(label_items)
+        self.label_items = label_items
+        self.feature_counts = feature_counts
+        self._feature_rows = {feature: row for row, feature in enumerate(feature_counts)}
+
+        items = np.array([label_items[label] for label in self.labels], dtype=np.float64)
+        counts = np.array(
+            [[per_label.get(label, 0) for label in self.labels] for per_label in feature_counts.values()],
+            dtype=np.float64
+        ).reshape(len(feature_counts), len(self.labels))
+        totals = counts.sum(axis=0) + SMOOTHING * len(feature_counts)
+        self._log_priors = np.log(items / items.sum())
+        self._log_likelihoods = np.log((counts + SMOOTHING) / totals)
+
+    def predict(self, features: list[str]) -> dict:
+        """
+        {label: probability} for an item's features. Unknown features are ignored.
+        """
+        rows = [self._feature_rows[feature] for feature in features if feature in self._feature_rows]
+        scores = self._log_priors.copy()
+        if rows:
+            scores += self._log_likelihoods[rows].sum(axis=0) * min(1.0, EVIDENCE_FEATURES / len(rows))
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        return dict(zip(self.labels, probabilities.tolist()))
+
+    def to_dict(self) -> dict:
+        return {"label_items": self.label_items, "feature_counts": self.feature_counts}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NaiveBayesHead":
+        return cls(data["label_items"], data["feature_counts"])
+
+    @classmethod
+    def from_counts(cls, label_items: Counter, feature_counts: dict) -> Optional["NaiveBayesHead"]:
+        """
+        A head from training counts ({feature: Counter(label -> count)}), without rare features and labels.
+        None if fewer than two labels are left.
+        """
+        labels = {label for label, count in label_items.items() if count >= MIN_LABEL_ITEMS}
+        if len(labels) < 2:
+            return None
+        kept = {}
+        for feature, per_label in feature_counts.items():
+            counts = {label: count for label, count in per_label.items() if label in labels}
+            if sum(counts.values()) >= MIN_FEATURE_COUNT:
+                kept[feature] = counts
+        return cls({label: label_items[label] for label in labels}, kept)
+
+
+class LocalClassifier:
+    """
+    The cheap first tier of the classification cascade: predicts sentiment_s1, overall_tone and the chance that
+    action is needed from the text alone, and answers for content it is confident about (see `classify`).
+    Trained from the LLM's own classifications (see `train`).
+    """
+
+    def __init__(
+            self,
+            heads: dict,
+            trained_items: int = 0,
+            sentiment_min_confidence: float = CASCADE_SENTIMENT_MIN_CONFIDENCE,
+            tone_min_confidence: float = CASCADE_TONE_MIN_CONFIDENCE,
+            action_escalate_probability: float = CASCADE_ACTION_ESCALATE_PROBABILITY
+    ):
+        self.heads = heads
+        self.trained_items = trained_items
+        self.sentiment_min_confidence = sentiment_min_confidence
+        self.tone_min_confidence = tone_min_confidence
+        self.action_escalate_probability = action_escalate_probability
+        self._mention_filter = RelevanceFilter()
+
+    def predict(self, text: str) -> dict:
+        """
+        {field: (label, confidence)} for sentiment_s1 and overall_tone, and {"action_needed": probability of "yes"}.
+        A field without a trained head is (None, 0.0).
+        """
+        return self.predict_features(extract_features(text))
+
+    def predict_features(self, features: list[str]) -> dict:
+        prediction = {}
+        for field in (SENTIMENT, TONE):
+            head = self.heads.get(field)
+            if head is None:
+                prediction[field] = (None, 0.0)
+                continue
+            probabilities = head.predict(features)
+            label = max(probabilities, key=probabilities.get)
+            prediction[field] = (label, probabilities[label])
+        # Without an action head every item may need action
+        action_head = self.heads.get(ACTION)
+        prediction[ACTION] = action_head.predict(features).get("yes", 0.0) if action_head is not None else 1.0
+        return prediction
+
+    def should_escalate(self, prediction: dict) -> bool:
+        return (
+                prediction[SENTIMENT][1] < self.sentiment_min_confidence
+                or prediction[TONE][1] < self.tone_min_confidence
+                or prediction[ACTION] >= self.action_escalate_probability
+        )
+
+    def classify(self, text: str) -> Optional[dict]:
+        """
+        The local response for `text`, or None when it should escalate to the LLM: when the model isn't confident
+        of the sentiment or tone, or the content may need action. Local responses have no summary and no
+        benefits/complaints; competitors are the products the text names.
+        """
+        prediction = self.predict(text)
+        if self.should_escalate(prediction):
+            metrics.inc("cascade_items_total", tier="llm")
+            return None
+        metrics.inc("cascade_items_total", tier="local")
+        response = get_default_response()
+        response[SENTIMENT] = prediction[SENTIMENT][0]
+        response[TONE] = prediction[TONE][0]
+        response["competitors_mentioned"] = self._mention_filter.find_mentions(text)
+        response["local_classified"] = True
+        response["local_confidence"] = round(min(prediction[SENTIMENT][1], prediction[TONE][1]), 3)
+        return response
+
+    def save(self, path: str = LOCAL_CLASSIFIER_MODEL_PATH):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "trained_items": self.trained_items,
+                "heads": {field: head.to_dict() for field, head in self.heads.items()}
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = LOCAL_CLASSIFIER_MODEL_PATH, **thresholds) -> "LocalClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        heads = {field: NaiveBayesHead.from_dict(head) for field, head in data["heads"].items()}
+        return cls(heads, data["trained_items"], **thresholds)
+
+
+def load_local_classifier(path: str = LOCAL_CLASSIFIER_MODEL_PATH) -> Optional[LocalClassifier]:
+    """
+    The trained local classifier, or None (every item goes to the LLM) if none was trained yet.
+    """
+    if not os.path.exists(path):
+        logger.warning(
+            f"No local classifier at {path}; sending every item to the LLM. "
+            "Train one with `python -m src.data_processing.local_classifier`."
+        )
+        return None
+    classifier = LocalClassifier.load(path)
+    logger.info(f"Loaded local classifier trained on {classifier.trained_items} items from {path}")
+    return classifier
+
+
+def train(
+        raw_path: str = RAW_MSP_DATA_PATH,
+        processed_path: str = PROCESSED_MSP_DATA_PATH,
+        model_path: str = LOCAL_CLASSIFIER_MODEL_PATH,
+        report_path: str = CASCADE_AGREEMENT_REPORT_PATH
+) -> dict:
+    """
+    Trains the local classifier from the LLM's classifications in `processed_path` (the text comes from `raw_path`),
+    writes the agreement report between the two tiers to `report_path`, then retrains on every item and saves the
+    model to `model_path`. Returns the report.
+
+    The report is measured on held-out items (never trained on): at the configured thresholds, how much content
+    stays local and how often the local labels agree with the LLM's, plus the same for other sentiment thresholds.
+    """
+    labels = llm_labels(iter_records(processed_path))
+    counts = _new_counts()
+    holdout = []
+    for item_key, text in iter_item_texts(iter_records(raw_path)):
+        item_labels = labels.get(item_key)
+        if item_labels is None:
+            continue
+        features = extract_features(text)
+        if len(holdout) < MAX_HOLDOUT_ITEMS and zlib.crc32(item_key.encode("utf-8")) % HOLDOUT_EVERY == 0:
+            holdout.append((features, item_labels))
+        else:
+            _add_counts(counts, features, item_labels)
+    logger.info(f"Training on {counts['items']} LLM-classified items, {len(holdout)} held out.")
+
+    report = agreement_report(_build(counts), holdout)
+    for features, item_labels in holdout:
+        _add_counts(counts, features, item_labels)
+    classifier = _build(counts)
+    classifier.save(model_path)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    configured = report["at_configured_thresholds"]
+    logger.info(
+        f"Local classifier saved to {model_path}. On held-out items it would answer {configured['local_share']:.0%} "
+        f"itself, agreeing with the LLM on sentiment for {configured['sentiment_agreement']:.0%} of them "
+        f"(report: {report_path})."
+    )
+    return report
+
+
+def agreement_report(classifier: LocalClassifier, items: list[tuple[list[str], dict]]) -> dict:
+    """
+    Compares the local classifier with the LLM labels of `items` ([(features, {field: label})]).
+    """
+    rows = [(classifier.predict_features(features), item_labels) for features, item_labels in items]
+
+    def summarize(kept: list) -> dict:
+        return {
+            "items": len(rows),
+            "local_items": len(kept),
+            "local_share": round(len(kept) / len(rows), 4) if rows else 0.0,
+            "sentiment_agreement": _agreement(kept, SENTIMENT),
+            "tone_agreement": _agreement(kept, TONE),
+            # Answered locally although the LLM said action was needed: these would be missed
+            "actionable_kept_local": sum(1 for _, item_labels in kept if item_labels[ACTION] == "yes")
+        }
+
+    confusion = {}
+    for prediction, item_labels in rows:
+        by_llm = confusion.setdefault(item_labels[SENTIMENT], Counter())
+        by_llm[prediction[SENTIMENT][0]] += 1
+
+    return {
+        "thresholds": {
+            "sentiment_min_confidence": classifier.sentiment_min_confidence,
+            "tone_min_confidence": classifier.tone_min_confidence,
+            "action_escalate_probability": classifier.action_escalate_probability
+        },
+        "at_configured_thresholds": summarize(
+            [row for row in rows if not classifier.should_escalate(row[0])]
+        ),
+        "all_items": summarize(rows),
+        "by_sentiment_threshold": [
+            {"sentiment_min_confidence": threshold, **summarize([
+                row for row in rows
+                if row[0][SENTIMENT][1] >= threshold and row[0][TONE][1] >= classifier.tone_min_confidence
+                and row[0][ACTION] < classifier.action_escalate_probability
+            ])}
+            for threshold in REPORT_THRESHOLDS
+        ],
+        "sentiment_confusion": {llm_label: dict(local) for llm_label, local in sorted(confusion.items())}
+    }
+
+
+def llm_labels(processed_posts: Iterable[dict]) -> dict:
+    """
+    {item_key: {field: label}} for the posts and comments the LLM classified (not filtered, failed, near-duplicate
+    or locally classified content), labels lowercased.
+    """
+    labels = {}
+    for post in processed_posts:
+        records = [(f"post-{post['post_id']}", post)]
+        records += [(f"comment-{comment['comment_id']}", comment) for comment in post.get("comments", [])]
+        for item_key, record in records:
+            if (record.get("filtered") or record.get("llm_failed") or record.get("duplicate_of")
+                    or record.get("local_classified")):
+                continue
+            labels[item_key] = {
+                SENTIMENT: str(record.get(SENTIMENT, "unknown")).strip().lower(),
+                TONE: str(record.get(TONE, "unknown")).strip().lower(),
+                ACTION: "yes" if record.get(ACTION) == "yes" else "no_action"
+            }
+    return labels
+
+
+def iter_item_texts(raw_posts: Iterable[dict]):
+    """
+    Yields (item_key, text) for every raw post and comment, the text being what the cascade sees at classification.
+    """
+    for post in raw_posts:
+        yield f"post-{post['id']}", f"{post['title']}\n\n{post['selftext']}"
+        for comment in post.get("comments", []):
+            yield f"comment-{comment['comment_id']}", comment["body"]
+
+
+def _new_counts() -> dict:
+    return {"items": 0, "heads": {field: (Counter(), {}) for field in HEADS}}
+
+
+def _add_counts(counts: dict, features: list[str], item_labels: dict):
+    counts["items"] += 1
+    for field, (label_items, feature_counts) in counts["heads"].items():
+        label = item_labels[field]
+        label_items[label] += 1
+        for feature in features:
+            per_label = feature_counts.get(feature)
+            if per_label is None:
+                per_label = feature_counts[feature] = Counter()
+            per_label[label] += 1
+
+
+def _build(counts: dict) -> LocalClassifier:
+    heads = {}
+    for field, (label_items, feature_counts) in counts["heads"].items():
+        head = NaiveBayesHead.from_counts(label_items, feature_counts)
+        if head is not None:
+            heads[field] = head
+    return LocalClassifier(heads, counts["items"])
+
+
+def _agreement(rows: list, field: str) -> float:
+    if not rows:
+        return 0.0
+    agreeing = sum(1 for prediction, item_labels in rows if prediction[field][0] == item_labels[field])
+    return round(agreeing / len(rows), 4)
+
+
+if __name__ == "__main__":
+    train()
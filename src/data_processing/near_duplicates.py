@@ -0,0 +1,284 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+import numpy as np
+
+from src.common.constants import (
+    NEAR_DUPLICATE_INDEX_PATH,
+    NEAR_DUPLICATE_MAX_DISTANCE,
+    NEAR_DUPLICATE_MIN_WORDS,
+    NEAR_DUPLICATE_MAX_AGE_DAYS
+)
+from src.common.logger import get_logger
+from src.common.metrics import metrics
+from src.data_processing.classification import is_placeholder_response
+
+logger = get_logger(__name__)
+
+FINGERPRINT_BITS = 64
+# Fingerprints are built from overlapping runs of this many words
+SHINGLE_WORDS = 3
+
+# Quoted lines (markdown "> ...", sometimes HTML-escaped in Reddit's API) and links
+_QUOTED_LINE = re.compile(r"^[ \t]*(?:>|&gt;).*$", re.MULTILINE)
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_NON_WORD = re.compile(r"\W+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    item_key TEXT PRIMARY KEY,
+    fingerprint INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_created_at ON fingerprints (created_at);
+
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    item_key TEXT NOT NULL,
+    PRIMARY KEY (band, value, item_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bands_item_key ON bands (item_key);
+"""
+
+
+def normalize_text(text: str) -> list[str]:
+    """
+    The words of `text` that count for near-duplicate detection: lowercased, without quoted lines, links
+    and punctuation, so a reply quoting a post is judged on its own words, and a cross-post with another
+    link or formatting still matches the original.
+    """
+    text = _QUOTED_LINE.sub(" ", text)
+    text = _URL.sub(" ", text.lower())
+    return _NON_WORD.sub(" ", text).split()
+
+
+def simhash(words: list[str]) -> int:
+    """
+    64-bit SimHash of a word list, over its distinct SHINGLE_WORDS-word shingles: each bit is the majority vote
+    of that bit across the shingles' hashes, so texts sharing most shingles differ in only a few bits.
+    """
+    shingles = {
+        " ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    }
+    digests = b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(len(shingles), 8), axis=1)
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class NearDuplicate:
+    """
+    A match in the index: the original item, how many fingerprint bits differ, and the original's
+    classification (a future, since the original may still be waiting for its LLM call).
+    """
+
+    def __init__(self, item_key: str, distance: int, result: Future):
+        self.item_key = item_key
+        self.distance = distance
+        self.result = result
+
+
+class NearDuplicateIndex:
+    """
+    Persistent SimHash index of classified content, for reusing a classification on near-duplicates
+    (cross-posts, bot messages, pasted vendor boilerplate) that the exact-text LLM cache misses.
+
+    Two fingerprints within `max_distance` bits agree on at least one of `max_distance + 1` bands
+    (pigeonhole), so candidates are looked up by band in SQLite and only those are compared bit by bit.
+    Content whose classification is still in flight is matched too (see `track`), so copies in the same run
+    wait for the original's result instead of making their own LLM call.
+    Entries older than `max_age_seconds` are dropped when the index is opened. Safe to share between threads.
+    """
+
+    def __init__(
+            self,
+            path: str = NEAR_DUPLICATE_INDEX_PATH,
+            max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE,
+            min_words: int = NEAR_DUPLICATE_MIN_WORDS,
+            max_age_seconds: Optional[float] = NEAR_DUPLICATE_MAX_AGE_DAYS * 24 * 3600
+    ):
+        self.path = path
+        self.max_distance = max_distance
+        self.min_words = min_words
+        self.bands = min(FINGERPRINT_BITS, max_distance + 1)
+        self._band_bits = [
+            (band * FINGERPRINT_BITS // self.bands, (band + 1) * FINGERPRINT_BITS // self.bands)
+            for band in range(self.bands)
+        ]
+        # In-flight content: item_key -> (fingerprint, future), and (band, value) -> item_keys
+        self._pending = {}
+        self._pending_bands = {}
+        self._lock = threading.Lock()
+        # Sharded runs open the same index from several processes
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._prune(max_age_seconds)
+        self._check_bands()
+        self._conn.commit()
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        """
+        The SimHash of `text`, or None if it is too short to be told apart from unrelated content.
+        """
+        words = normalize_text(text)
+        if len(words) < self.min_words:
+            return None
+        return simhash(words)
+
+    def find(self, fingerprint: int, item_key: Optional[str] = None) -> Optional[NearDuplicate]:
+        """
+        The closest indexed or in-flight content within `max_distance` bits (ties go to the smallest item key),
+        or None. `item_key` itself (indexed by an earlier run) is never its own near-duplicate.
+        """
+        band_values = self._band_values(fingerprint)
+        with self._lock:
+            candidates = []
+            for key in {key for band_value in band_values for key in self._pending_bands.get(band_value, ())}:
+                if key in self._pending:
+                    pending_fingerprint, future = self._pending[key]
+                    candidates.append((hamming_distance(fingerprint, pending_fingerprint), key, future))
+            rows = self._conn.execute(
+                "SELECT DISTINCT f.item_key, f.fingerprint FROM bands b JOIN fingerprints f ON f.item_key = b.item_key"
+                " WHERE " + " OR ".join(["(b.band = ? AND b.value = ?)"] * len(band_values)),
+                [part for band_value in band_values for part in band_value]
+            ).fetchall()
+            candidates += [(hamming_distance(fingerprint, _unsigned(stored)), key, None) for key, stored in rows]
+            matches = [
+                candidate for candidate in candidates
+                if candidate[0] <= self.max_distance and candidate[1] != item_key
+            ]
+            if not matches:
+                metrics.inc("near_duplicate_lookups_total", result="miss")
+                return None
+            distance, original_key, future = min(matches, key=lambda candidate: candidate[:2])
+            if future is None:
+                row = self._conn.execute(
+                    "SELECT result FROM fingerprints WHERE item_key = ?", (original_key,)
+                ).fetchone()
+                future = Future()
+                future.set_result(json.loads(row[0]))
+        metrics.inc("near_duplicate_lookups_total", result="hit")
+        return NearDuplicate(original_key, distance, future)
+
+    def add(self, item_key: str, fingerprint: int, result: dict):
+        """
+        Indexes the classification of `item_key`. Placeholder responses (failed calls, exhausted budget) are not.
+        """
+        if is_placeholder_response(result):
+            return
+        with self._lock:
+            self._store(item_key, fingerprint, result)
+            self._conn.commit()
+
+    def track(self, item_key: str, fingerprint: int) -> Future:
+        """
+        Registers content about to be classified and returns the future to complete with its classification.
+        Until then, near-duplicates found in the index share that future; once completed, the classification
+        is indexed (unless it is a placeholder response).
+        """
+        future = Future()
+        with self._lock:
+            self._pending[item_key] = (fingerprint, future)
+            for band_value in self._band_values(fingerprint):
+                self._pending_bands.setdefault(band_value, []).append(item_key)
+        future.add_done_callback(lambda done: self._resolve(item_key, fingerprint, done))
+        return future
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+        return {"entries": size, "in_flight": len(self._pending)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _resolve(self, item_key: str, fingerprint: int, future: Future):
+        with self._lock:
+            self._pending.pop(item_key, None)
+            for band_value in self._band_values(fingerprint):
+                keys = self._pending_bands.get(band_value)
+                if keys is not None:
+                    keys.remove(item_key)
+                    if not keys:
+                        del self._pending_bands[band_value]
+            if not future.cancelled() and future.exception() is None and not is_placeholder_response(future.result()):
+                self._store(item_key, fingerprint, future.result())
+                self._conn.commit()
+
+    def _store(self, item_key: str, fingerprint: int, result: dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fingerprints (item_key, fingerprint, result, created_at) VALUES (?, ?, ?, ?)",
+            (item_key, _signed(fingerprint), json.dumps(result, ensure_ascii=False), time.time())
+        )
+        self._conn.execute("DELETE FROM bands WHERE item_key = ?", (item_key,))
+        self._conn.executemany(
+            "INSERT INTO bands (band, value, item_key) VALUES (?, ?, ?)",
+            [(band, value, item_key) for band, value in self._band_values(fingerprint)]
+        )
+
+    def _band_values(self, fingerprint: int) -> list[tuple[int, int]]:
+        return [
+            (band, (fingerprint >> start) & ((1 << (end - start)) - 1))
+            for band, (start, end) in enumerate(self._band_bits)
+        ]
+
+    def _prune(self, max_age_seconds: Optional[float]):
+        if max_age_seconds is None:
+            return
+        pruned = self._conn.execute(
+            "DELETE FROM fingerprints WHERE created_at < ?", (time.time() - max_age_seconds,)
+        ).rowcount
+        if pruned:
+            self._conn.execute("DELETE FROM bands WHERE item_key NOT IN (SELECT item_key FROM fingerprints)")
+            logger.info(f"Dropped {pruned} near-duplicate index entries older than {max_age_seconds / 86400:g} days.")
+
+    def _check_bands(self):
+        """
+        Bands depend on `max_distance`: re-bands the index (stored in user_version) when it has changed.
+        """
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] == self.bands:
+            return
+        self._conn.execute("DELETE FROM bands")
+        for item_key, stored in self._conn.execute("SELECT item_key, fingerprint FROM fingerprints").fetchall():
+            self._conn.executemany(
+                "INSERT INTO bands (band, value, item_key) VALUES (?, ?, ?)",
+                [(band, value, item_key) for band, value in self._band_values(_unsigned(stored))]
+            )
+        self._conn.execute(f"PRAGMA user_version = {self.bands}")
+
+
+def get_duplicate_response(original: dict, match: NearDuplicate) -> dict:
+    """
+    Response used instead of an LLM call for a near-duplicate: the original's classification, linked to it.
+    A placeholder original is returned as is, so the copy is retried along with it.
+    """
+    if is_placeholder_response(original):
+        return original
+    response = dict(original)
+    response["duplicate_of"] = match.item_key
+    response["duplicate_distance"] = match.distance
+    return response
+
+
+def _signed(fingerprint: int) -> int:
+    # SQLite integers are signed 64-bit
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >= 1 << (FINGERPRINT_BITS - 1) else fingerprint
+
+
+def _unsigned(stored: int) -> int:
+    return stored & ((1 << FINGERPRINT_BITS) - 1)
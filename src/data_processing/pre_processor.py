@@ -1,98 +1,465 @@
 import json
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
 
-from src.common.constants import RAW_MSP_DATA_PATH, PROCESSED_MSP_DATA_PATH
+from src.common.constants import (
+    RAW_MSP_DATA_PATH,
+    LEGACY_RAW_MSP_DATA_PATH,
+    PROCESSED_MSP_DATA_PATH,
+    PROCESSING_CHECKPOINT_PATH,
+    CHECKPOINT_FSYNC_EVERY,
+    PROCESSING_WINDOW_POSTS,
+    RELEVANCE_FILTER_ENABLED,
+    RELEVANCE_FILTER_INHERIT_POST,
+    NEAR_DUPLICATE_ENABLED,
+    CASCADE_ENABLED,
+    LLM_MAX_WORKERS,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_BATCH_MODE,
+    LLM_BATCH_TOKEN_BUDGET,
+    LLM_BATCH_MAX_ITEMS,
+    LLM_MAX_INPUT_TOKENS_PER_ITEM,
+    TOKEN_USAGE_REPORT_PATH
+)
+from src.common.jsonl import iter_records, follow_records, write_records
 from src.common.logger import get_logger
-from src.data_processing.providers.gemini import process_content_with_genai
+from src.common.metrics import metrics
+from src.common.rate_limiter import RateLimiter
+from src.data_processing.checkpoint import CheckpointLog
+from src.data_processing.classification import (
+    classify_content,
+    classify_batch,
+    classification_version,
+    pack_batches,
+    is_placeholder_response,
+    llm_cache
+)
+from src.data_processing.local_classifier import LocalClassifier, load_local_classifier
+from src.data_processing.near_duplicates import NearDuplicateIndex, get_duplicate_response
+from src.data_processing.records import ProcessedComment, ProcessedPost
+from src.data_processing.relevance import RelevanceFilter, get_filtered_response
+from src.data_processing.tokens import fit_to_budget, token_budget
 
 logger = get_logger(__name__)
 
+# Used to keep the sentences around product mentions when long content is fitted to its token budget
+mention_filter = RelevanceFilter()
 
-def main():
-    with open(RAW_MSP_DATA_PATH, "r", encoding="utf-8") as f:
-        all_posts = json.load(f)
 
-    logger.info(f"Loaded {len(all_posts)} posts from {RAW_MSP_DATA_PATH}")
+def main(
+        max_workers: int = LLM_MAX_WORKERS,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        batch_mode: bool = LLM_BATCH_MODE,
+        follow_input: bool = False,
+        relevance_filter_enabled: bool = RELEVANCE_FILTER_ENABLED,
+        near_duplicates_enabled: bool = NEAR_DUPLICATE_ENABLED,
+        cascade_enabled: bool = CASCADE_ENABLED
+):
+    """
+    Classifies the raw posts into PROCESSED_MSP_DATA_PATH.
+    With `follow_input`, raw posts are consumed while the fetcher is still writing them.
+    """
+    started = time.perf_counter()
+    if follow_input:
+        all_posts = follow_records(RAW_MSP_DATA_PATH)
+    else:
+        all_posts = iter_records(RAW_MSP_DATA_PATH, legacy_path=LEGACY_RAW_MSP_DATA_PATH)
+
+    logger.info(f"Streaming posts from {RAW_MSP_DATA_PATH}")
+    logger.info(
+        f"Using {max_workers} workers, {requests_per_minute} requests/min, {tokens_per_minute} tokens/min"
+        f"{', batched prompts' if batch_mode else ''}"
+    )
+
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    relevance_filter = RelevanceFilter() if relevance_filter_enabled else None
+    near_duplicates = NearDuplicateIndex() if near_duplicates_enabled else None
+    local_classifier = load_local_classifier() if cascade_enabled else None
+    with CheckpointLog(
+            PROCESSING_CHECKPOINT_PATH, fsync_every=CHECKPOINT_FSYNC_EVERY, version=classification_version()
+    ) as checkpoint:
+        # Compact the checkpoint log into the processed file, one post per line as it completes
+        processed_count = write_records(
+            PROCESSED_MSP_DATA_PATH,
+            iter_processed_posts(
+                all_posts, rate_limiter, max_workers, batch_mode, checkpoint, relevance_filter=relevance_filter,
+                near_duplicates=near_duplicates, local_classifier=local_classifier
+            )
+        )
+        # Every result is in the processed file now; the log only served to resume an interrupted run
+        checkpoint.clear()
+
+    logger.info(f"Processing completed. {processed_count} posts processed => {PROCESSED_MSP_DATA_PATH}")
+    if llm_cache is not None:
+        logger.info(f"LLM cache stats: {llm_cache.stats()}")
+    if near_duplicates is not None:
+        logger.info(f"Near-duplicate index stats: {near_duplicates.stats()}")
+        near_duplicates.close()
+    write_token_report(token_budget.report())
+    metrics.record_stage("process", processed_count, time.perf_counter() - started)
+    metrics.write("pre_processor")
+
+
+def process_posts(
+        all_posts,
+        rate_limiter: RateLimiter,
+        max_workers: int = LLM_MAX_WORKERS,
+        batch_mode: bool = False,
+        checkpoint: CheckpointLog = None,
+        relevance_filter: RelevanceFilter = None,
+        near_duplicates: NearDuplicateIndex = None,
+        local_classifier: LocalClassifier = None
+):
+    """
+    Classifies every post and comment and returns the processed posts as a list.
+    See iter_processed_posts.
+    """
+    return list(iter_processed_posts(
+        all_posts, rate_limiter, max_workers, batch_mode, checkpoint, relevance_filter=relevance_filter,
+        near_duplicates=near_duplicates, local_classifier=local_classifier
+    ))
+
+
+def iter_processed_posts(
+        all_posts,
+        rate_limiter: RateLimiter,
+        max_workers: int = LLM_MAX_WORKERS,
+        batch_mode: bool = False,
+        checkpoint: CheckpointLog = None,
+        window_posts: int = PROCESSING_WINDOW_POSTS,
+        relevance_filter: RelevanceFilter = None,
+        near_duplicates: NearDuplicateIndex = None,
+        local_classifier: LocalClassifier = None
+):
+    """
+    Classifies every post and comment concurrently on a thread pool, yielding processed posts in input order.
+    All LLM calls share `rate_limiter`. In batch mode, posts and comments are packed into multi-item prompts
+    (see classification.classify_batch).
+    `all_posts` may be any iterable; at most two windows of `window_posts` posts are held in memory,
+    the next window being queued while the previous one is drained.
+    If a `checkpoint` is given, items it already holds are skipped and each new result is appended to it.
+    If a `relevance_filter` is given, content mentioning none of the tracked products skips the LLM
+    and gets a filtered default response.
+    If a `near_duplicates` index is given, near-duplicates of content classified before (or earlier in this run)
+    skip the LLM and reuse that classification, linked to the original by `duplicate_of`.
+    If a `local_classifier` is given, the content it is confident about gets its answer instead of the LLM's
+    (classification cascade). Local answers are cheap and not checkpointed, so a retrained model applies on resume.
+    """
+    resumed = checkpoint.load() if checkpoint is not None else 0
+    stats = {"filtered": 0, "duplicates": 0, "local": 0}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        idx = 0
+        for window in _iter_windows(all_posts, window_posts):
+            handles = _submit_window(
+                executor, window, rate_limiter, batch_mode, checkpoint, relevance_filter, near_duplicates,
+                local_classifier, stats
+            )
+            pending.append((window, handles))
+            if len(pending) > 1:
+                for processed_post in _collect_window(*pending.popleft()):
+                    idx += 1
+                    yield processed_post
+
+        while pending:
+            for processed_post in _collect_window(*pending.popleft()):
+                idx += 1
+                yield processed_post
+
+    logger.info(f"Processed {idx} posts ({resumed} items were resumed from the checkpoint).")
+    if relevance_filter is not None:
+        logger.info(f"Relevance filter skipped {stats['filtered']} LLM calls.")
+    if near_duplicates is not None:
+        logger.info(f"Near-duplicate index skipped {stats['duplicates']} LLM calls.")
+    if local_classifier is not None:
+        logger.info(f"Local classifier answered {stats['local']} items without the LLM.")
+
+
+def process_post(
+        post: dict,
+        rate_limiter: RateLimiter,
+        checkpoint: CheckpointLog = None,
+        relevance_filter: RelevanceFilter = None,
+        near_duplicates: NearDuplicateIndex = None,
+        local_classifier: LocalClassifier = None
+) -> dict:
+    """
+    Classifies one post and its comments in the calling thread and returns the processed post.
+    Used by the streaming pipeline (src/pipeline.py), which runs many of these concurrently.
+    Checkpoint, relevance filter, near-duplicate index and local classifier behave as in iter_processed_posts.
+    """
+    post_relevant = relevance_filter is not None and relevance_filter.is_relevant(_post_text(post))
+    results = {}
+    for item_key, text, relevance_text in _iter_post_content(post):
+        if checkpoint is not None and item_key in checkpoint:
+            results[item_key] = checkpoint.get(item_key)
+        elif _should_filter(relevance_filter, relevance_text, post_relevant):
+            results[item_key] = get_filtered_response()
+        else:
+            fingerprint, match = _find_near_duplicate(near_duplicates, item_key, relevance_text)
+            if match is None and local_classifier is not None:
+                local_result = local_classifier.classify(relevance_text)
+                if local_result is not None:
+                    results[item_key] = local_result
+                    continue
+            if match is not None:
+                result = get_duplicate_response(match.result.result(), match)
+            else:
+                tracked = near_duplicates.track(item_key, fingerprint) if fingerprint is not None else None
+                fitted_text = fit_to_budget(text, LLM_MAX_INPUT_TOKENS_PER_ITEM, mention_filter.pattern)
+                try:
+                    result = classify_content(fitted_text, _stage(item_key), rate_limiter)
+                except BaseException:
+                    if tracked is not None:
+                        tracked.cancel()
+                    raise
+                if tracked is not None:
+                    tracked.set_result(result)
+            if checkpoint is not None and not is_placeholder_response(result):
+                checkpoint.append(item_key, result)
+            results[item_key] = result
+
+    processed_comments = [
+        ProcessedComment.from_result(comment, results[_comment_key(comment)]) for comment in post.get("comments", [])
+    ]
+    return ProcessedPost.from_result(post, results[_post_key(post)], processed_comments).to_dict()
 
-    processed_posts = []
-    for idx, post in enumerate(all_posts, start=1):
-        logger.info(f"Processing post {idx}/{len(all_posts)} - ID: {post['id']}")
 
-        # Build the text for the top-level post
-        post_text = f"{post['title']}\n\n{post['selftext']}"
-        post_result = process_content_with_genai(post_text)
+def _iter_windows(all_posts, window_posts: int):
+    window = []
+    for post in all_posts:
+        window.append(post)
+        if len(window) >= window_posts:
+            yield window
+            window = []
+    if window:
+        yield window
 
-        logger.info(f"Post summary: {post_result.get('summary', '')}")
 
-        # Process comments
+def _submit_window(
+        executor, posts, rate_limiter, batch_mode, checkpoint, relevance_filter=None, near_duplicates=None,
+        local_classifier=None, stats=None
+):
+    """
+    Queues the LLM calls for a window of posts (the rate limiter paces them).
+    Items already in the checkpoint are served from it, irrelevant ones from the relevance filter,
+    near-duplicates from the original's classification, and those the local classifier is confident about
+    from its answer.
+    Returns {item_key: handle}.
+    """
+    content = []
+    handles = {}
+    tracked = {}
+    for post in posts:
+        post_relevant = relevance_filter is not None and relevance_filter.is_relevant(_post_text(post))
+        for item_key, text, relevance_text in _iter_post_content(post):
+            if checkpoint is not None and item_key in checkpoint:
+                handles[item_key] = (_completed_future(checkpoint.get(item_key)), None)
+            elif _should_filter(relevance_filter, relevance_text, post_relevant):
+                handles[item_key] = (_completed_future(get_filtered_response()), None)
+                if stats is not None:
+                    stats["filtered"] += 1
+            else:
+                fingerprint, match = _find_near_duplicate(near_duplicates, item_key, relevance_text)
+                if match is not None:
+                    handles[item_key] = (_duplicate_future(match, item_key, checkpoint), None)
+                    if stats is not None:
+                        stats["duplicates"] += 1
+                    continue
+                local_result = local_classifier.classify(relevance_text) if local_classifier is not None else None
+                if local_result is not None:
+                    handles[item_key] = (_completed_future(local_result), None)
+                    if stats is not None:
+                        stats["local"] += 1
+                    continue
+                if fingerprint is not None:
+                    # Later copies in this run share the result of this item's call
+                    tracked[item_key] = near_duplicates.track(item_key, fingerprint)
+                fitted_text = fit_to_budget(text, LLM_MAX_INPUT_TOKENS_PER_ITEM, mention_filter.pattern)
+                content.append((item_key, fitted_text))
+
+    if batch_mode:
+        handles.update(_submit_batched(executor, content, rate_limiter, checkpoint))
+    else:
+        handles.update(_submit_single(executor, content, rate_limiter, checkpoint))
+    for item_key, future in tracked.items():
+        _forward_result(handles[item_key], future)
+    return handles
+
+
+def _collect_window(posts, handles):
+    """
+    Waits for a window's results and assembles them, in submission order so the output is stable.
+    """
+    for post in posts:
+        post_result = _get_result(handles[_post_key(post)])
+        logger.debug(f"Processed post ID: {post['id']}")
+        logger.debug(f"Post summary: {post_result.get('summary', '')}")
+
         processed_comments = []
-        comments_list = post.get("comments", [])
-        for c_idx, comment in enumerate(comments_list, start=1):
-            logger.info(f"  Processing comment {c_idx}/{len(comments_list)} - ID: {comment['comment_id']}")
-            comment_text = f"[By {comment['author']}]\n{comment['body']}"
-            comment_result = process_content_with_genai(comment_text)
-
-            logger.info(f"  Comment summary: {comment_result.get('summary', '')}")
-
-            processed_comments.append({
-                "comment_id": comment["comment_id"],
-                "author": comment["author"],
-                "body": comment["body"],
-                "summary": comment_result.get("summary", ""),
-                "sentiment_s1": comment_result.get("sentiment_s1", "unknown").lower(),
-                "benefits_mentioned": comment_result.get("benefits_mentioned", []),
-                "complaints_mentioned": comment_result.get("complaints_mentioned", []),
-                "competitors_mentioned": comment_result.get("competitors_mentioned", []),
-                "overall_tone": comment_result.get("overall_tone", "unknown"),
-                "action_needed": comment_result.get("action_needed", "no_action"),
-                "action_reason": comment_result.get("action_reason", ""),
-                "suggested_response": comment_result.get("suggested_response", ""),
-            })
-
-            # Rate-limiting to stay under free-tier usage
-            time.sleep(3)
-
-        # Combine post result + comments
-        processed_post = {
-            "post_id": post["id"],
-            "title": post["title"],
-            "author": post["author"],
-            "created_utc": post["created_utc"],
-            "query_matched": post["query_matched"],
-            "llm_summary": post_result.get("summary", ""),
-            "sentiment_s1": post_result.get("sentiment_s1", "unknown"),
-            "benefits_mentioned": post_result.get("benefits_mentioned", []),
-            "complaints_mentioned": post_result.get("complaints_mentioned", []),
-            "competitors_mentioned": post_result.get("competitors_mentioned", []),
-            "overall_tone": post_result.get("overall_tone", "unknown"),
-            "action_needed": post_result.get("action_needed", "no_action"),
-            "action_reason": post_result.get("action_reason", ""),
-            "suggested_response": post_result.get("suggested_response", ""),
-            "comments": processed_comments
-        }
-
-        # Append to our list
-        processed_posts.append(processed_post)
-
-        # Write partial progress to disk (in case script is interrupted)
-        _save_partial_results(processed_posts)
-
-        # Additional time.sleep if you want to ensure ~15 requests/min
-        time.sleep(3)
-
-    logger.info(f"Processing completed. {len(processed_posts)} posts processed.")
-
-
-def _save_partial_results(processed_posts):
-    """
-    Helper to write the current list of processed posts to disk.
-    """
-    try:
-        with open(PROCESSED_MSP_DATA_PATH, "w", encoding="utf-8") as f:
-            json.dump(processed_posts, f, ensure_ascii=False, indent=2)
-        logger.info(f"Wrote partial results: {len(processed_posts)} posts => {PROCESSED_MSP_DATA_PATH}")
-    except Exception as e:
-        logger.error(f"Error writing partial results: {e}")
+        for comment in post.get("comments", []):
+            comment_result = _get_result(handles[_comment_key(comment)])
+            logger.debug(f"  Comment {comment['comment_id']} summary: {comment_result.get('summary', '')}")
+            processed_comments.append(ProcessedComment.from_result(comment, comment_result))
+
+        yield ProcessedPost.from_result(post, post_result, processed_comments).to_dict()
+
+
+def _iter_post_content(post):
+    """
+    Yields (item_key, prompt text, text to check for relevance) for a post and each of its comments, in order.
+    """
+    post_text = _post_text(post)
+    yield _post_key(post), post_text, post_text
+    for comment in post.get("comments", []):
+        yield _comment_key(comment), f"[By {comment['author']}]\n{comment['body']}", comment["body"]
+
+
+def _should_filter(relevance_filter, text: str, post_relevant: bool) -> bool:
+    """
+    True if the text mentions no tracked product and can skip the LLM.
+    With RELEVANCE_FILTER_INHERIT_POST, comments under a matching post are always sent.
+    """
+    if relevance_filter is None or (RELEVANCE_FILTER_INHERIT_POST and post_relevant):
+        return False
+    return not relevance_filter.is_relevant(text)
+
+
+def _find_near_duplicate(near_duplicates, item_key: str, text: str):
+    """
+    (fingerprint, NearDuplicate match) of the text; (None, None) without an index or for text too short to match.
+    """
+    if near_duplicates is None:
+        return None, None
+    fingerprint = near_duplicates.fingerprint(text)
+    if fingerprint is None:
+        return None, None
+    return fingerprint, near_duplicates.find(fingerprint, item_key)
+
+
+def _post_text(post) -> str:
+    return f"{post['title']}\n\n{post['selftext']}"
+
+
+def _post_key(post) -> str:
+    return f"post-{post['id']}"
+
+
+def _comment_key(comment) -> str:
+    return f"comment-{comment['comment_id']}"
+
+
+def _submit_single(executor, content, rate_limiter, checkpoint=None):
+    """
+    One LLM call per (item_key, text) pair. Returns {item_key: (future, None)}.
+    """
+    handles = {}
+    for item_key, text in content:
+        future = executor.submit(classify_content, text, _stage(item_key), rate_limiter)
+        if checkpoint is not None:
+            future.add_done_callback(_checkpoint_callback(checkpoint, [item_key], batched=False))
+        handles[item_key] = (future, None)
+    return handles
+
+
+def _submit_batched(executor, content, rate_limiter, checkpoint=None):
+    """
+    Packs (item_key, text) pairs into token-bounded batches, one LLM call per batch.
+    Returns {item_key: (batch_future, item_key)}.
+    """
+    batches = pack_batches(content, LLM_BATCH_TOKEN_BUDGET, LLM_BATCH_MAX_ITEMS)
+    logger.info(f"Packed content into {len(batches)} batched requests.")
+
+    handles = {}
+    for batch in batches:
+        future = executor.submit(classify_batch, batch, rate_limiter=rate_limiter)
+        item_keys = [item_key for item_key, _ in batch]
+        if checkpoint is not None:
+            future.add_done_callback(_checkpoint_callback(checkpoint, item_keys, batched=True))
+        for item_key in item_keys:
+            handles[item_key] = (future, item_key)
+    return handles
+
+
+def _checkpoint_callback(checkpoint: CheckpointLog, item_keys, batched: bool):
+    """
+    Returns a future callback that appends the finished result(s) to the checkpoint log
+    as soon as the LLM call completes, regardless of output order.
+    """
+
+    def _record(future):
+        if future.exception() is not None:
+            return
+        result = future.result()
+        for item_key in item_keys:
+            item_result = result[item_key] if batched else result
+            # Content skipped for lack of token budget, or whose LLM call failed, is retried on the next run
+            if not is_placeholder_response(item_result):
+                checkpoint.append(item_key, item_result)
+
+    return _record
+
+
+def _duplicate_future(match, item_key: str, checkpoint: CheckpointLog = None) -> Future:
+    """
+    A future for a near-duplicate's response, resolved (and checkpointed) once the original's classification is.
+    """
+    future = Future()
+    _forward_result((match.result, None), future, lambda result: get_duplicate_response(result, match))
+    if checkpoint is not None:
+        future.add_done_callback(_checkpoint_callback(checkpoint, [item_key], batched=False))
+    return future
+
+
+def _forward_result(handle, target: Future, transform=None):
+    """
+    Completes `target` with the result (or exception) of an item's handle once it is done.
+    """
+    source, item_key = handle
+
+    def _forward(done):
+        if done.cancelled():
+            target.cancel()
+        elif done.exception() is not None:
+            target.set_exception(done.exception())
+        else:
+            result = done.result()[item_key] if item_key is not None else done.result()
+            target.set_result(transform(result) if transform is not None else result)
+
+    source.add_done_callback(_forward)
+
+
+def _completed_future(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _get_result(handle) -> dict:
+    future, item_key = handle
+    result = future.result()
+    return result[item_key] if item_key is not None else result
+
+
+def _stage(item_key: str) -> str:
+    return "posts" if item_key.startswith("post-") else "comments"
+
+
+def write_token_report(report: dict, path: str = TOKEN_USAGE_REPORT_PATH):
+    """
+    Logs the run's token usage per stage and saves it to `path`.
+    """
+    for stage, usage in report["stages"].items():
+        logger.info(
+            f"Tokens used by {stage}: {usage['input_tokens']} in / {usage['output_tokens']} out "
+            f"over {usage['calls']} calls"
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
 
 
 if __name__ == "__main__":
@@ -32,3 +32,47 @@ Post text:
 {text}
 ---
 '''
+
+BATCH_SUMMARIZATION_TEMPLATE = '''
+You are a helpful assistant that summarizes user posts about cybersecurity products
+(SentinelOne, CrowdStrike, Sophos, Carbon Black, etc.) and also determines if any 
+action is needed from a marketing standpoint.
+
+You will be given several items (posts or comments), each with an id. For EACH item, please:
+1) Summarize the content briefly.
+2) Classify sentiment towards SentinelOne (positive/negative/neutral).
+3) Identify benefits and complaints (if any).
+4) Identify any competitor mentions.
+5) Determine if an action from the marketing team is needed. 
+   - If there's a serious complaint, misinformation, or direct request, we might need to respond.
+   - If it's very negative or there's a big potential impact, we might escalate to marketing.
+   - Otherwise, no action might be needed.
+6) If action is needed, produce a short recommended response or next step.
+
+Classify every item independently. Return a valid JSON array only, with no additional text,
+containing exactly one object per item, using exactly these keys:
+[
+  {{
+    "id": "<the item id, copied exactly>",
+    "summary": "...",
+    "sentiment_s1": "...",
+    "benefits_mentioned": ["..."],
+    "complaints_mentioned": ["..."],
+    "competitors_mentioned": ["..."],
+    "overall_tone": "...",
+    "action_needed": "...",
+    "action_reason": "...",
+    "suggested_response": "..."
+  }}
+]
+
+Items:
+{items}
+'''
+
+BATCH_ITEM_TEMPLATE = '''
+Item id: {item_id}
+---
+{text}
+---
+'''
@@ -0,0 +1,43 @@
+from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional
+
+
+class LLMResponse(NamedTuple):
+    """
+    Raw text returned by a provider, with the token counts it reports (None if it doesn't).
+    """
+    text: str
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+class LLMProviderError(Exception):
+    """
+    A failed provider call. `status` is the HTTP status code when there is one (None for network errors),
+    `retry_after` the delay in seconds the provider asked for, if any.
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class LLMProvider(ABC):
+    """
+    Interface of an LLM backend: sends one prompt and returns the generated text.
+    Providers are built without connecting anywhere; clients are created on the first call,
+    so importing the processing modules needs neither credentials nor network access.
+    """
+
+    name = "base"
+    default_model = None
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or self.default_model
+
+    @abstractmethod
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> LLMResponse:
+        """
+        Raises LLMProviderError if the call fails.
+        """
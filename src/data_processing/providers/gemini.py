@@ -1,90 +1,81 @@
-import json
 import os
-import re
+import threading
+from typing import Optional
 
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
-from src.common.logger import get_logger
-from src.data_processing.prompts import SUMMARIZATION_TEMPLATE
+from src.common.constants import LLM_REQUEST_TIMEOUT_SECONDS
+from src.data_processing.providers.base import LLMProvider, LLMProviderError, LLMResponse
 
 load_dotenv()
 
-logger = get_logger(__name__)
 
-DEFAULT_MODEL = "gemini-1.5-flash"
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-
-def process_content_with_genai(post_text: str) -> dict:
+class GeminiProvider(LLMProvider):
     """
-    Calls the Google Gen AI (Gemini) SDK to summarize & classify a post.
-    Returns a dict with the parsed JSON fields (e.g. summary, sentiment_s1, etc.).
+    Google Gen AI (Gemini) SDK. The SDK is imported and the client created on the first call.
     """
-    llm_output = ""
-
-    # Basic truncation in case the post is very long
-    max_length = 2000
-    truncated_text = post_text[:max_length]
 
-    prompt = SUMMARIZATION_TEMPLATE.format(text=truncated_text)
-
-    try:
-        response = client.models.generate_content(
-            model=DEFAULT_MODEL,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-                max_output_tokens=400
-            ),
+    name = "gemini"
+    default_model = "gemini-1.5-flash"
+
+    def __init__(self, model: str = None, api_key: str = None, timeout: float = LLM_REQUEST_TIMEOUT_SECONDS):
+        super().__init__(model)
+        self.api_key = api_key
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                from google.genai import types
+
+                self._client = genai.Client(
+                    api_key=self.api_key or os.getenv("GEMINI_API_KEY"),
+                    http_options=types.HttpOptions(timeout=int(self.timeout * 1000))
+                )
+            return self._client
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> LLMResponse:
+        from google.genai import types
+
+        try:
+            response = self._get_client().models.generate_content(
+                model=self.model,
+                contents=prompt,
+                config=types.GenerateContentConfig(temperature=temperature, max_output_tokens=max_output_tokens),
+            )
+        except Exception as e:
+            # google.genai.errors.APIError carries the HTTP status as `code`
+            raise LLMProviderError(str(e), status=getattr(e, "code", None), retry_after=_retry_after(e)) from e
+
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            response.text or "",
+            getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None)
         )
-        llm_output = response.text
-        # Remove ```json fences if present
-        clean_output = strip_markdown_code_fences(llm_output)
-
-        parsed_response = json.loads(clean_output)
-        if not parsed_response:
-            logger.error(f"Gemini response was not valid JSON. Output:\n{response.text}")
-            return get_default_response()
-
-        return parsed_response
-
-    except json.JSONDecodeError:
-        logger.error("Gemini response was not valid JSON. Output:\n" + llm_output)
-        return get_default_response()
-    except Exception as e:
-        logger.error(f"Error calling Gemini: {e}")
-        return get_default_response()
-
-
-def get_default_response() -> dict:
-    """Return a default response structure."""
-    return {
-        "summary": "",
-        "sentiment_s1": "unknown",
-        "benefits_mentioned": [],
-        "complaints_mentioned": [],
-        "competitors_mentioned": [],
-        "overall_tone": "unknown",
-        "action_needed": "no_action",
-        "action_reason": "",
-        "suggested_response": ""
-    }
 
 
-def strip_markdown_code_fences(text: str) -> str:
+def _retry_after(error: Exception) -> Optional[float]:
     """
-    If the text is wrapped in triple-backtick fences, remove them so it's valid JSON.
-    e.g.:
-        ```json
-        { "summary": "..." }
-        ```
-    becomes
-        { "summary": "..." }
+    The delay the API asked for: the Retry-After header, else the RetryInfo detail of a 429 body ("retryDelay": "30s").
     """
-    # Remove leading fences like ``` or ```json
-    text = re.sub(r"^```(\w+)?", "", text.strip())
-    # Remove trailing fences
-    text = re.sub(r"```$", "", text.strip())
-    return text.strip()
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None and headers.get("retry-after"):
+        try:
+            return float(headers.get("retry-after"))
+        except ValueError:
+            pass
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []):
+            delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+            if isinstance(delay, str) and delay.endswith("s"):
+                try:
+                    return float(delay[:-1])
+                except ValueError:
+                    pass
+    return None
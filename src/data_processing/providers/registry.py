@@ -0,0 +1,51 @@
+import threading
+from typing import Callable, Optional
+
+from src.common.constants import LLM_PROVIDER, LLM_MODEL, LLM_RESILIENCE_ENABLED
+from src.data_processing.providers.base import LLMProvider
+from src.data_processing.providers.gemini import GeminiProvider
+from src.data_processing.providers.resilience import ResilientProvider
+from src.data_processing.providers.stub import StubProvider
+
+# name -> factory taking the model name (None for the provider's default)
+PROVIDER_FACTORIES: dict[str, Callable[[Optional[str]], LLMProvider]] = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
+
+_provider = None
+_lock = threading.Lock()
+
+
+def register_provider(name: str, factory: Callable[[Optional[str]], LLMProvider]):
+    """
+    Makes another backend selectable with LLM_PROVIDER=<name>.
+    """
+    PROVIDER_FACTORIES[name] = factory
+
+
+def get_provider() -> LLMProvider:
+    """
+    The provider selected by LLM_PROVIDER (and LLM_MODEL), built on first use and shared by all threads.
+    With LLM_RESILIENCE_ENABLED it is wrapped in a ResilientProvider (retries, circuit breaker, AIMD concurrency).
+    """
+    global _provider
+    with _lock:
+        if _provider is None:
+            if LLM_PROVIDER not in PROVIDER_FACTORIES:
+                raise ValueError(
+                    f"Unknown LLM_PROVIDER {LLM_PROVIDER!r}, expected one of {sorted(PROVIDER_FACTORIES)}"
+                )
+            _provider = PROVIDER_FACTORIES[LLM_PROVIDER](LLM_MODEL)
+            if LLM_RESILIENCE_ENABLED:
+                _provider = ResilientProvider(_provider)
+        return _provider
+
+
+def set_provider(provider: Optional[LLMProvider]):
+    """
+    Replaces the shared provider (e.g. with a fake); None goes back to the configured one.
+    """
+    global _provider
+    with _lock:
+        _provider = provider
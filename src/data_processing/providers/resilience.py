@@ -0,0 +1,249 @@
+import random
+import threading
+import time
+from typing import Optional
+
+from src.common.constants import (
+    LLM_MAX_WORKERS,
+    LLM_RETRY_MAX_ATTEMPTS,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+    LLM_RETRY_AFTER_MAX_SECONDS,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_SECONDS,
+    LLM_ADAPTIVE_CONCURRENCY,
+    LLM_INITIAL_CONCURRENCY
+)
+from src.common.logger import get_logger
+from src.common.metrics import metrics
+from src.common.rate_limiter import RateLimiter
+from src.data_processing.providers.base import LLMProvider, LLMProviderError, LLMResponse
+
+logger = get_logger(__name__)
+
+# Quota and overload responses: back off and lower the concurrency
+THROTTLING_STATUSES = (429, 503)
+# Worth retrying as is; network errors (no status) too
+TRANSIENT_STATUSES = (408, 500, 502, 504)
+
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+
+def classify_error(error: Exception) -> str:
+    """
+    THROTTLED, TRANSIENT or FATAL. Only provider errors are ever retried; anything else is a bug on our side,
+    and 4xx statuses other than 408/429 (bad request, auth, unknown model) won't succeed on a retry either.
+    """
+    if not isinstance(error, LLMProviderError):
+        return FATAL
+    if error.status in THROTTLING_STATUSES:
+        return THROTTLED
+    if error.status is None or error.status in TRANSIENT_STATUSES:
+        return TRANSIENT
+    return FATAL
+
+
+def backoff_delay(
+        attempt: int,
+        base_seconds: float = LLM_RETRY_BASE_SECONDS,
+        max_seconds: float = LLM_RETRY_MAX_SECONDS,
+        retry_after: Optional[float] = None,
+        max_retry_after: float = LLM_RETRY_AFTER_MAX_SECONDS
+) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based): "full jitter", uniform between 0 and
+    base * 2^attempt capped at `max_seconds`, so workers that failed together don't retry together.
+    Never shorter than the provider's Retry-After, itself capped at `max_retry_after` (a bogus header
+    shouldn't stall a worker for hours).
+    """
+    delay = random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_retry_after))
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing provider. After `failure_threshold` consecutive failures the circuit opens and
+    callers wait for `reset_seconds`; then a single trial call goes through (half-open). Its success closes
+    the circuit, its failure opens it again. Callers block rather than fail, so no item is dropped.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+            self,
+            failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds: float = LLM_CIRCUIT_RESET_SECONDS
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._condition = threading.Condition()
+
+    def before_call(self):
+        """
+        Blocks while the circuit is open, or while another caller's trial call is in flight.
+        """
+        with self._condition:
+            while True:
+                if self.state == self.CLOSED:
+                    return
+                if self.state == self.OPEN:
+                    remaining = self._opened_at + self.reset_seconds - time.monotonic()
+                    if remaining > 0:
+                        self._condition.wait(remaining)
+                        continue
+                    self._set_state(self.HALF_OPEN)
+                if not self._trial_in_flight:
+                    self._trial_in_flight = True
+                    return
+                self._condition.wait()
+
+    def record_success(self):
+        with self._condition:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self.state != self.CLOSED:
+                logger.info("LLM provider recovered, closing the circuit.")
+                self._set_state(self.CLOSED)
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                logger.warning(
+                    f"LLM provider failing ({self._failures} consecutive errors), pausing calls for "
+                    f"{self.reset_seconds:.0f}s."
+                )
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+                metrics.inc("llm_circuit_opened_total")
+            self._condition.notify_all()
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.set("llm_circuit_open", 0 if state == self.CLOSED else 1)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on in-flight calls: each success raises the limit by 1/limit (about +1 per round of calls),
+    each throttling response halves it. Concurrent throttles from one round only cut it once.
+    Until the first throttle, each success adds a whole slot (the limit doubles every round, like TCP slow start).
+    The limit settles just under the provider's quota, instead of a fixed worker count that is either
+    too cautious or trips the rate limit.
+    """
+
+    def __init__(
+            self,
+            initial_limit: int = LLM_INITIAL_CONCURRENCY,
+            max_limit: int = LLM_MAX_WORKERS,
+            min_limit: int = 1,
+            decrease_factor: float = 0.5
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(self.max_limit, max(min_limit, initial_limit)))
+        self.in_flight = 0
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        metrics.set("llm_concurrency_limit", self.limit)
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, outcome: Optional[str] = None, started: float = 0.0):
+        """
+        Frees a slot and adapts the limit: `outcome` is None for a success, THROTTLED for a throttling
+        response (other failures leave the limit alone). `started` is the value acquire() returned.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if outcome is None:
+                self.limit = min(self.max_limit, self.limit + (1 if self._slow_start else 1 / self.limit))
+            elif outcome == THROTTLED and started >= self._last_decrease:
+                self._slow_start = False
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_decrease = time.monotonic()
+                logger.info(f"LLM provider throttling, concurrency limit down to {int(self.limit)}.")
+            metrics.set("llm_concurrency_limit", self.limit)
+            self._condition.notify_all()
+
+
+class ResilientProvider(LLMProvider):
+    """
+    Wraps a provider with retries (exponential backoff with jitter, honoring Retry-After), a circuit breaker
+    and, optionally, adaptive concurrency. Exposes the wrapped provider's name and model, so cache keys
+    don't change. Raises the last LLMProviderError once `max_attempts` calls have failed, or right away
+    for errors a retry can't fix. Every attempt, retries included, waits for the run's `rate_limiter`, if given.
+    """
+
+    def __init__(
+            self,
+            provider: LLMProvider,
+            max_attempts: int = LLM_RETRY_MAX_ATTEMPTS,
+            breaker: Optional[CircuitBreaker] = None,
+            concurrency: Optional[AdaptiveConcurrency] = None
+    ):
+        super().__init__(provider.model)
+        self.provider = provider
+        self.name = provider.name
+        self.max_attempts = max(1, max_attempts)
+        self.breaker = breaker or CircuitBreaker()
+        if concurrency is None and LLM_ADAPTIVE_CONCURRENCY:
+            concurrency = AdaptiveConcurrency()
+        self.concurrency = concurrency
+
+    def generate(
+            self,
+            prompt: str,
+            temperature: float,
+            max_output_tokens: int,
+            rate_limiter: Optional[RateLimiter] = None,
+            prompt_tokens: float = 0
+    ) -> LLMResponse:
+        for attempt in range(self.max_attempts):
+            self.breaker.before_call()
+            if rate_limiter is not None:
+                rate_limiter.acquire(tokens=prompt_tokens)
+            started = self.concurrency.acquire() if self.concurrency is not None else 0.0
+            outcome = None
+            try:
+                response = self.provider.generate(prompt, temperature, max_output_tokens)
+            except Exception as e:
+                outcome = classify_error(e)
+                if outcome == FATAL:
+                    # The provider answered (or the bug is ours): it isn't down, so don't trip the circuit
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 >= self.max_attempts:
+                    logger.error(f"LLM call failed after {self.max_attempts} attempts: {e}")
+                    raise
+                delay = backoff_delay(attempt, retry_after=e.retry_after)
+                metrics.inc("llm_retries_total", provider=self.name, reason=outcome)
+                logger.warning(f"LLM call {outcome} ({e}), retrying in {delay:.1f}s.")
+            else:
+                self.breaker.record_success()
+                return response
+            finally:
+                if self.concurrency is not None:
+                    self.concurrency.release(outcome, started)
+            time.sleep(delay)
@@ -0,0 +1,48 @@
+import json
+import urllib.error
+import urllib.request
+
+from src.common.constants import LLM_STUB_URL, LLM_REQUEST_TIMEOUT_SECONDS
+from src.data_processing.providers.base import LLMProvider, LLMProviderError, LLMResponse
+
+
+class StubProvider(LLMProvider):
+    """
+    Client of the local stand-in LLM server (see stub_server.py), for offline and CI runs.
+    """
+
+    name = "stub"
+    default_model = "local-stub"
+
+    def __init__(self, model: str = None, url: str = LLM_STUB_URL, timeout: float = LLM_REQUEST_TIMEOUT_SECONDS):
+        super().__init__(model)
+        self.url = url.rstrip("/") + "/v1/generate"
+        self.timeout = timeout
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> LLMResponse:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "temperature": temperature,
+            "max_output_tokens": max_output_tokens
+        }
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get("Retry-After")
+            raise LLMProviderError(
+                f"Stub LLM server returned {e.code}", status=e.code,
+                retry_after=float(retry_after) if retry_after else None
+            ) from e
+        except (urllib.error.URLError, TimeoutError) as e:
+            raise LLMProviderError(f"Stub LLM server unreachable at {self.url}: {e}") from e
+
+        usage = body.get("usage", {})
+        return LLMResponse(body.get("text", ""), usage.get("input_tokens"), usage.get("output_tokens"))
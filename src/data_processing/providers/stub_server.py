@@ -0,0 +1,186 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from src.common.constants import (
+    LLM_STUB_PORT,
+    LLM_STUB_LATENCY_MS,
+    LLM_STUB_JITTER_MS,
+    LLM_STUB_ERROR_RATE,
+    LLM_STUB_ERROR_STATUSES,
+    LLM_STUB_RESPONSES_PATH,
+    LLM_STUB_MAX_CONCURRENCY
+)
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Item ids as rendered by BATCH_ITEM_TEMPLATE
+BATCH_ITEM_ID_PATTERN = re.compile(r"^Item id: (.+)$", re.MULTILINE)
+
+DEFAULT_RESPONSES = [
+    {
+        "summary": "Stub summary of the post.",
+        "sentiment_s1": "neutral",
+        "benefits_mentioned": [],
+        "complaints_mentioned": [],
+        "competitors_mentioned": [],
+        "overall_tone": "neutral",
+        "action_needed": "no_action",
+        "action_reason": "",
+        "suggested_response": ""
+    }
+]
+
+
+def main(
+        port: int = LLM_STUB_PORT,
+        latency_ms: float = LLM_STUB_LATENCY_MS,
+        jitter_ms: float = LLM_STUB_JITTER_MS,
+        error_rate: float = LLM_STUB_ERROR_RATE,
+        responses_path: Optional[str] = LLM_STUB_RESPONSES_PATH,
+        max_concurrency: int = LLM_STUB_MAX_CONCURRENCY
+):
+    """
+    Serves the stand-in LLM API until interrupted. Run with LLM_PROVIDER=stub to point the pipeline at it.
+    """
+    server = make_server(
+        port, latency_ms, jitter_ms, error_rate, load_responses(responses_path), max_concurrency=max_concurrency
+    )
+    logger.info(
+        f"Stub LLM server on port {server.server_port}: {latency_ms}±{jitter_ms}ms latency, "
+        f"{error_rate:.0%} errors, max concurrency {max_concurrency or 'unlimited'}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def make_server(
+        port: int = LLM_STUB_PORT,
+        latency_ms: float = LLM_STUB_LATENCY_MS,
+        jitter_ms: float = LLM_STUB_JITTER_MS,
+        error_rate: float = LLM_STUB_ERROR_RATE,
+        responses: Optional[list[dict]] = None,
+        error_statuses: tuple = LLM_STUB_ERROR_STATUSES,
+        max_concurrency: int = LLM_STUB_MAX_CONCURRENCY
+) -> ThreadingHTTPServer:
+    """
+    Builds the server without starting it (port 0 picks a free port, see `server.server_port`).
+    POST /v1/generate {"prompt": ...} answers {"text": ..., "usage": {...}} after the simulated latency,
+    or fails with a random status from `error_statuses` for `error_rate` of the requests.
+    With `max_concurrency`, requests arriving while that many are in flight get a 429, like a provider quota.
+    The text is one of `responses` as JSON, or an array of them for batched prompts.
+    """
+    server = _StubServer(("127.0.0.1", port), _StubHandler)
+    server.latency_ms = latency_ms
+    server.jitter_ms = jitter_ms
+    server.error_rate = error_rate
+    server.error_statuses = error_statuses or (500,)
+    server.responses = responses or DEFAULT_RESPONSES
+    server.max_concurrency = max_concurrency
+    server.in_flight = 0
+    server.requests_served = 0
+    server.requests_throttled = 0
+    server.stats_lock = threading.Lock()
+    return server
+
+
+def start_in_thread(**kwargs) -> ThreadingHTTPServer:
+    """
+    Starts a server (see make_server) on a daemon thread, e.g. for benchmarks. Stop it with `server.shutdown()`.
+    """
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-llm-server").start()
+    return server
+
+
+def load_responses(path: Optional[str]) -> list[dict]:
+    """
+    Canned responses from a JSON file holding one response object or a list of them.
+    """
+    if not path:
+        return DEFAULT_RESPONSES
+    with open(path, "r", encoding="utf-8") as f:
+        responses = json.load(f)
+    return responses if isinstance(responses, list) else [responses]
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many worker threads connect at once; the default backlog of 5 resets connections
+    request_queue_size = 256
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        if self.path != "/v1/generate":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = body.get("prompt", "")
+
+        server = self.server
+        with server.stats_lock:
+            throttled = bool(server.max_concurrency) and server.in_flight >= server.max_concurrency
+            if throttled:
+                server.requests_throttled += 1
+            else:
+                server.in_flight += 1
+        if throttled:
+            self._send_error_status(429)
+            return
+
+        try:
+            time.sleep(max(0.0, server.latency_ms + random.uniform(-server.jitter_ms, server.jitter_ms)) / 1000)
+        finally:
+            with server.stats_lock:
+                server.in_flight -= 1
+                server.requests_served += 1
+
+        if random.random() < server.error_rate:
+            self._send_error_status(random.choice(server.error_statuses))
+            return
+
+        item_ids = BATCH_ITEM_ID_PATTERN.findall(prompt)
+        if item_ids:
+            result = [{"id": item_id.strip(), **random.choice(server.responses)} for item_id in item_ids]
+        else:
+            result = random.choice(server.responses)
+        text = json.dumps(result)
+        self._send_json({
+            "text": text,
+            # Same rough 4-characters-per-token ratio as the local estimates
+            "usage": {"input_tokens": len(prompt) // 4 + 1, "output_tokens": len(text) // 4 + 1}
+        })
+
+    def _send_error_status(self, status: int):
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_json(self, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # One log line per request would drown out the pipeline's own logs
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import sys
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Iterable, Optional
+
+
+class Sentiment(str, Enum):
+    """
+    Sentiment towards SentinelOne. LLM answers are matched ignoring case, spacing and underscores
+    ("Not_Mentioned" is NOT_MENTIONED); anything else counts as UNKNOWN.
+    """
+    POSITIVE = "positive"
+    NEGATIVE = "negative"
+    NEUTRAL = "neutral"
+    MIXED = "mixed"
+    NOT_MENTIONED = "not mentioned"
+    UNKNOWN = "unknown"
+
+    @classmethod
+    def parse(cls, value) -> "Sentiment":
+        if isinstance(value, cls):
+            return value
+        if not isinstance(value, str):
+            return cls.UNKNOWN
+        sentiment = _SENTIMENTS.get(value)
+        return sentiment if sentiment is not None else _SENTIMENTS.get(_label_key(value), cls.UNKNOWN)
+
+
+class ActionNeeded(str, Enum):
+    """
+    Whether the marketing team should act. Only a "yes" (in any case) is actionable.
+    """
+    YES = "yes"
+    NO_ACTION = "no_action"
+
+    @classmethod
+    def parse(cls, value) -> "ActionNeeded":
+        if isinstance(value, cls):
+            return value
+        if value == "yes":
+            return cls.YES
+        return cls.NO_ACTION if value == "no_action" or _label_key(value) != "yes" else cls.YES
+
+
+_SENTIMENTS = {sentiment.value: sentiment for sentiment in Sentiment}
+
+
+def parse_tone(value) -> str:
+    """
+    overall_tone has no fixed vocabulary: it is kept as a lowercased string, interned so the
+    handful of distinct tones are stored once however many items carry them. Non-strings are "unknown".
+    """
+    return _parse_tone(value) if isinstance(value, str) else "unknown"
+
+
+@lru_cache(maxsize=4096)
+def _parse_tone(value: str) -> str:
+    return sys.intern(_label_key(value) or "unknown")
+
+
+@dataclass(slots=True)
+class Classification:
+    """
+    The classification of one post or comment (an LLM, filtered, near-duplicate or local response),
+    with categorical fields as enums and list fields as tuples.
+    """
+    summary: str = ""
+    sentiment_s1: Sentiment = Sentiment.UNKNOWN
+    benefits_mentioned: tuple = ()
+    complaints_mentioned: tuple = ()
+    competitors_mentioned: tuple = ()
+    overall_tone: str = "unknown"
+    action_needed: ActionNeeded = ActionNeeded.NO_ACTION
+    action_reason: str = ""
+    suggested_response: str = ""
+    filtered: bool = False
+    llm_failed: bool = False
+    duplicate_of: Optional[str] = None
+    duplicate_distance: Optional[int] = None
+    local_classified: bool = False
+    local_confidence: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, result: dict, summary_key: str = "summary") -> "Classification":
+        """
+        From an LLM response, or the classification fields of a processed record (`summary_key` "llm_summary"
+        for posts; "summary" is accepted too, as older processed files use either).
+        """
+        get = result.get
+        # Positional, in field order: this runs once per post and comment
+        return cls(
+            get(summary_key) or get("summary") or "",
+            Sentiment.parse(get("sentiment_s1")),
+            _tuple(get("benefits_mentioned")),
+            _tuple(get("complaints_mentioned")),
+            _tuple(get("competitors_mentioned")),
+            parse_tone(get("overall_tone")),
+            ActionNeeded.parse(get("action_needed")),
+            get("action_reason") or "",
+            get("suggested_response") or "",
+            bool(get("filtered")),
+            bool(get("llm_failed")),
+            get("duplicate_of"),
+            get("duplicate_distance"),
+            bool(get("local_classified")),
+            get("local_confidence")
+        )
+
+    def to_dict(self, summary_key: str = "summary") -> dict:
+        return {
+            summary_key: self.summary,
+            "sentiment_s1": self.sentiment_s1.value,
+            "benefits_mentioned": list(self.benefits_mentioned),
+            "complaints_mentioned": list(self.complaints_mentioned),
+            "competitors_mentioned": list(self.competitors_mentioned),
+            "overall_tone": self.overall_tone,
+            "action_needed": self.action_needed.value,
+            "action_reason": self.action_reason,
+            "suggested_response": self.suggested_response,
+            "filtered": self.filtered,
+            "llm_failed": self.llm_failed,
+            "duplicate_of": self.duplicate_of,
+            "duplicate_distance": self.duplicate_distance,
+            "local_classified": self.local_classified,
+            "local_confidence": self.local_confidence,
+        }
+
+
+@dataclass(slots=True)
+class ProcessedComment:
+    comment_id: str
+    author: Optional[str]
+    created_utc: Optional[float]
+    body: str
+    classification: Classification
+
+    @classmethod
+    def from_result(cls, comment: dict, result: dict) -> "ProcessedComment":
+        """
+        A raw comment with its classification result.
+        """
+        return cls(
+            comment_id=comment["comment_id"],
+            author=_intern(comment["author"]),
+            created_utc=comment.get("created_utc"),
+            body=comment["body"],
+            classification=Classification.from_dict(result)
+        )
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "ProcessedComment":
+        """
+        A comment of a processed_msp_data.jsonl record.
+        """
+        return cls(
+            comment_id=record["comment_id"],
+            author=_intern(record.get("author")),
+            created_utc=record.get("created_utc"),
+            body=record.get("body", ""),
+            classification=Classification.from_dict(record)
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "comment_id": self.comment_id,
+            "author": self.author,
+            "created_utc": self.created_utc,
+            "body": self.body,
+            **self.classification.to_dict()
+        }
+
+
+@dataclass(slots=True)
+class ProcessedPost:
+    post_id: str
+    title: str
+    author: Optional[str]
+    created_utc: Optional[float]
+    query_matched: tuple
+    classification: Classification
+    comments: tuple = ()
+
+    @classmethod
+    def from_result(cls, post: dict, result: dict, comments: Iterable[ProcessedComment]) -> "ProcessedPost":
+        """
+        A raw post with its classification result and processed comments.
+        """
+        return cls(
+            post_id=post["id"],
+            title=post["title"],
+            author=_intern(post["author"]),
+            created_utc=post["created_utc"],
+            query_matched=_queries(post["query_matched"]),
+            classification=Classification.from_dict(result),
+            comments=tuple(comments)
+        )
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "ProcessedPost":
+        """
+        A processed_msp_data.jsonl record (any version of the schema).
+        """
+        return cls(
+            post_id=record["post_id"],
+            title=record.get("title", ""),
+            author=_intern(record.get("author")),
+            created_utc=record.get("created_utc"),
+            query_matched=_queries(record.get("query_matched")),
+            classification=Classification.from_dict(record, summary_key="llm_summary"),
+            comments=tuple(ProcessedComment.from_dict(comment) for comment in record.get("comments", ()))
+        )
+
+    def to_dict(self) -> dict:
+        """
+        The processed_msp_data.jsonl record.
+        """
+        return {
+            "post_id": self.post_id,
+            "title": self.title,
+            "author": self.author,
+            "created_utc": self.created_utc,
+            "query_matched": list(self.query_matched),
+            **self.classification.to_dict(summary_key="llm_summary"),
+            "comments": [comment.to_dict() for comment in self.comments]
+        }
+
+
+def _label_key(value) -> str:
+    return " ".join(str(value).lower().replace("_", " ").split()) if value is not None else ""
+
+
+def _tuple(values) -> tuple:
+    if not values:
+        return ()
+    return tuple(values) if isinstance(values, (list, tuple)) else (values,)
+
+
+def _queries(query_matched) -> tuple:
+    # A single query (older raw files) or a list of them
+    if not query_matched:
+        return ()
+    if isinstance(query_matched, str):
+        return (sys.intern(query_matched),)
+    return tuple(sys.intern(query) for query in query_matched)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
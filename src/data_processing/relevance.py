@@ -0,0 +1,53 @@
+import re
+from typing import Optional
+
+from src.common.constants import QUERIES, COMPETITOR_ALIASES
+from src.data_processing.classification import get_default_response
+from src.data_processing.competitors import build_alias_table
+
+
+class RelevanceFilter:
+    """
+    Fast local check for whether a piece of text mentions SentinelOne or any competitor.
+    All aliases are compiled into a single case-insensitive regex alternation with word boundaries,
+    so a lookup is one scan of the text regardless of how many aliases there are.
+    """
+
+    def __init__(self, aliases: Optional[dict] = None, queries: Optional[list] = None):
+        self.alias_to_name = build_alias_table(
+            COMPETITOR_ALIASES if aliases is None else aliases,
+            QUERIES if queries is None else queries
+        )
+        # Longest aliases first, so "CS Falcon" wins over "Falcon"
+        alternation = "|".join(
+            re.escape(alias) for alias in sorted(self.alias_to_name, key=len, reverse=True)
+        )
+        self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+    def find_mentions(self, text: str) -> list[str]:
+        """
+        Canonical names of every product mentioned in `text`, in order of first appearance.
+        """
+        mentions = []
+        for match in self._pattern.finditer(text):
+            name = self.alias_to_name[match.group(0).lower()]
+            if name not in mentions:
+                mentions.append(name)
+        return mentions
+
+    @property
+    def pattern(self) -> re.Pattern:
+        return self._pattern
+
+    def is_relevant(self, text: str) -> bool:
+        return self._pattern.search(text) is not None
+
+
+def get_filtered_response() -> dict:
+    """
+    Response used instead of an LLM call for content that mentions none of the tracked products.
+    """
+    response = get_default_response()
+    response["sentiment_s1"] = "not mentioned"
+    response["filtered"] = True
+    return response
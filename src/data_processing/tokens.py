@@ -0,0 +1,115 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Optional
+
+from src.common.constants import LLM_RUN_TOKEN_BUDGET
+
+WORD_OR_SYMBOL = re.compile(r"\w+|[^\w\s]")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+GAP_MARKER = "…"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate, no API call: the larger of ~4 characters per token and
+    ~1.3 tokens per word/symbol (long or unusual words split into several tokens).
+    """
+    if not text:
+        return 0
+    return math.ceil(max(len(text) / 4, len(WORD_OR_SYMBOL.findall(text)) * 1.3))
+
+
+def fit_to_budget(text: str, max_tokens: int, highlight: Optional[re.Pattern] = None) -> str:
+    """
+    Returns `text` unchanged if it fits in `max_tokens`, otherwise a shortened version that does.
+    Sentences matching `highlight` (e.g. product mentions), plus the sentence either side of each,
+    are kept first; the opening sentence (usually the title) is always kept; remaining budget is
+    filled from the top. Dropped runs of sentences are replaced by a "…" marker.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+    # Each sentence also pays for the joining space and a possible gap marker, so the result always fits
+    costs = [estimate_tokens(sentence) + 3 for sentence in sentences]
+
+    # Priority order: opening sentence, mention sentences with their neighbours, then the rest top-down
+    priority = [0]
+    if highlight is not None:
+        for idx, sentence in enumerate(sentences):
+            if highlight.search(sentence):
+                priority.extend(i for i in (idx, idx - 1, idx + 1) if 0 <= i < len(sentences))
+    priority.extend(range(len(sentences)))
+
+    selected = set()
+    used = 0
+    for idx in priority:
+        if idx in selected or used + costs[idx] > max_tokens:
+            continue
+        selected.add(idx)
+        used += costs[idx]
+
+    if not selected:
+        # A single enormous sentence: fall back to a hard cut
+        cut = text[:max_tokens * 4]
+        while cut and estimate_tokens(cut) > max_tokens:
+            cut = cut[:len(cut) * 9 // 10]
+        return cut
+
+    parts = []
+    previous = -1
+    for idx in sorted(selected):
+        if parts and idx != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(sentences[idx].strip())
+        previous = idx
+    return " ".join(parts)
+
+
+class TokenBudget:
+    """
+    Thread-safe token accounting for a run.
+    Calls reserve their estimated input tokens up front against an optional per-run cap
+    (per-minute pacing is the RateLimiter's job); actual usage reported by the provider
+    is then recorded per stage.
+    """
+
+    def __init__(self, run_limit: Optional[int] = None):
+        self.run_limit = run_limit
+        self.reserved = 0
+        self._usage = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+        self._lock = threading.Lock()
+
+    def try_reserve(self, tokens: int) -> bool:
+        """
+        Reserves `tokens` against the run budget. Returns False (reserving nothing) if that would exceed it.
+        """
+        with self._lock:
+            if self.run_limit is not None and self.reserved + tokens > self.run_limit:
+                return False
+            self.reserved += tokens
+            return True
+
+    def record(self, stage: str, input_tokens: int, output_tokens: int):
+        with self._lock:
+            usage = self._usage[stage]
+            usage["calls"] += 1
+            usage["input_tokens"] += input_tokens
+            usage["output_tokens"] += output_tokens
+
+    def report(self) -> dict:
+        with self._lock:
+            stages = {stage: dict(usage) for stage, usage in self._usage.items()}
+        return {
+            "run_limit": self.run_limit,
+            "reserved_input_tokens": self.reserved,
+            "total_input_tokens": sum(usage["input_tokens"] for usage in stages.values()),
+            "total_output_tokens": sum(usage["output_tokens"] for usage in stages.values()),
+            "stages": stages
+        }
+
+
+# Shared by the provider (which records actual usage) and pre_processor (which reserves and reports)
+token_budget = TokenBudget(LLM_RUN_TOKEN_BUDGET)
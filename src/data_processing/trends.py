@@ -0,0 +1,155 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from src.common.constants import TRENDS_PATH, TREND_ROLLING_DAYS
+
+DAY = "day"
+WEEK = "week"
+GRANULARITIES = (DAY, WEEK)
+DAY_SECONDS = 24 * 3600
+
+# What a window counts: items by kind ("post"/"comment"), items by sentiment_s1, mentions by competitor id
+ITEMS = "items"
+SENTIMENT = "sentiment"
+COMPETITOR = "competitor"
+
+
+def window_start(created_utc: float, granularity: str) -> float:
+    """
+    Start (UTC timestamp) of the tumbling window holding `created_utc`: midnight UTC for days, Monday midnight UTC
+    for weeks (the ISO weeks the plotter's per-week charts use).
+    """
+    day = created_utc - created_utc % DAY_SECONDS
+    if granularity == WEEK:
+        # The epoch was a Thursday
+        day -= (day // DAY_SECONDS + 3) % 7 * DAY_SECONDS
+    return float(day)
+
+
+class TrendState:
+    """
+    Counts per tumbling window: {(granularity, window_start, measure, key): count}, for every granularity of
+    GRANULARITIES. States are mergeable, and items can be retracted (`weight=-1`), so the
+    analytics store keeps its windows up to date from the items that changed alone (see AnalyticsStore.ingest).
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    def add_item(
+            self,
+            created_utc: Optional[float],
+            kind: str,
+            sentiment: str,
+            competitor_ids: Iterable[str],
+            weight: int = 1
+    ):
+        if created_utc is None:
+            return
+        for granularity in GRANULARITIES:
+            start = window_start(created_utc, granularity)
+            self._add((granularity, start, ITEMS, kind), weight)
+            self._add((granularity, start, SENTIMENT, sentiment), weight)
+            for competitor in competitor_ids:
+                self._add((granularity, start, COMPETITOR, competitor), weight)
+
+    def merge(self, other: "TrendState") -> "TrendState":
+        for key, count in other.counts.items():
+            self._add(key, count)
+        return self
+
+    def changes(self) -> list[tuple]:
+        """
+        (granularity, window_start, measure, key, count) for every non-zero count.
+        """
+        return [key + (count,) for key, count in self.counts.items() if count]
+
+    def _add(self, key: tuple, count: int):
+        self.counts[key] = self.counts.get(key, 0) + count
+
+
+def trend_series(rows: Iterable[tuple], competitor_names: dict) -> list[dict]:
+    """
+    One point per window, oldest first, from (window_start, measure, key, count) rows of one granularity:
+    item counts, the sentiment distribution and each competitor's mentions and share of voice.
+    """
+    points = {}
+    for start, measure, key, count in rows:
+        point = points.get(start)
+        if point is None:
+            point = points[start] = {"window_start_utc": start, "posts": 0, "comments": 0, "sentiment": {},
+                                     "competitors": {}}
+        if measure == ITEMS:
+            point["posts" if key == "post" else "comments"] += count
+        elif measure == SENTIMENT:
+            point["sentiment"][key] = count
+        elif measure == COMPETITOR:
+            point["competitors"][competitor_names.get(key, key)] = count
+    return [_finish_point(points[start]) for start in sorted(points)]
+
+
+def rolling_series(daily: list[dict], days: int = TREND_ROLLING_DAYS) -> list[dict]:
+    """
+    Rolling windows over a daily series: one point per day, summing that day and the `days - 1` before it
+    (days without items count as empty). Costs O(days in the series), not O(items).
+    """
+    if not daily:
+        return []
+    by_start = {point["window_start_utc"]: point for point in daily}
+    first = daily[0]["window_start_utc"]
+    last = daily[-1]["window_start_utc"]
+    starts = [first + i * DAY_SECONDS for i in range(int((last - first) // DAY_SECONDS) + 1)]
+
+    series = []
+    for i, start in enumerate(starts):
+        point = {"window_start_utc": start - (days - 1) * DAY_SECONDS, "window_end_utc": start + DAY_SECONDS,
+                 "posts": 0, "comments": 0, "sentiment": {}, "competitors": {}}
+        for day_start in starts[max(0, i - days + 1):i + 1]:
+            day = by_start.get(day_start)
+            if day is None:
+                continue
+            point["posts"] += day["posts"]
+            point["comments"] += day["comments"]
+            for field in ("sentiment", "competitors"):
+                for key, count in day[field].items():
+                    point[field][key] = point[field].get(key, 0) + count
+        series.append(_finish_point(point))
+    return series
+
+
+def write_trends(store, path: str = TRENDS_PATH, rolling_days: int = TREND_ROLLING_DAYS) -> dict:
+    """
+    Exports the analytics store's materialized windows to `path` (atomically): the daily and weekly series and a
+    `rolling_days`-day rolling series. Reads the windows only, so it costs the same whatever the history length.
+    """
+    competitor_names = store.trend_competitor_names()
+    daily = trend_series(store.trend_windows(DAY), competitor_names)
+    trends = {
+        "rolling_days": rolling_days,
+        DAY: daily,
+        WEEK: trend_series(store.trend_windows(WEEK), competitor_names),
+        "rolling": rolling_series(daily, rolling_days)
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(trends, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return trends
+
+
+def load_trends(path: str = TRENDS_PATH) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _finish_point(point: dict) -> dict:
+    point["window_start"] = datetime.fromtimestamp(point["window_start_utc"], tz=timezone.utc).strftime("%Y-%m-%d")
+    mentions = sum(point["competitors"].values())
+    point["competitor_share"] = {
+        competitor: round(count / mentions, 4) for competitor, count in point["competitors"].items()
+    } if mentions else {}
+    return point
@@ -0,0 +1,358 @@
+import queue
+import signal
+import threading
+import time
+
+from src.common.cache import SQLiteCache
+from src.common.constants import (
+    RAW_MSP_DATA_PATH,
+    PROCESSED_MSP_DATA_PATH,
+    ACTIONABLE_ITEMS_PATH,
+    ANALYTICS_DB_PATH,
+    PROCESSING_CHECKPOINT_PATH,
+    CHECKPOINT_FSYNC_EVERY,
+    REDDIT_CACHE_PATH,
+    REDDIT_CACHE_TTL_HOURS,
+    REDDIT_ASYNC_MODE,
+    RELEVANCE_FILTER_ENABLED,
+    NEAR_DUPLICATE_ENABLED,
+    CASCADE_ENABLED,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_PROCESS_WORKERS,
+    PIPELINE_AGGREGATE_BATCH,
+    PIPELINE_SNAPSHOT_SECONDS
+)
+from src.common.jsonl import JsonlWriter
+from src.common.logger import get_logger
+from src.common.metrics import metrics
+from src.common.rate_limiter import RateLimiter
+from src.data_collection.fetcher import run_collection
+from src.data_processing.analytics_store import AnalyticsStore
+from src.data_processing.checkpoint import CheckpointLog
+from src.data_processing.classification import classification_version, llm_cache
+from src.data_processing.post_processor import write_analysis_results
+from src.data_processing.pre_processor import process_post, write_token_report
+from src.data_processing.local_classifier import load_local_classifier
+from src.data_processing.near_duplicates import NearDuplicateIndex
+from src.data_processing.relevance import RelevanceFilter
+from src.data_processing.tokens import token_budget
+from src.data_processing.trends import write_trends
+
+logger = get_logger(__name__)
+
+# Returned by _get once a queue's producers are all done and it is drained
+_DONE = object()
+
+
+def main(
+        async_mode: bool = REDDIT_ASYNC_MODE,
+        process_workers: int = PIPELINE_PROCESS_WORKERS,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        aggregate_batch: int = PIPELINE_AGGREGATE_BATCH,
+        snapshot_seconds: float = PIPELINE_SNAPSHOT_SECONDS,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        relevance_filter_enabled: bool = RELEVANCE_FILTER_ENABLED,
+        near_duplicates_enabled: bool = NEAR_DUPLICATE_ENABLED,
+        cascade_enabled: bool = CASCADE_ENABLED
+):
+    """
+    Runs collection, LLM processing and aggregation as concurrent stages connected by bounded queues:
+      - collect: one thread fetching posts (async over Reddit's JSON API with `async_mode`), writing them to
+        RAW_MSP_DATA_PATH and handing each to the processing stage as soon as it is fetched
+      - process: `process_workers` threads classifying one post (and its comments) at a time
+      - aggregate: one thread writing processed posts as they arrive, and updating the analytics store and
+        ANALYSIS_RESULTS_PATH (queried from it) every `aggregate_batch` posts or `snapshot_seconds` seconds;
+        the store's actionable items are exported to ACTIONABLE_ITEMS_PATH once the stream ends
+    A full queue blocks the stage feeding it, so a slow stage throttles the ones before it.
+    SIGINT/SIGTERM stops collection and lets posts already being classified finish; the output files are then
+    left without their completion marker. A second signal exits immediately.
+    """
+    stop_event = threading.Event()
+    raw_queue = queue.Queue(maxsize=queue_size)
+    processed_queue = queue.Queue(maxsize=queue_size)
+    errors = []
+    stage_stats = _StageStats()
+    collectors = _Producers(1)
+    processors = _Producers(process_workers)
+
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    relevance_filter = RelevanceFilter() if relevance_filter_enabled else None
+    near_duplicates = NearDuplicateIndex() if near_duplicates_enabled else None
+    local_classifier = load_local_classifier() if cascade_enabled else None
+    reddit_cache = SQLiteCache(REDDIT_CACHE_PATH, max_age_seconds=REDDIT_CACHE_TTL_HOURS * 3600, name="reddit")
+
+    logger.info(
+        f"Starting pipeline: {process_workers} LLM workers, queues of {queue_size} posts, "
+        f"aggregates every {aggregate_batch} posts or {snapshot_seconds}s"
+    )
+    previous_handlers = _install_signal_handlers(stop_event)
+    try:
+        with CheckpointLog(
+                PROCESSING_CHECKPOINT_PATH, fsync_every=CHECKPOINT_FSYNC_EVERY, version=classification_version()
+        ) as checkpoint:
+            checkpoint.load()
+            threads = [
+                threading.Thread(
+                    target=_run_stage,
+                    args=("collect", errors, stage_stats, stop_event, _collect_stage,
+                          async_mode, reddit_cache, raw_queue, collectors, stop_event),
+                    name="pipeline-collect"
+                ),
+                threading.Thread(
+                    target=_run_stage,
+                    args=("aggregate", errors, stage_stats, stop_event, _aggregate_stage,
+                          processed_queue, processors, aggregate_batch, snapshot_seconds, stop_event),
+                    name="pipeline-aggregate"
+                )
+            ]
+            threads += [
+                threading.Thread(
+                    target=_run_stage,
+                    args=("process", errors, stage_stats, stop_event, _process_stage,
+                          raw_queue, collectors, processed_queue, processors, rate_limiter, checkpoint,
+                          relevance_filter, near_duplicates, local_classifier, stop_event),
+                    name=f"pipeline-process-{i}"
+                )
+                for i in range(process_workers)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if not errors and not stop_event.is_set():
+                # Every result is in the processed file now; the log only served to resume an interrupted run
+                checkpoint.clear()
+    finally:
+        _restore_signal_handlers(previous_handlers)
+
+    if llm_cache is not None:
+        logger.info(f"LLM cache stats: {llm_cache.stats()}")
+    if near_duplicates is not None:
+        logger.info(f"Near-duplicate index stats: {near_duplicates.stats()}")
+        near_duplicates.close()
+    logger.info(f"Reddit cache stats: {reddit_cache.stats()}")
+    write_token_report(token_budget.report())
+    stage_stats.record()
+    metrics.write("pipeline")
+    if errors:
+        raise errors[0]
+    logger.info("Pipeline stopped early." if stop_event.is_set() else "Pipeline complete.")
+
+
+class _StageStats:
+    """
+    Items handled per stage and when its last thread finished, for items/s over the stage's wall time
+    (a stage with several worker threads counts once, not once per thread).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.items = {}
+        self.finished = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, items: int):
+        with self._lock:
+            self.items[name] = self.items.get(name, 0) + items
+            self.finished[name] = time.perf_counter()
+
+    def record(self):
+        for name, items in self.items.items():
+            metrics.record_stage(name, items, self.finished[name] - self.started)
+
+
+class _Producers:
+    """
+    Counts down the threads feeding a queue. Consumers learn that a queue's output is over from this count
+    instead of from sentinels on the queue, which could be dropped while stopping with the queue full.
+    """
+
+    def __init__(self, count: int):
+        self._remaining = count
+        self._lock = threading.Lock()
+
+    def done(self):
+        with self._lock:
+            self._remaining -= 1
+
+    def finished(self) -> bool:
+        with self._lock:
+            return self._remaining <= 0
+
+
+def _run_stage(name: str, errors: list, stage_stats: _StageStats, stop_event: threading.Event, stage, *args):
+    """
+    Runs one stage thread. A failing stage stops the whole pipeline, so the other stages drain and exit.
+    Stages return how many posts they handled.
+    """
+    items = 0
+    try:
+        items = stage(*args)
+    except Exception as e:
+        logger.exception(f"Pipeline stage {name} failed: {e}")
+        errors.append(e)
+        stop_event.set()
+    finally:
+        stage_stats.add(name, items or 0)
+
+
+def _collect_stage(async_mode, reddit_cache, raw_queue, collectors, stop_event):
+    """
+    Fetches posts into RAW_MSP_DATA_PATH and onto `raw_queue`, then counts itself out of `collectors`.
+    """
+    def emit(post):
+        writer.write(post)
+        # Blocks while the processing stage is `queue_size` posts behind
+        _put(raw_queue, (post, time.monotonic()), stop_event)
+
+    writer = JsonlWriter(RAW_MSP_DATA_PATH)
+    try:
+        run_collection(async_mode, reddit_cache, emit, stop_event=stop_event)
+    finally:
+        # An interrupted collection isn't marked complete
+        writer.close(complete=not stop_event.is_set())
+        collectors.done()
+    logger.info(f"Collection stage done: {writer.count} posts saved to {RAW_MSP_DATA_PATH}")
+    return writer.count
+
+
+def _process_stage(
+        raw_queue, collectors, processed_queue, processors, rate_limiter, checkpoint, relevance_filter,
+        near_duplicates, local_classifier, stop_event
+):
+    """
+    Classifies posts from `raw_queue` until the collector is done. Once stopped, remaining posts are
+    drained without being classified and the stage exits as soon as `raw_queue` is empty.
+    """
+    processed = 0
+    try:
+        while True:
+            entry = _get(raw_queue, collectors, stop_event=stop_event)
+            if entry is _DONE:
+                return processed
+            if entry is None or stop_event.is_set():
+                continue
+            post, collected_at = entry
+            with metrics.timer("pipeline_process_post_seconds"):
+                processed_post = process_post(
+                    post, rate_limiter, checkpoint, relevance_filter, near_duplicates, local_classifier
+                )
+            processed += 1
+            _put(processed_queue, (processed_post, collected_at), stop_event)
+    finally:
+        processors.done()
+
+
+def _aggregate_stage(processed_queue, processors, aggregate_batch, snapshot_seconds, stop_event):
+    """
+    Writes processed posts as they arrive, and their store rows in micro-batches. Processed posts are written in
+    completion order, not collection order. Findings and the actionable item count are both read from the store
+    (its materialized totals), so every snapshot describes the same items at O(batch) cost.
+    """
+    batch = []
+    latencies = []
+    last_flush = time.monotonic()
+
+    with JsonlWriter(PROCESSED_MSP_DATA_PATH) as processed_writer, AnalyticsStore(ANALYTICS_DB_PATH) as store:
+
+        def flush():
+            store.ingest(batch)
+            write_analysis_results(store.findings(), store.count_actionable_items())
+            write_trends(store)
+            # Refreshed with every snapshot, so a long run can be watched while it goes
+            metrics.write("pipeline")
+
+        while True:
+            timeout = max(0.0, last_flush + snapshot_seconds - time.monotonic())
+            entry = _get(processed_queue, processors, timeout=timeout)
+            if entry is _DONE:
+                break
+            if entry is not None:
+                processed_post, collected_at = entry
+                processed_writer.write(processed_post)
+                batch.append(processed_post)
+                latencies.append(time.monotonic() - collected_at)
+                metrics.observe("pipeline_post_latency_seconds", latencies[-1])
+
+            if len(batch) >= aggregate_batch or time.monotonic() - last_flush >= snapshot_seconds:
+                if batch:
+                    flush()
+                    batch = []
+                last_flush = time.monotonic()
+
+        flush()
+        # Leave the outputs without a completion marker if the run was interrupted
+        processed_writer.close(complete=not stop_event.is_set())
+        actionable_writer = JsonlWriter(ACTIONABLE_ITEMS_PATH)
+        actionable_writer.write_all(store.iter_actionable_items())
+        actionable_writer.close(complete=not stop_event.is_set())
+
+    if latencies:
+        latencies.sort()
+        logger.info(
+            f"Aggregation stage done: {len(latencies)} posts, {actionable_writer.count} actionable items. "
+            f"Collected-to-aggregated latency: median {latencies[len(latencies) // 2]:.1f}s, "
+            f"max {latencies[-1]:.1f}s"
+        )
+    return len(latencies)
+
+
+def _get(source: queue.Queue, producers: _Producers, stop_event: threading.Event = None, timeout: float = 0.5):
+    """
+    The next entry of `source`, None if none came within `timeout`, or _DONE once its producers are all done and
+    it is drained. With `stop_event`, _DONE as soon as the pipeline is stopping and `source` is empty.
+    """
+    # Checked before the queue: once finished, nothing more can be put, so an empty queue is final
+    if producers.finished() or (stop_event is not None and stop_event.is_set()):
+        try:
+            return source.get_nowait()
+        except queue.Empty:
+            return _DONE
+    try:
+        return source.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+def _put(target: queue.Queue, entry, stop_event: threading.Event, poll_interval: float = 0.5):
+    """
+    Blocking put that gives up once the pipeline is stopping and the queue stays full,
+    i.e. when the stage consuming it has failed.
+    """
+    while True:
+        try:
+            target.put(entry, timeout=poll_interval)
+            return
+        except queue.Full:
+            if stop_event.is_set():
+                return
+
+
+def _install_signal_handlers(stop_event: threading.Event) -> dict:
+    """
+    The first SIGINT/SIGTERM asks the pipeline to stop gracefully; the default handlers take over after that.
+    """
+    def request_stop(signum, frame):
+        logger.warning(f"Received signal {signum}: stopping after in-flight posts (signal again to force exit).")
+        stop_event.set()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    if threading.current_thread() is not threading.main_thread():
+        return {}
+    previous = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+    for signum in previous:
+        signal.signal(signum, request_stop)
+    return previous
+
+
+def _restore_signal_handlers(previous: dict):
+    for signum, handler in previous.items():
+        signal.signal(signum, handler)
+
+
+if __name__ == "__main__":
+    main()
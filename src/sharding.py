@@ -0,0 +1,271 @@
+import argparse
+import heapq
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from src.common.cache import SQLiteCache
+from src.common.constants import (
+    RAW_MSP_DATA_PATH,
+    PROCESSED_MSP_DATA_PATH,
+    REDDIT_CACHE_PATH,
+    REDDIT_CACHE_TTL_HOURS,
+    REDDIT_ASYNC_MODE,
+    CHECKPOINT_FSYNC_EVERY,
+    RELEVANCE_FILTER_ENABLED,
+    NEAR_DUPLICATE_ENABLED,
+    CASCADE_ENABLED,
+    LLM_MAX_WORKERS,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_BATCH_MODE,
+    SHARDS_DIR,
+    SHARD_COUNT,
+    SHARD_WORKERS
+)
+from src.common.jsonl import JsonlWriter, iter_records, write_records, is_complete
+from src.common.logger import get_logger
+from src.common.metrics import metrics
+from src.common.rate_limiter import RateLimiter
+from src.data_collection.fetcher import run_collection, collection_targets
+from src.data_processing import post_processor
+from src.data_processing.checkpoint import CheckpointLog
+from src.data_processing.classification import classification_version
+from src.data_processing.local_classifier import load_local_classifier
+from src.data_processing.near_duplicates import NearDuplicateIndex
+from src.data_processing.pre_processor import iter_processed_posts, write_token_report
+from src.data_processing.relevance import RelevanceFilter
+from src.data_processing.tokens import token_budget
+
+logger = get_logger(__name__)
+
+# Partitions of a sharded run, under SHARDS_DIR/<shard count>/<phase>/
+COLLECTED = "collected"
+RAW = "raw"
+PROCESSED = "processed"
+
+
+def main(shards: int = SHARD_COUNT, workers: int = SHARD_WORKERS, async_mode: bool = REDDIT_ASYNC_MODE):
+    """
+    Runs collection and LLM processing as `shards` independent shards on a pool of `workers` processes,
+    then merges the partitions into RAW_MSP_DATA_PATH / PROCESSED_MSP_DATA_PATH and runs post_processor:
+      - collect: shard i runs every `shards`-th (subreddit, query) search and writes its own partition
+      - process: shard i owns the posts whose id hashes to i; it gathers them from every collected partition
+        (a post matched by searches of several shards is kept once), classifies them and writes its partition
+      - merge: the partitions, each sorted by (created_utc, post id), are k-way merged, so the merged files are
+        the same whatever the number of shards or the order they finished in
+    The LLM quota is split between the processes running at once. Shards can also be run one per invocation,
+    e.g. on several nodes sharing DATA_DIR (see `python -m src.sharding --help`); collection is always a full
+    pass (incremental collection stays single-process).
+    """
+    started = time.perf_counter()
+    workers = max(1, min(workers, shards))
+    logger.info(f"Sharded run: {shards} shards on {workers} worker processes")
+
+    # A fresh process per shard, so module-level state (token budget, metrics, caches) is per shard. Spawned rather
+    # than forked: a forked child would inherit this process's open SQLite connections (e.g. the LLM cache)
+    with ProcessPoolExecutor(
+            max_workers=workers, max_tasks_per_child=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        collected = sum(executor.map(partial(collect_shard, shards=shards, async_mode=async_mode), range(shards)))
+        logger.info(f"Collected {collected} posts across {shards} shards")
+        processed = sum(executor.map(partial(process_shard, shards=shards, quota_share=1 / workers), range(shards)))
+        logger.info(f"Processed {processed} posts across {shards} shards")
+
+    merge(shards)
+    metrics.record_stage("sharded_run", processed, time.perf_counter() - started)
+    metrics.write("sharding")
+
+
+def shard_of(post_id: str, shards: int) -> int:
+    """
+    The shard owning a post. crc32 rather than hash(), which differs between processes and nodes.
+    """
+    return zlib.crc32(post_id.encode("utf-8")) % shards
+
+
+def shard_targets(shard: int, shards: int) -> list[tuple[str, str]]:
+    """
+    The (subreddit, query) searches of a collection shard: every `shards`-th one, round-robin.
+    """
+    return collection_targets()[shard::shards]
+
+
+def partition_path(phase: str, shard: int, shards: int, shards_dir: str = SHARDS_DIR) -> str:
+    directory = os.path.join(shards_dir, str(shards), phase)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"part-{shard:04d}.jsonl")
+
+
+def collect_shard(shard: int, shards: int, async_mode: bool = REDDIT_ASYNC_MODE) -> int:
+    """
+    Runs a collection shard's searches into its COLLECTED partition. Returns the number of posts collected.
+    """
+    started = time.perf_counter()
+    targets = shard_targets(shard, shards)
+    path = partition_path(COLLECTED, shard, shards)
+    reddit_cache = SQLiteCache(REDDIT_CACHE_PATH, max_age_seconds=REDDIT_CACHE_TTL_HOURS * 3600, name="reddit")
+    with JsonlWriter(path) as writer:
+        if targets:
+            run_collection(async_mode, reddit_cache, writer.write, targets=targets)
+    reddit_cache.close()
+
+    logger.info(f"Collection shard {shard}/{shards}: {len(targets)} searches, {writer.count} posts => {path}")
+    metrics.record_stage("collect", writer.count, time.perf_counter() - started)
+    metrics.write(f"collect-{shard:04d}")
+    return writer.count
+
+
+def process_shard(
+        shard: int,
+        shards: int,
+        quota_share: float = 1.0,
+        max_workers: int = LLM_MAX_WORKERS,
+        batch_mode: bool = LLM_BATCH_MODE,
+        relevance_filter_enabled: bool = RELEVANCE_FILTER_ENABLED,
+        near_duplicates_enabled: bool = NEAR_DUPLICATE_ENABLED,
+        cascade_enabled: bool = CASCADE_ENABLED
+) -> int:
+    """
+    Classifies the posts a shard owns into its PROCESSED partition, with its own checkpoint (so an interrupted
+    shard resumes on its own) and `quota_share` of the LLM rate limits. Returns the number of posts processed.
+    Shards share the near-duplicate index, so which of two copies in different shards is classified (and which
+    one links to it) depends on which shard gets there first.
+    """
+    started = time.perf_counter()
+    posts = owned_posts(shard, shards)
+    write_records(partition_path(RAW, shard, shards), posts)
+
+    processed_path = partition_path(PROCESSED, shard, shards)
+    rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE * quota_share, LLM_TOKENS_PER_MINUTE * quota_share)
+    relevance_filter = RelevanceFilter() if relevance_filter_enabled else None
+    near_duplicates = NearDuplicateIndex() if near_duplicates_enabled else None
+    local_classifier = load_local_classifier() if cascade_enabled else None
+    checkpoint_path = os.path.join(os.path.dirname(processed_path), f"checkpoint-{shard:04d}.jsonl")
+    with CheckpointLog(
+            checkpoint_path, fsync_every=CHECKPOINT_FSYNC_EVERY, version=classification_version()
+    ) as checkpoint:
+        processed_count = write_records(
+            processed_path,
+            iter_processed_posts(posts, rate_limiter, max_workers, batch_mode, checkpoint,
+                                 relevance_filter=relevance_filter, near_duplicates=near_duplicates,
+                                 local_classifier=local_classifier)
+        )
+        checkpoint.clear()
+    if near_duplicates is not None:
+        near_duplicates.close()
+
+    logger.info(f"Processing shard {shard}/{shards}: {processed_count} posts => {processed_path}")
+    write_token_report(
+        token_budget.report(), os.path.join(os.path.dirname(processed_path), f"token_usage-{shard:04d}.json")
+    )
+    metrics.record_stage("process", processed_count, time.perf_counter() - started)
+    metrics.write(f"process-{shard:04d}")
+    return processed_count
+
+
+def owned_posts(shard: int, shards: int) -> list[dict]:
+    """
+    The posts of every collected partition that hash to `shard`, once each (a post found by several searches
+    has their queries merged into `query_matched`), sorted by (created_utc, post id).
+    Only this shard's posts are held in memory.
+    """
+    posts = {}
+    for path in _complete_partitions(COLLECTED, shards):
+        for post in iter_records(path):
+            if shard_of(post["id"], shards) != shard:
+                continue
+            existing = posts.get(post["id"])
+            if existing is None:
+                posts[post["id"]] = post
+                continue
+            for query in post.get("query_matched", []):
+                if query not in existing["query_matched"]:
+                    existing["query_matched"].append(query)
+    for post in posts.values():
+        post["query_matched"].sort()
+    return sorted(posts.values(), key=lambda post: (post.get("created_utc") or 0, post["id"]))
+
+
+def merge(shards: int) -> dict:
+    """
+    Merges the RAW and PROCESSED partitions into RAW_MSP_DATA_PATH and PROCESSED_MSP_DATA_PATH,
+    then runs post_processor on the merged file. Returns the merged post counts.
+    """
+    counts = {
+        "raw": merge_partitions(
+            _complete_partitions(RAW, shards), RAW_MSP_DATA_PATH,
+            key=lambda post: (post.get("created_utc") or 0, post["id"])
+        ),
+        "processed": merge_partitions(
+            _complete_partitions(PROCESSED, shards), PROCESSED_MSP_DATA_PATH,
+            key=lambda post: (post.get("created_utc") or 0, post["post_id"])
+        )
+    }
+    logger.info(f"Merged {shards} shards: {counts['processed']} processed posts => {PROCESSED_MSP_DATA_PATH}")
+    post_processor.main()
+    return counts
+
+
+def merge_partitions(paths: list[str], out_path: str, key) -> int:
+    """
+    K-way merge of partitions that are each sorted by `key`. Streams: one record per partition in memory.
+    """
+    with JsonlWriter(out_path) as writer:
+        writer.write_all(heapq.merge(*(iter_records(path) for path in paths), key=key))
+    return writer.count
+
+
+def _complete_partitions(phase: str, shards: int) -> list[str]:
+    """
+    Every partition of a phase, in shard order. Fails if one is missing or unfinished, rather than
+    merging a partial run.
+    """
+    paths = [partition_path(phase, shard, shards) for shard in range(shards)]
+    unfinished = [path for path in paths if not is_complete(path)]
+    if unfinished:
+        raise RuntimeError(f"{len(unfinished)} {phase} partition(s) missing or unfinished, e.g. {unfinished[0]}")
+    return paths
+
+
+def _parse_args(argv: list[str] = None):
+    parser = argparse.ArgumentParser(
+        description="Sharded collection and processing. Without a command, runs every phase on a local process "
+                    "pool; the commands run one phase of one shard, e.g. on separate nodes sharing DATA_DIR."
+    )
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT)
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS, help="local worker processes")
+    parser.add_argument("--async", dest="async_mode", action=argparse.BooleanOptionalAction, default=REDDIT_ASYNC_MODE,
+                        help="collect with the async Reddit client (default: REDDIT_ASYNC_MODE)")
+    subparsers = parser.add_subparsers(dest="command")
+    collect_parser = subparsers.add_parser("collect", help="run one collection shard")
+    collect_parser.add_argument("shard", type=int)
+    process_parser = subparsers.add_parser("process", help="run one processing shard (after every collect shard)")
+    process_parser.add_argument("shard", type=int)
+    process_parser.add_argument("--quota-share", type=float, default=1.0,
+                                help="share of the LLM rate limits for this shard (e.g. 0.25 with 4 nodes on one key)")
+    subparsers.add_parser("merge", help="merge the partitions and run post_processor (after every process shard)")
+    return parser.parse_args(argv)
+
+
+def cli(argv: list[str] = None):
+    args = _parse_args(argv)
+    if args.command == "collect":
+        collect_shard(args.shard, args.shards, async_mode=args.async_mode)
+    elif args.command == "process":
+        process_shard(args.shard, args.shards, quota_share=args.quota_share)
+    elif args.command == "merge":
+        merge(args.shards)
+    else:
+        main(args.shards, args.workers, async_mode=args.async_mode)
+
+
+if __name__ == "__main__":
+    # Go through the imported module, so the shard functions sent to worker processes are src.sharding's
+    from src.sharding import cli as sharding_cli
+
+    sharding_cli(sys.argv[1:])
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Set before anything imports src.common.constants, so tests never touch the real data tree
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="msp-tests-"))
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
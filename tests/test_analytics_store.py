@@ -0,0 +1,99 @@
+import pytest
+
+from src.data_processing.analytics_store import AnalyticsStore
+
+DAY = 24 * 3600
+
+
+def _post(post_id: str, created_utc: float, comments=(), **classification) -> dict:
+    return {
+        "post_id": post_id,
+        "title": f"Post {post_id}",
+        "author": "author",
+        "created_utc": created_utc,
+        "query_matched": ["SentinelOne"],
+        "llm_summary": "",
+        "sentiment_s1": "neutral",
+        "competitors_mentioned": [],
+        "action_needed": "no_action",
+        **classification,
+        "comments": list(comments)
+    }
+
+
+def _comment(comment_id: str, created_utc: float, **classification) -> dict:
+    return {
+        "comment_id": comment_id,
+        "author": "commenter",
+        "created_utc": created_utc,
+        "body": "",
+        "sentiment_s1": "not mentioned",
+        "competitors_mentioned": [],
+        "action_needed": "no_action",
+        **classification
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    with AnalyticsStore(str(tmp_path / "analytics.db")) as store:
+        yield store
+
+
+def test_materialized_totals_match_the_item_queries_after_re_ingest(store):
+    store.ingest([
+        _post("p1", DAY, [_comment("c1", DAY, competitors_mentioned=["CrowdStrike"], action_needed="yes")],
+              sentiment_s1="positive", competitors_mentioned=["CrowdStrike", "Huntress"]),
+        _post("p2", 2 * DAY, [_comment("c2", 2 * DAY, duplicate_of="comment-c1", action_needed="yes")],
+              sentiment_s1="not mentioned", filtered=True),
+    ])
+    # p1 comes back reclassified, and with another comment
+    store.ingest([
+        _post("p1", DAY, [_comment("c1", DAY), _comment("c3", DAY, llm_failed=True)],
+              sentiment_s1="negative", competitors_mentioned=["Huntress"], local_classified=True),
+    ])
+
+    # A filter matching every item takes the per-item queries instead of the totals
+    assert store.findings() == store.findings(since=0)
+    findings = store.findings()
+    assert findings["total_posts"] == 2
+    assert findings["total_comments"] == 3
+    assert findings["competitors_mentioned_summary"] == [
+        {"competitor": "Huntress", "competitor_id": "huntress", "mentions": 1}
+    ]
+    assert findings["s1_sentiment_distribution"] == {"not mentioned": 4, "negative": 1}
+
+
+def test_actionable_items_export_skips_near_duplicates(store):
+    store.ingest([
+        _post("p1", DAY, [_comment("c1", DAY + 60, action_needed="yes", action_reason="complaint")],
+              action_needed="yes", action_reason="question"),
+        _post("p2", 2 * DAY, [_comment("c2", 2 * DAY, action_needed="yes", duplicate_of="comment-c1")]),
+    ])
+
+    # Newest first
+    items = list(store.iter_actionable_items())
+    assert [(item["type"], item["post_id"]) for item in items] == [("comment", "p1"), ("post", "p1")]
+    assert items[0]["author"] == "commenter" and items[0]["comment_id"] == "c1"
+    assert items[1]["title"] == "Post p1"
+    assert len(items) == store.count_actionable_items()
+
+
+def test_re_ingest_retracts_trend_counts_of_the_replaced_items(store, tmp_path):
+    store.ingest([
+        _post("p1", DAY, [_comment("c1", DAY, sentiment_s1="negative", competitors_mentioned=["CrowdStrike"])],
+              sentiment_s1="positive", competitors_mentioned=["CrowdStrike"]),
+        _post("p2", DAY, sentiment_s1="positive"),
+    ])
+    # p1 and its comment move to another day and change sentiment and competitor
+    reclassified = _post("p1", 3 * DAY, [_comment("c1", 3 * DAY, sentiment_s1="positive")],
+                         sentiment_s1="negative", competitors_mentioned=["Huntress"])
+    store.ingest([reclassified])
+
+    with AnalyticsStore(str(tmp_path / "fresh.db")) as fresh:
+        fresh.ingest([_post("p2", DAY, sentiment_s1="positive"), reclassified])
+        expected = fresh.trend_windows("day")
+    assert store.trend_windows("day") == expected
+    assert store.trend_windows("day", until=2 * DAY) == [
+        (DAY, "items", "post", 1), (DAY, "sentiment", "positive", 1)
+    ]
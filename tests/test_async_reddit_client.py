@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from src.data_collection.providers import stub_server
+from src.data_collection.providers.async_reddit_client import AsyncRedditClient
+
+
+@pytest.fixture
+def reddit_server(request):
+    server = stub_server.start_in_thread(port=0, latency_ms=10, **getattr(request, "param", {}))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, max_concurrency: int = 4) -> AsyncRedditClient:
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    return AsyncRedditClient(
+        "client-id", "client-secret", "tests", None, None,
+        api_base_url=base_url, auth_url=f"{base_url}/api/v1/access_token", max_concurrency=max_concurrency
+    )
+
+
+@pytest.mark.parametrize("reddit_server", [{"posts": 250, "comments_per_post": 3}], indirect=True)
+def test_fetches_paginated_search_and_comment_trees(reddit_server):
+    async def fetch():
+        async with _client(reddit_server) as client:
+            posts = await client.fetch_submissions("msp", "SentinelOne", limit=240)
+            comments = await client.fetch_comments_for_submission(posts[0]["id"], limit=10)
+        return posts, comments
+
+    posts, comments = asyncio.run(fetch())
+    assert [post["id"] for post in posts] == [f"s{i}" for i in range(240)]
+    assert posts[0]["query_matched"] == ["SentinelOne"]
+    # The reply is flattened after its parent
+    assert [comment["comment_id"] for comment in comments] == ["s0c0", "s0c1", "s0c2"]
+
+
+@pytest.mark.parametrize("reddit_server", [{"rate_limited_requests": 1, "retry_after": 1.0}], indirect=True)
+def test_rate_limited_request_waits_without_holding_its_slot(reddit_server):
+    """
+    With a single concurrency slot, a request retrying after a 429 must not block the next one.
+    """
+    async def fetch():
+        async with _client(reddit_server, max_concurrency=1) as client:
+            started = time.perf_counter()
+            finished = {}
+
+            async def comments(submission_id):
+                await client.fetch_comments_for_submission(submission_id, limit=10)
+                finished[submission_id] = time.perf_counter() - started
+
+            # s0 goes first and gets the 429
+            await asyncio.gather(comments("s0"), comments("s1"))
+        return finished
+
+    finished = asyncio.run(fetch())
+    assert finished["s1"] < 0.5 <= 1.0 <= finished["s0"]
+    assert reddit_server.requests_throttled == 1
+
+
+@pytest.mark.parametrize("reddit_server", [{"auth_status": 401}], indirect=True)
+def test_failed_authentication_closes_the_session(reddit_server):
+    client = _client(reddit_server)
+
+    async def enter():
+        async with client:
+            pass
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(enter())
+    assert client._session.closed
@@ -0,0 +1,46 @@
+import json
+
+from src.data_processing.checkpoint import CheckpointLog
+
+
+def test_resumes_after_a_torn_tail(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    with CheckpointLog(path, version="v1") as checkpoint:
+        checkpoint.append("post-1", {"summary": "one"})
+        checkpoint.append("post-2", {"summary": "two"})
+    # A crash in the middle of the third append
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "post-3", "version": "v1", "res')
+
+    with CheckpointLog(path, version="v1") as checkpoint:
+        assert checkpoint.load() == 2
+        assert "post-3" not in checkpoint
+        assert checkpoint.get("post-2") == {"summary": "two"}
+        checkpoint.append("post-3", {"summary": "three"})
+
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["key"] for line in f] == ["post-1", "post-2", "post-3"]
+    with CheckpointLog(path, version="v1") as checkpoint:
+        assert checkpoint.load() == 3
+        assert checkpoint.get("post-3") == {"summary": "three"}
+
+
+def test_items_of_another_version_are_not_resumed(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    with CheckpointLog(path, version="old-model") as checkpoint:
+        checkpoint.append("post-1", {"summary": "stale"})
+
+    with CheckpointLog(path, version="new-model") as checkpoint:
+        assert checkpoint.load() == 0
+        assert "post-1" not in checkpoint
+
+
+def test_clear_deletes_the_log(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    with CheckpointLog(str(path), version="v1") as checkpoint:
+        checkpoint.append("post-1", {"summary": "one"})
+        checkpoint.load()
+        checkpoint.get("post-1")
+        checkpoint.clear()
+        assert "post-1" not in checkpoint
+    assert not path.exists()
@@ -0,0 +1,81 @@
+import json
+import re
+
+import pytest
+
+from src.common.cache import SQLiteCache
+from src.data_processing import classification
+from src.data_processing.providers.base import LLMProvider, LLMResponse
+from src.data_processing.providers.registry import set_provider
+
+
+class ScriptedProvider(LLMProvider):
+    """
+    Answers batch prompts with a complete entry for each item, except `broken` items; single-item prompts
+    with a complete object.
+    """
+    name = "scripted"
+    default_model = "scripted-model"
+
+    def __init__(self, broken: dict = None, model: str = None):
+        super().__init__(model)
+        self.broken = broken or {}
+        self.prompts = []
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> LLMResponse:
+        self.prompts.append(prompt)
+        item_ids = re.findall(r"Item id: (\S+)", prompt)
+        if not item_ids:
+            return LLMResponse(json.dumps(_entry()))
+        entries = [self.broken.get(item_id, {"id": item_id, **_entry()}) for item_id in item_ids]
+        return LLMResponse(json.dumps([entry for entry in entries if entry is not None]))
+
+
+def _entry() -> dict:
+    return {"summary": "ok", "sentiment_s1": "positive", "action_needed": "no_action", "competitors_mentioned": []}
+
+
+@pytest.fixture
+def provider(request):
+    provider = ScriptedProvider(request.param)
+    set_provider(provider)
+    yield provider
+    set_provider(None)
+
+
+@pytest.mark.parametrize("provider", [{
+    # Left out of the reply, missing required fields, and with a field of the wrong type
+    "b": None,
+    "c": {"id": "c", "summary": "no labels"},
+    "d": {"id": "d", "sentiment_s1": "positive", "action_needed": "no_action", "competitors_mentioned": "S1"},
+}], indirect=True)
+def test_batch_re_splits_missing_and_incomplete_entries(provider):
+    items = [(item_id, f"SentinelOne text {item_id}") for item_id in "abcd"]
+    results = classification.classify_batch(items)
+
+    assert set(results) == set("abcd")
+    assert all(results[item_id]["sentiment_s1"] == "positive" for item_id in "abcd")
+    # The full batch, then b alone and c/d as a half batch (both still broken), then c and d alone
+    assert len(provider.prompts) == 5
+    assert "Item id" not in provider.prompts[-1]
+
+
+def test_cached_classifications_are_keyed_by_model_and_prompt(tmp_path, monkeypatch):
+    monkeypatch.setattr(classification, "llm_cache", SQLiteCache(str(tmp_path / "llm_cache.sqlite")))
+    first = ScriptedProvider(model="model-a")
+    set_provider(first)
+    try:
+        classification.classify_content("SentinelOne text")
+        classification.classify_content("SentinelOne text")
+        assert len(first.prompts) == 1
+
+        other_model = ScriptedProvider(model="model-b")
+        set_provider(other_model)
+        classification.classify_content("SentinelOne text")
+        assert len(other_model.prompts) == 1
+
+        monkeypatch.setattr(classification, "SUMMARIZATION_TEMPLATE", "Classify, differently:\n{text}")
+        classification.classify_content("SentinelOne text")
+        assert len(other_model.prompts) == 2
+    finally:
+        set_provider(None)
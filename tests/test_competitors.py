@@ -0,0 +1,36 @@
+import pytest
+
+from src.data_processing.competitors import CompetitorIndex, competitor_id
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CompetitorIndex(
+        aliases={"CrowdStrike": ["CS Falcon", "Falcon"], "Microsoft Defender": ["Defender", "MDE"]},
+        queries=["SentinelOne OR S1 OR Sentinel-1"]
+    )
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("crowdstrike", ("crowdstrike", "CrowdStrike")),
+    ("  CS   Falcon ", ("crowdstrike", "CrowdStrike")),
+    ("MDE", ("microsoft-defender", "Microsoft Defender")),
+    ("S1", ("sentinelone", "SentinelOne")),
+    # Fuzzy: a misspelling close enough to an alias
+    ("Crowdstrik", ("crowdstrike", "CrowdStrike")),
+    # No alias: kept as its own competitor
+    ("Acme EDR", ("acme-edr", "Acme EDR")),
+])
+def test_names_normalize_to_canonical_ids(index, name, expected):
+    assert index.normalize(name) == expected
+
+
+def test_normalize_all_drops_blanks_duplicates_and_non_strings(index):
+    names = ["SentinelOne", "S1", "", "   ", None, 42, {"name": "Huntress"}, ["MDE"], "Defender"]
+    assert index.normalize_all(names) == [
+        ("sentinelone", "SentinelOne"), ("microsoft-defender", "Microsoft Defender")
+    ]
+
+
+def test_competitor_id_is_a_slug():
+    assert competitor_id("Microsoft Defender for Endpoint") == "microsoft-defender-for-endpoint"
@@ -0,0 +1,59 @@
+import functools
+
+import pytest
+
+from src.common.cache import SQLiteCache
+from src.common.constants import MAX_COMMENTS_PER_POST
+from src.data_collection import fetcher
+from src.data_collection.incremental import watermark_key
+from src.data_collection.providers import stub_server
+from src.data_collection.providers.async_reddit_client import AsyncRedditClient
+
+
+@pytest.fixture
+def reddit_server(request, monkeypatch):
+    server = stub_server.start_in_thread(port=0, latency_ms=1, **getattr(request, "param", {}))
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(fetcher, "AsyncRedditClient", functools.partial(
+        AsyncRedditClient, api_base_url=base_url, auth_url=f"{base_url}/api/v1/access_token"
+    ))
+    monkeypatch.setattr(fetcher, "_reddit_credentials", lambda: ("client-id", "client-secret", "tests", None, None))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def reddit_cache(tmp_path):
+    return SQLiteCache(str(tmp_path / "reddit_cache.sqlite"))
+
+
+@pytest.mark.parametrize("reddit_server", [{"posts": 5, "failing_comment_ids": ["s2"]}], indirect=True)
+def test_failed_comment_fetch_holds_the_watermark_back(reddit_server, reddit_cache):
+    emitted = []
+    watermarks = {}
+    fetcher.run_collection(True, reddit_cache, emitted.append, watermarks, targets=[("msp", "SentinelOne")])
+
+    assert sorted(post["id"] for post in emitted) == ["s0", "s1", "s3", "s4"]
+    # s2 failed, so the watermark stays below it: only the older s3 and s4 count as collected
+    assert watermarks[watermark_key("msp", "SentinelOne")] == stub_server.NEWEST_CREATED_UTC - 3 * 3600
+
+
+@pytest.mark.parametrize("reddit_server", [{"posts": 3}], indirect=True)
+def test_watermark_advances_to_the_newest_post_when_all_are_emitted(reddit_server, reddit_cache):
+    watermarks = {}
+    fetcher.run_collection(True, reddit_cache, lambda post: None, watermarks, targets=[("msp", "SentinelOne")])
+
+    assert watermarks[watermark_key("msp", "SentinelOne")] == stub_server.NEWEST_CREATED_UTC
+
+
+@pytest.mark.parametrize("reddit_server", [{"posts": 0, "comments_per_post": 2}], indirect=True)
+def test_active_thread_refresh_bypasses_the_comment_cache(reddit_server, reddit_cache):
+    reddit_cache.set(f"comments:old:{MAX_COMMENTS_PER_POST}", [{"comment_id": "stale"}])
+    emitted = []
+    fetcher.run_collection(
+        True, reddit_cache, emitted.append, {}, refresh_ids=["old"], targets=[("msp", "SentinelOne")]
+    )
+
+    assert [post["id"] for post in emitted] == ["old"]
+    assert [comment["comment_id"] for comment in emitted[0]["comments"]] == ["oldc0", "oldc1"]
@@ -0,0 +1,26 @@
+import pytest
+
+from src.common.jsonl import follow_records, mark_complete
+
+
+def test_follow_skips_unreadable_lines(tmp_path):
+    path = tmp_path / "raw.jsonl"
+    path.write_text('{"id": "a"}\n{"id": \n{"id": "b"}\n{"id": "c"}', encoding="utf-8")
+    mark_complete(str(path))
+
+    assert [record["id"] for record in follow_records(str(path), poll_interval=0.01)] == ["a", "b", "c"]
+
+
+def test_follow_gives_up_when_the_producer_stops_writing(tmp_path):
+    path = tmp_path / "raw.jsonl"
+    path.write_text('{"id": "a"}\n', encoding="utf-8")
+
+    records = follow_records(str(path), poll_interval=0.01, idle_timeout=0.1)
+    assert next(records) == {"id": "a"}
+    with pytest.raises(TimeoutError):
+        next(records)
+
+
+def test_follow_gives_up_when_the_file_never_appears(tmp_path):
+    with pytest.raises(TimeoutError):
+        next(follow_records(str(tmp_path / "missing.jsonl"), poll_interval=0.01, idle_timeout=0.1))
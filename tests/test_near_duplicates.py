@@ -0,0 +1,60 @@
+from src.data_processing.near_duplicates import NearDuplicateIndex, get_duplicate_response
+
+ORIGINAL = (
+    "We replaced our old antivirus with SentinelOne last quarter and the rollout across four hundred endpoints "
+    "was painless, although the console takes a while to learn."
+)
+# A cross-post: another link, a quoted line and different punctuation, same words
+CROSS_POST = (
+    "> quoting someone upthread\n"
+    "We replaced our old antivirus with SentinelOne last quarter, and the rollout across four hundred endpoints "
+    "was painless - although the console takes a while to learn! https://example.com/thread"
+)
+UNRELATED = (
+    "Looking for recommendations on a backup product for a small office with a NAS and a handful of laptops, "
+    "ideally something that does not need a dedicated server."
+)
+RESULT = {"summary": "Smooth rollout", "sentiment_s1": "positive", "action_needed": "no_action"}
+
+
+def _index(tmp_path, **kwargs) -> NearDuplicateIndex:
+    return NearDuplicateIndex(path=str(tmp_path / "near_duplicates.sqlite"), **kwargs)
+
+
+def test_near_duplicate_reuses_the_original_classification(tmp_path):
+    index = _index(tmp_path)
+    index.add("t3_original", index.fingerprint(ORIGINAL), RESULT)
+    index.close()
+
+    # Across runs: the classification is read back from the persisted index
+    index = _index(tmp_path)
+    match = index.find(index.fingerprint(CROSS_POST), "t3_copy")
+    assert match is not None and match.item_key == "t3_original"
+    response = get_duplicate_response(match.result.result(), match)
+    assert response == {**RESULT, "duplicate_of": "t3_original", "duplicate_distance": match.distance}
+
+    assert index.find(index.fingerprint(UNRELATED), "t3_other") is None
+    # An item is never its own near-duplicate
+    assert index.find(index.fingerprint(ORIGINAL), "t3_original") is None
+    index.close()
+
+
+def test_in_flight_original_is_shared_and_indexed_when_done(tmp_path):
+    index = _index(tmp_path)
+    future = index.track("t3_original", index.fingerprint(ORIGINAL))
+
+    match = index.find(index.fingerprint(CROSS_POST), "t3_copy")
+    assert match.result is future and not future.done()
+
+    future.set_result(RESULT)
+    assert index.stats() == {"entries": 1, "in_flight": 0}
+    index.close()
+
+
+def test_placeholders_and_short_text_are_not_indexed(tmp_path):
+    index = _index(tmp_path)
+    index.track("t3_failed", index.fingerprint(ORIGINAL)).set_result({**RESULT, "llm_failed": True})
+
+    assert index.find(index.fingerprint(CROSS_POST), "t3_copy") is None
+    assert index.fingerprint("SentinelOne is fine") is None
+    index.close()
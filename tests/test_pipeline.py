@@ -0,0 +1,44 @@
+import threading
+import time
+
+from src import pipeline
+from src.data_processing.records import ProcessedPost
+
+
+def _post(i: int) -> dict:
+    return {"id": f"p{i}", "title": f"Post {i}", "author": "someone", "created_utc": 1700000000.0 + i,
+            "query_matched": ["msp"], "comments": []}
+
+
+def test_stop_under_backpressure_exits(monkeypatch):
+    """
+    Stopping while every queue is full and the workers are busy must still end every stage.
+    """
+    def run_collection(async_mode, reddit_cache, emit, stop_event=None, **kwargs):
+        i = 0
+        while not stop_event.is_set():
+            emit(_post(i))
+            i += 1
+
+    def process_post(post, *args):
+        time.sleep(3)
+        return ProcessedPost.from_result(post, {"sentiment_s1": "neutral"}, []).to_dict()
+
+    stop_events = []
+    monkeypatch.setattr(pipeline, "run_collection", run_collection)
+    monkeypatch.setattr(pipeline, "process_post", process_post)
+    monkeypatch.setattr(pipeline, "_install_signal_handlers", lambda stop_event: stop_events.append(stop_event) or {})
+
+    run = threading.Thread(
+        target=pipeline.main,
+        kwargs=dict(async_mode=False, process_workers=2, queue_size=2, aggregate_batch=10, snapshot_seconds=60,
+                    relevance_filter_enabled=False, near_duplicates_enabled=False, cascade_enabled=False),
+        daemon=True
+    )
+    run.start()
+    time.sleep(1)
+    stop_events[0].set()
+    # The in-flight posts take up to 3s to finish; the queued ones are dropped
+    run.join(timeout=10)
+    assert not run.is_alive()
+    assert not [thread.name for thread in threading.enumerate() if thread.name.startswith("pipeline-")]
@@ -0,0 +1,32 @@
+import os
+
+from src.data_analysis import plotter
+
+
+def _spec(name: str) -> dict:
+    return {
+        "name": name,
+        "title": name,
+        "xlabel": "Label",
+        "ylabel": "Count",
+        "labels": ["a", "b"],
+        "values": [1, 2],
+        "color": "skyblue",
+        "figsize": [4, 3],
+        "rotate_labels": False
+    }
+
+
+def test_charts_no_longer_produced_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(plotter, "REPORT_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    out_dir = str(tmp_path / "reports")
+    specs = [_spec("sentiment"), _spec("weeks/2024-W01_sentiment")]
+
+    assert plotter.render_charts(specs, ("svg", "html"), out_dir, max_workers=1) == (2, 0)
+    assert plotter.render_charts(specs, ("svg", "html"), out_dir, max_workers=1) == (0, 2)
+
+    # The week dropped out of the report
+    assert plotter.render_charts(specs[:1], ("svg", "html"), out_dir, max_workers=1) == (0, 1)
+    assert os.listdir(os.path.join(out_dir, "weeks")) == []
+    assert sorted(os.listdir(out_dir)) == ["sentiment.html", "sentiment.svg", "weeks"]
+    assert list(plotter._load_manifest()) == ["sentiment"]
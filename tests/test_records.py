@@ -0,0 +1,30 @@
+import pytest
+
+from src.data_processing.records import ActionNeeded, Classification, Sentiment
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("negative", Sentiment.NEGATIVE),
+    ("Not_Mentioned", Sentiment.NOT_MENTIONED),
+    (" POSITIVE ", Sentiment.POSITIVE),
+    ("great", Sentiment.UNKNOWN),
+    (None, Sentiment.UNKNOWN),
+    (3, Sentiment.UNKNOWN),
+    (["negative"], Sentiment.UNKNOWN),
+    ({"label": "negative"}, Sentiment.UNKNOWN),
+])
+def test_sentiment_parse(value, expected):
+    assert Sentiment.parse(value) is expected
+
+
+def test_malformed_llm_fields_parse_to_defaults():
+    classification = Classification.from_dict({
+        "sentiment_s1": ["negative"],
+        "overall_tone": {"tone": "angry"},
+        "action_needed": ["yes"],
+        "competitors_mentioned": "CrowdStrike"
+    })
+    assert classification.sentiment_s1 is Sentiment.UNKNOWN
+    assert classification.overall_tone == "unknown"
+    assert classification.action_needed is ActionNeeded.NO_ACTION
+    assert classification.competitors_mentioned == ("CrowdStrike",)
@@ -0,0 +1,45 @@
+import pytest
+
+from src.data_processing.relevance import RelevanceFilter, get_filtered_response
+
+
+@pytest.fixture(scope="module")
+def relevance_filter():
+    return RelevanceFilter(
+        aliases={"CrowdStrike": ["CS Falcon", "Falcon"]},
+        queries=["SentinelOne OR S1 OR Sentinel-1", "Huntress"]
+    )
+
+
+@pytest.mark.parametrize("text", [
+    "We moved to sentinelone last year",
+    "S1 caught it before anyone noticed",
+    "Is Sentinel-1 worth it for a 50-seat shop?",
+    "Huntress found the persistence",
+    "Our cs falcon console is down again",
+])
+def test_mentions_of_tracked_products_are_relevant(relevance_filter, text):
+    assert relevance_filter.is_relevant(text)
+
+
+@pytest.mark.parametrize("text", [
+    "Which RMM do you all use?",
+    # Aliases only match whole words
+    "S10 rollout next week",
+    "The Huntresses are coming",
+    "",
+])
+def test_other_text_is_not_relevant(relevance_filter, text):
+    assert not relevance_filter.is_relevant(text)
+
+
+def test_mentions_are_canonical_names_once_each_in_order(relevance_filter):
+    text = "CS Falcon vs S1 vs SentinelOne, and Falcon again"
+    assert relevance_filter.find_mentions(text) == ["CrowdStrike", "SentinelOne"]
+
+
+def test_filtered_response_skips_the_llm_with_defaults():
+    response = get_filtered_response()
+    assert response["filtered"] is True
+    assert response["sentiment_s1"] == "not mentioned"
+    assert response["action_needed"] == "no_action"
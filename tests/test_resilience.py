@@ -0,0 +1,43 @@
+from src.data_processing.providers import resilience
+from src.data_processing.providers.base import LLMProvider, LLMProviderError, LLMResponse
+from src.data_processing.providers.resilience import CircuitBreaker, ResilientProvider
+
+
+class ThrottledProvider(LLMProvider):
+    """
+    Answers 429 with a huge Retry-After `throttled` times, then succeeds.
+    """
+    name = "throttled"
+    default_model = "throttled-model"
+
+    def __init__(self, throttled: int):
+        super().__init__(None)
+        self.throttled = throttled
+        self.calls = 0
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> LLMResponse:
+        self.calls += 1
+        if self.calls <= self.throttled:
+            raise LLMProviderError("quota exceeded", status=429, retry_after=86400)
+        return LLMResponse("{}")
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = []
+
+    def acquire(self, tokens: float = 0):
+        self.acquired.append(tokens)
+
+
+def test_retries_wait_for_the_rate_limiter_and_a_capped_retry_after(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(resilience.time, "sleep", sleeps.append)
+    provider = ResilientProvider(ThrottledProvider(throttled=2), breaker=CircuitBreaker(failure_threshold=10))
+    limiter = CountingLimiter()
+
+    response = provider.generate("prompt", 0.2, 100, rate_limiter=limiter, prompt_tokens=50)
+
+    assert response.text == "{}"
+    assert limiter.acquired == [50, 50, 50]
+    assert sleeps == [resilience.LLM_RETRY_AFTER_MAX_SECONDS] * 2